@@ -1,19 +1,35 @@
 # ai_comm_server.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 import datetime
+import sys
+from instrumentation import span, count, prometheus_text
+from analysis_index import get_index
 
 app = Flask(__name__)
 
+def get_registry():
+    """
+    The model registry, imported on first use: model serving pulls in pandas
+    and scikit-learn, which message-only workers never need.
+    """
+    from model_serving import get_registry as registry
+    return registry()
+
 @app.route('/receive-message', methods=['POST'])
 def receive_message():
-    data = request.json
+    with span("comm.receive_message"):
+        return _handle_message(request.json)
+
+def _handle_message(data):
+    count("comm.messages")
     sender = data.get("from_agent", "Unknown")
     message = data.get("message", "")
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     print(f"\n📥 Received message from {sender} at {timestamp}")
     print(f"📝 Message content:\n{message}\n")
+    get_index().add(data.get("zone"), "message", message, source=sender)  # zone-less messages match every zone
 
     # Simulated AI logic response
     response_message = f"✔️ Hello {sender}, your message was received at {timestamp}."
@@ -23,6 +39,49 @@ def receive_message():
         "response": response_message
     })
 
+@app.route('/models', methods=['GET'])
+def models():
+    """
+    Servable zones and targets; with ?zone=...&target=... the model's expected features.
+    """
+    zone, target = request.args.get("zone"), request.args.get("target")
+    if zone is None or target is None:
+        return jsonify(get_registry().zones())
+    try:
+        return jsonify(get_registry().batcher(zone, target).served.describe())
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": str(e).strip("'")}), 404
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """
+    {"zone": ..., "target": ..., "instances": [{feature: value}, ...] or [[values in feature order], ...]}
+    Concurrent requests for the same model are answered by one batched predict call.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    zone, target, instances = data.get("zone"), data.get("target"), data.get("instances")
+    if not zone or not target or not isinstance(instances, list):
+        return jsonify({"error": "zone, target and a list of instances are required"}), 400
+    try:
+        with span("comm.predict"):
+            result = get_registry().predict(zone, target, instances)
+    except KeyError as e:
+        return jsonify({"error": str(e).strip("'")}), 404
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"zone": zone, "target": target, **result})
+
+@app.route('/predict/stats', methods=['GET'])
+def predict_stats():
+    return jsonify(get_registry().stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # This server's own spans; each dashboard exports its spans on its own port (see instrumentation.start_metrics_server)
+    # Model histograms exist only once a model route has loaded model serving
+    serving = get_registry().prometheus_text() if "model_serving" in sys.modules else ""
+    return Response(prometheus_text() + serving, mimetype="text/plain; version=0.0.4")
+
 if __name__ == '__main__':
     print("🚀 AI Agent Receiver running on http://localhost:5001")
-    app.run(host='0.0.0.0', port=5001)
+    app.run(host='0.0.0.0', port=5001, threaded=True)
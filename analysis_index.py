@@ -0,0 +1,179 @@
+# analysis_index.py
+
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from constants import ANALYSIS_INDEX_PATH
+from sensor_catalog import zone_from_filename
+from instrumentation import span
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+FINDING_CHARS = 400  # each past finding is cut to this length inside prompts
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> list:
+    return [t for t in re.findall(r"[a-z0-9]+", str(text).lower()) if t not in STOPWORDS]
+
+
+class AnalysisIndex:
+    """
+    BM25 index over LLM analyses, assistant replies and inter-AI messages.
+    Documents are appended to a JSONL file; the in-memory postings are built
+    from it once and then updated incrementally, including lines appended by
+    other processes (the dashboards and ai_comm_server share the file).
+    """
+
+    def __init__(self, path: str = ANALYSIS_INDEX_PATH):
+        self.path = path
+        self.docs = []
+        self.postings = {}     # term -> {doc id: term frequency}
+        self.doc_lengths = []
+        self.total_length = 0
+        self._offset = 0       # bytes of the file already indexed
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _index(self, doc: dict):
+        doc_id = len(self.docs)
+        tokens = tokenize(doc["text"])
+        self.docs.append(doc)
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        for token in tokens:
+            postings = self.postings.setdefault(token, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def _refresh(self):
+        """
+        Index lines appended to the file since the last refresh.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        size = os.path.getsize(self.path)
+        if size <= self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        end = chunk.rfind(b"\n") + 1  # leave a partially written last line for next time
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                try:
+                    self._index(json.loads(line))
+                except ValueError:
+                    continue
+        self._offset += end
+
+    def add(self, zone, kind: str, text: str, source: str = None, ts: float = None) -> dict:
+        """
+        Index one finding and append it to the file.
+        kind is "analysis", "assistant" or "message".
+        """
+        if not text:
+            return None
+        doc = {
+            "ts": ts if ts is not None else time.time(),
+            "zone": zone,
+            "area": zone_from_filename(zone) if zone else None,
+            "kind": kind,
+            "source": source,
+            "text": text,
+        }
+        line = (json.dumps(doc) + "\n").encode()
+        with self._lock:
+            self._refresh()
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "ab") as f:
+                    f.write(line)
+                self._offset += len(line)
+            self._index(doc)
+        return doc
+
+    def search(self, query: str, k: int = 3, zone=None, since: float = None, until: float = None,
+               kinds=None) -> list:
+        """
+        Top-k documents by BM25 score for the query, optionally restricted to a
+        zone (file name or area such as "Desert"), a time window (epoch seconds)
+        and document kinds. Documents without a zone (inter-AI messages that
+        name none) match every zone. An empty query returns the most recent matches.
+        """
+        with self._lock, span("analysis_index.search"):
+            self._refresh()
+
+            def allowed(doc):
+                if zone is not None and doc["zone"] is not None and zone not in (doc["zone"], doc["area"]):
+                    return False
+                if since is not None and doc["ts"] < since:
+                    return False
+                if until is not None and doc["ts"] > until:
+                    return False
+                return kinds is None or doc["kind"] in kinds
+
+            terms = set(tokenize(query))
+            scores = {}
+            n_docs = len(self.docs)
+            avg_length = self.total_length / n_docs if n_docs else 0.0
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / (avg_length or 1))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            if scores:
+                ranked = sorted(scores, key=lambda d: (scores[d], self.docs[d]["ts"]), reverse=True)
+            else:
+                ranked = range(n_docs - 1, -1, -1)
+            hits = []
+            for doc_id in ranked:
+                doc = self.docs[doc_id]
+                if allowed(doc):
+                    hits.append({**doc, "score": scores.get(doc_id, 0.0)})
+                    if len(hits) == k:
+                        break
+            return hits
+
+    def __len__(self):
+        return len(self.docs)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> AnalysisIndex:
+    """
+    Process-wide index backed by ANALYSIS_INDEX_PATH.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = AnalysisIndex()
+        return _index
+
+
+def relevant_findings(zone, query: str, k: int = 3) -> list:
+    """
+    The few most relevant past findings for a zone, as short lines for a prompt.
+    """
+    findings = []
+    for doc in get_index().search(query, k=k, zone=zone):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(doc["ts"]))
+        text = " ".join(doc["text"].split())
+        if len(text) > FINDING_CHARS:
+            text = text[:FINDING_CHARS].rstrip() + "…"
+        findings.append(f"[{when}] {doc['kind']}: {text}")
+    return findings
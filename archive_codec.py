@@ -0,0 +1,467 @@
+# archive_codec.py
+#
+# Compressed long-term archive of the zone datasets, one file per dataset:
+#   python archive_codec.py                       # archive every dataset in DATA_DIR
+#   python archive_codec.py --codec lzma --out data/archive
+
+import argparse
+import json
+import lzma
+import os
+import struct
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from constants import DATA_DIR, ARCHIVE_DIR, ARCHIVE_BLOCK_ROWS, ARCHIVE_CODEC
+from dataset_loader import find_time_column, parse_timestamps
+from regular_series import detect_time_format
+from instrumentation import span, count
+
+# File layout: blocks, then the JSON index, then a fixed footer pointing at the index.
+MAGIC = b"B2AR"
+FORMAT_VERSION = 1
+FOOTER = struct.Struct("<QQ4s")  # index offset, index length, magic
+EXTENSION = ".b2a"
+NAT = np.iinfo(np.int64).min  # missing timestamp
+MAX_DECIMALS = 9  # most decimal places tried before falling back to float bits
+CODECS = {
+    "zlib": (lambda raw: zlib.compress(raw, 6), zlib.decompress),
+    "lzma": (lambda raw: lzma.compress(raw, preset=6), lzma.decompress),
+    "none": (bytes, bytes),
+}
+
+
+# -------------------------
+# COLUMN ENCODINGS
+# -------------------------
+def _shuffle(values: np.ndarray) -> bytes:
+    """
+    Byte-shuffle: all first bytes, then all second bytes, ... so the slowly
+    changing high bytes of neighbouring readings end up next to each other.
+    """
+    return np.ascontiguousarray(values.view(np.uint8).reshape(len(values), values.itemsize).T).tobytes()
+
+
+def _unshuffle(raw: bytes, dtype, rows: int) -> np.ndarray:
+    dtype = np.dtype(dtype)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(dtype.itemsize, rows).T.copy().view(dtype).ravel()
+
+
+def _xor_previous(bits: np.ndarray) -> np.ndarray:
+    """
+    Gorilla-style XOR with the previous value: repeated or close readings
+    leave mostly zero bits.
+    """
+    encoded = bits.copy()
+    encoded[1:] ^= bits[:-1]
+    return encoded
+
+
+def _delta_of_delta(ns: np.ndarray) -> np.ndarray:
+    """
+    [first, first step, change of step...]: all zeros after the first two for a regular cadence.
+    Wrapping int64 arithmetic keeps it lossless for NaT gaps.
+    """
+    encoded = np.empty_like(ns)
+    encoded[:1] = ns[:1]
+    if len(ns) > 1:
+        steps = np.diff(ns)
+        encoded[1] = steps[0]
+        encoded[2:] = np.diff(steps)
+    return encoded
+
+
+def _undo_delta_of_delta(encoded: np.ndarray) -> np.ndarray:
+    if len(encoded) < 2:
+        return encoded.copy()
+    steps = np.cumsum(encoded[1:])
+    return np.concatenate([encoded[:1], encoded[0] + np.cumsum(steps)])
+
+
+def _fits_float32(values: np.ndarray) -> bool:
+    """
+    True when every value survives a float32 round trip bit for bit (the loggers
+    record float32; the CSVs print them as long float64 reprs).
+    """
+    with np.errstate(over="ignore", invalid="ignore"):
+        narrowed = values.astype(np.float32)
+    return np.array_equal(narrowed.astype(np.float64).view(np.uint64), values.view(np.uint64))
+
+
+def _decimal_places(values: np.ndarray):
+    """
+    The fewest decimal places (up to MAX_DECIMALS) at which every non-NaN value
+    is exactly round(v * 10**places) / 10**places, or None. Most loggers print
+    a fixed number of decimals, and scaled integers compress far better than
+    the float bits of 449.3 or 887.284021.
+    """
+    finite = values[~np.isnan(values)]
+    if not finite.size or not np.isfinite(finite).all():
+        return None
+    for places in range(MAX_DECIMALS + 1):
+        factor = 10.0 ** places
+        scaled = np.round(finite * factor)
+        if np.abs(scaled).max() >= 2 ** 53:
+            return None
+        if np.array_equal((scaled.astype(np.int64) / factor).view(np.uint64), finite.view(np.uint64)):
+            return places
+    return None
+
+
+def _encode_column(values: np.ndarray, is_time: bool) -> tuple:
+    """
+    (kind, raw bytes) for one column of one block.
+    """
+    if is_time:
+        return "dod", _shuffle(_delta_of_delta(values))
+    if values.dtype.kind == "f":
+        values = values.astype(np.float64, copy=False)
+        places = _decimal_places(values)
+        if places is not None:
+            # NaN rows repeat the previous value (a zero delta) and are restored from a bit mask
+            missing = np.isnan(values)
+            scaled = pd.Series(np.round(values * 10.0 ** places)).ffill().fillna(0).to_numpy().astype(np.int64)
+            scaled[1:] = np.diff(scaled)
+            return f"dec{places}", np.packbits(missing).tobytes() + _shuffle(scaled)
+        if _fits_float32(values):
+            return "xor32", _shuffle(_xor_previous(values.astype(np.float32).view(np.uint32)))
+        return "xor64", _shuffle(_xor_previous(values.view(np.uint64)))
+    if values.dtype.kind in "iub":
+        deltas = values.astype(np.int64)
+        deltas[1:] = np.diff(deltas)
+        return "delta", _shuffle(deltas)
+    return "json", json.dumps([None if pd.isna(v) else str(v) for v in values]).encode()
+
+
+def _decode_column(kind: str, raw: bytes, rows: int) -> np.ndarray:
+    if kind == "dod":
+        return _undo_delta_of_delta(_unshuffle(raw, np.int64, rows))
+    if kind.startswith("dec"):
+        mask_bytes = (rows + 7) // 8
+        missing = np.unpackbits(np.frombuffer(raw[:mask_bytes], dtype=np.uint8), count=rows).astype(bool)
+        values = np.cumsum(_unshuffle(raw[mask_bytes:], np.int64, rows)) / 10.0 ** int(kind[3:])
+        values[missing] = np.nan
+        return values
+    if kind == "xor32":
+        return np.bitwise_xor.accumulate(_unshuffle(raw, np.uint32, rows)).view(np.float32).astype(np.float64)
+    if kind == "xor64":
+        return np.bitwise_xor.accumulate(_unshuffle(raw, np.uint64, rows)).view(np.float64)
+    if kind == "delta":
+        return np.cumsum(_unshuffle(raw, np.int64, rows))
+    if kind == "json":
+        return np.array(json.loads(raw.decode()), dtype=object)
+    raise ValueError(f"unknown column encoding: {kind}")
+
+
+# -------------------------
+# WRITING
+# -------------------------
+def _time_ns(df: pd.DataFrame, time_col):
+    if time_col is None:
+        return None
+    stamps = parse_timestamps(df, time_col)
+    ns = stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    ns[stamps.isna().to_numpy()] = NAT
+    return ns
+
+
+def _frame_layout(df: pd.DataFrame) -> dict:
+    """
+    Column names, dtypes and the time column of a frame, as stored in the index.
+    """
+    time_col = find_time_column(df)
+    time_format = df.attrs.get("time_format")
+    as_strings = time_col is not None and not pd.api.types.is_datetime64_any_dtype(df[time_col])
+    if as_strings and time_format is None and len(df):
+        time_format = detect_time_format(df[time_col], parse_timestamps(df, time_col))
+    # Timestamp strings in no known layout are kept verbatim (blocks are still pruned by time)
+    time_dtype = "object" if as_strings and time_format is None else "datetime64[ns]"
+    return {
+        "time_col": time_col,
+        "time_format": time_format,
+        "columns": [{"name": c, "dtype": time_dtype if c == time_col else str(df[c].dtype)} for c in df.columns],
+    }
+
+
+def _encode_blocks(df: pd.DataFrame, layout: dict, block_rows: int, codec: str):
+    """
+    Yield (index entry, block bytes) for consecutive blocks of `block_rows` rows.
+    Every column of a block is compressed on its own, so a reader can skip columns.
+    """
+    compress = CODECS[codec][0]
+    time_col = layout["time_col"]
+    ns = _time_ns(df, time_col)
+    encode_ns = {c["name"]: c["dtype"] for c in layout["columns"]}.get(time_col) == "datetime64[ns]"
+    arrays = {c: (ns if c == time_col and encode_ns else df[c].to_numpy()) for c in df.columns}
+    for start in range(0, len(df), block_rows):
+        stop = min(start + block_rows, len(df))
+        segments, parts = [], []
+        for c in df.columns:
+            kind, raw = _encode_column(arrays[c][start:stop], c == time_col and encode_ns)
+            packed = compress(raw)
+            segments.append([kind, len(packed)])
+            parts.append(packed)
+        entry = {"rows": stop - start, "min_ts": None, "max_ts": None, "segments": segments}
+        if ns is not None:
+            valid = ns[start:stop][ns[start:stop] != NAT]
+            if len(valid):
+                entry["min_ts"], entry["max_ts"] = int(valid.min()), int(valid.max())
+        yield entry, b"".join(parts)
+
+
+def _write_file(path: str, index: dict, old_path: str = None, old_blocks=(), new_blocks=()):
+    """
+    Write blocks (raw byte copies of `old_blocks` from `old_path`, then the
+    encoded `new_blocks`), the index and the footer to a temp file and rename
+    it over `path`, so readers never see a half-written archive.
+    """
+    tmp = f"{path}.tmp{os.getpid()}"
+    blocks = []
+    with open(tmp, "wb") as out:
+        if old_blocks:
+            with open(old_path, "rb") as old:
+                for entry in old_blocks:
+                    old.seek(entry["offset"])
+                    blocks.append(dict(entry, offset=out.tell()))
+                    out.write(old.read(sum(length for _, length in entry["segments"])))
+        for entry, payload in new_blocks:
+            blocks.append(dict(entry, offset=out.tell()))
+            out.write(payload)
+        index = dict(index, blocks=blocks, rows=sum(b["rows"] for b in blocks))
+        raw = json.dumps(index).encode()
+        offset = out.tell()
+        out.write(raw)
+        out.write(FOOTER.pack(offset, len(raw), MAGIC))
+    os.replace(tmp, path)
+    return index
+
+
+def write_archive(df: pd.DataFrame, path: str, dataset: str = None, block_rows: int = ARCHIVE_BLOCK_ROWS,
+                  codec: str = ARCHIVE_CODEC, sources: dict = None) -> dict:
+    """
+    Archive a whole frame, replacing any archive at `path`. Returns the index.
+    `sources` (file -> {"mtime_ns", "size"}) records what the archive was built from.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec: {codec}")
+    layout = _frame_layout(df)
+    index = {"version": FORMAT_VERSION, "dataset": dataset, "codec": codec, "block_rows": block_rows,
+             **layout, "sources": sources or {}}
+    with span("archive.write"):
+        index = _write_file(path, index, new_blocks=_encode_blocks(df, layout, block_rows, codec))
+    count("archive.rows_written", len(df))
+    return index
+
+
+def append_archive(df: pd.DataFrame, path: str, sources: dict = None) -> dict:
+    """
+    Add rows to an existing archive as new blocks; existing blocks are copied,
+    not re-encoded. The columns must match the archive's.
+    """
+    archive = Archive(path)
+    layout = _frame_layout(df)
+    if layout["columns"] != archive.index["columns"] or layout["time_col"] != archive.time_col:
+        raise ValueError(f"columns of the new rows do not match {path}")
+    index = {k: v for k, v in archive.index.items() if k not in ("blocks", "rows")}
+    index["sources"] = {**archive.index.get("sources", {}), **(sources or {})}
+    with span("archive.append"):
+        index = _write_file(path, index, path, archive.index["blocks"],
+                            _encode_blocks(df, archive.index, archive.index["block_rows"], archive.index["codec"]))
+    count("archive.rows_written", len(df))
+    return index
+
+
+# -------------------------
+# READING
+# -------------------------
+class Archive:
+    """
+    One archive file. The index (block offsets, row counts, timestamp ranges)
+    is read once; read() seeks to the blocks overlapping the requested time
+    range and decompresses only the requested columns of those blocks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            f.seek(-FOOTER.size, os.SEEK_END)
+            offset, length, magic = FOOTER.unpack(f.read(FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"not a B2Twin archive: {path}")
+            f.seek(offset)
+            self.index = json.loads(f.read(length))
+        if self.index["version"] > FORMAT_VERSION:
+            raise ValueError(f"{path} was written by a newer archive format ({self.index['version']})")
+        self.columns = [c["name"] for c in self.index["columns"]]
+        self.dtypes = {c["name"]: c["dtype"] for c in self.index["columns"]}
+        self.time_col = self.index["time_col"]
+
+    def __len__(self):
+        return self.index["rows"]
+
+    @property
+    def nbytes(self) -> int:
+        return os.path.getsize(self.path)
+
+    def time_range(self) -> tuple:
+        stamps = [(b["min_ts"], b["max_ts"]) for b in self.index["blocks"] if b["min_ts"] is not None]
+        if not stamps:
+            return None, None
+        return pd.Timestamp(min(s[0] for s in stamps)), pd.Timestamp(max(s[1] for s in stamps))
+
+    def blocks_for(self, start=None, end=None) -> list:
+        """
+        Indexes of the blocks overlapping [start, end], in time order. Blocks
+        without timestamps cannot be pruned and are always included.
+        """
+        lo = pd.Timestamp(start).value if start is not None else None
+        hi = pd.Timestamp(end).value if end is not None else None
+        selected = []
+        for i, block in enumerate(self.index["blocks"]):
+            if block["min_ts"] is not None:
+                if hi is not None and block["min_ts"] > hi:
+                    continue
+                if lo is not None and block["max_ts"] < lo:
+                    continue
+            selected.append(i)
+        return sorted(selected, key=lambda i: (self.index["blocks"][i]["min_ts"] is None, self.index["blocks"][i]["min_ts"] or 0, i))
+
+    def _read_block(self, f, block: dict, wanted: list) -> dict:
+        decompress = CODECS[self.index["codec"]][1]
+        arrays, position = {}, block["offset"]
+        for name, (kind, length) in zip(self.columns, block["segments"]):
+            if name in wanted:
+                f.seek(position)
+                arrays[name] = _decode_column(kind, decompress(f.read(length)), block["rows"])
+            position += length
+        return arrays
+
+    def read(self, start=None, end=None, columns=None) -> pd.DataFrame:
+        """
+        Rows in [start, end] (inclusive), decoding only the overlapping blocks.
+        `columns` projects the result (the time column is always kept). The
+        time column comes back as datetime64 with the original string layout
+        in attrs["time_format"], like the shared column cache.
+        """
+        wanted = list(self.columns) if columns is None else (
+            ([self.time_col] if self.time_col and self.time_col not in columns else []) + [c for c in self.columns if c in columns])
+        wanted = [c for c in self.columns if c in wanted]
+        selected = self.blocks_for(start, end)
+        lo = pd.Timestamp(start).value if start is not None else None
+        hi = pd.Timestamp(end).value if end is not None else None
+        pieces = {c: [] for c in wanted}
+        with span("archive.read"), open(self.path, "rb") as f:
+            for i in selected:
+                block = self.index["blocks"][i]
+                arrays = self._read_block(f, block, wanted if self.time_col in wanted or self.time_col is None
+                                          else wanted + [self.time_col])
+                inside = block["min_ts"] is not None and (lo is None or block["min_ts"] >= lo) and (hi is None or block["max_ts"] <= hi)
+                if self.time_col is not None and (lo is not None or hi is not None) and not inside:
+                    ns = arrays[self.time_col]
+                    if self.dtypes[self.time_col] == "object":
+                        ns = _time_ns(pd.DataFrame({self.time_col: ns}), self.time_col)
+                    keep = ns != NAT
+                    if lo is not None:
+                        keep &= ns >= lo
+                    if hi is not None:
+                        keep &= ns <= hi
+                    arrays = {c: a[keep] for c, a in arrays.items()}
+                for c in wanted:
+                    pieces[c].append(arrays[c])
+        count("archive.blocks_read", len(selected))
+        data = {}
+        for c in wanted:
+            values = np.concatenate(pieces[c]) if pieces[c] else np.empty(0)
+            if c == self.time_col and self.dtypes[c] != "object":
+                data[c] = np.where(values == NAT, np.datetime64("NaT"), values.astype("datetime64[ns]"))
+            elif values.dtype == object:
+                data[c] = pd.array(values, dtype=self.dtypes[c])
+            else:
+                data[c] = values.astype(self.dtypes[c], copy=False)
+        df = pd.DataFrame(data, columns=wanted)
+        if self.index.get("time_format"):
+            df.attrs["time_format"] = self.index["time_format"]
+        return df
+
+
+def restore_time_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The frame with its datetime64 time column printed back in the source
+    layout recorded in attrs["time_format"] (a no-op without one).
+    """
+    time_col, time_format = find_time_column(df), df.attrs.get("time_format")
+    if time_col is None or time_format is None or not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+        return df
+    out = df.copy()
+    out[time_col] = pd.DatetimeIndex(df[time_col]).strftime(time_format).to_numpy(dtype=object)
+    out.attrs.pop("time_format", None)
+    return out
+
+
+# -------------------------
+# DATASET ARCHIVES
+# -------------------------
+def archive_path(dataset: str, out_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(out_dir, dataset + EXTENSION)
+
+
+def archive_datasets(data_dir: str = DATA_DIR, out_dir: str = ARCHIVE_DIR, codec: str = ARCHIVE_CODEC,
+                     block_rows: int = ARCHIVE_BLOCK_ROWS) -> dict:
+    """
+    Bring the archive of every dataset in the partitioned store up to date:
+    new monthly partitions are appended as new blocks, and an archive whose
+    source files changed or disappeared is rebuilt. Returns per-dataset
+    {"action", "rows", "csv_bytes", "archive_bytes"}.
+    """
+    from partitioned_store import get_store, load_shared_frame  # partitioned_store builds on regular_series too
+
+    store = get_store(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    report = {}
+    for dataset in store.datasets():
+        parts = store.partitions_for(dataset)
+        sources = {p["file"]: {"mtime_ns": p["mtime_ns"], "size": p["size"]} for p in parts}
+        path = archive_path(dataset, out_dir)
+        known = Archive(path).index.get("sources", {}) if os.path.exists(path) else None
+        new = [p for p in parts if known is not None and p["file"] not in known]
+        if known == sources:
+            action = "unchanged"
+        elif known is not None and new and all(sources.get(f) == s for f, s in known.items()):
+            frames = [load_shared_frame(os.path.join(data_dir, p["file"])) for p in new]
+            append_archive(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True), path,
+                           {p["file"]: sources[p["file"]] for p in new})
+            action = f"appended {len(new)}"
+        else:
+            write_archive(store.query(dataset), path, dataset, block_rows, codec, sources)
+            action = "written"
+        report[dataset] = {"action": action, "rows": len(Archive(path)),
+                           "csv_bytes": sum(p["size"] for p in parts), "archive_bytes": os.path.getsize(path)}
+    return report
+
+
+def open_archive(dataset: str, out_dir: str = ARCHIVE_DIR) -> Archive:
+    return Archive(archive_path(dataset, out_dir))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive the B2Twin zone datasets in the compressed block format")
+    parser.add_argument("--data", default=DATA_DIR, help="directory with the zone CSVs")
+    parser.add_argument("--out", default=ARCHIVE_DIR, help="archive directory")
+    parser.add_argument("--codec", default=ARCHIVE_CODEC, choices=sorted(CODECS))
+    parser.add_argument("--block-rows", type=int, default=ARCHIVE_BLOCK_ROWS)
+    args = parser.parse_args(argv)
+
+    report = archive_datasets(args.data, args.out, args.codec, args.block_rows)
+    csv_total = sum(r["csv_bytes"] for r in report.values())
+    archive_total = sum(r["archive_bytes"] for r in report.values())
+    for dataset, r in report.items():
+        print(f"{dataset:40s} {r['action']:12s} {r['rows']:>8d} rows  {r['csv_bytes'] / 1024:8.0f} KiB -> {r['archive_bytes'] / 1024:6.0f} KiB")
+    if csv_total:
+        print(f"Total: {csv_total / 1024:.0f} KiB of CSV in {archive_total / 1024:.0f} KiB ({archive_total / csv_total:.1%})")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# batch_runner.py
+#
+# Headless digital-twin pipeline for scheduled runs:
+#   python batch_runner.py --zones Desert Ocean --start 2025-02-10 --end 2025-02-20 --out results
+
+import argparse
+import datetime
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from constants import DATA_DIR
+from partitioned_store import get_store
+from prompt_engine import build_prompt
+from ml_utils_simple import fit_model
+from summary_engine import summarize_frame
+from rule_engine import evaluate_frame
+from llm_gateway import LLMGateway, BATCH
+from analysis_index import get_index, relevant_findings
+
+
+def process_zone(data_dir: str, file_name: str, start=None, end=None) -> dict:
+    """
+    CPU-bound part of the pipeline for one zone dataset; runs inside a worker
+    process. Reads the month partitions overlapping [start, end], scores
+    health, trains a model per numeric target and builds the LLM prompt.
+    Returns plain, picklable results.
+    """
+    started = datetime.datetime.now()
+    store = get_store(data_dir)
+    partitions = store.partitions_for(file_name, start, end)
+    df = store.query(file_name, start, end)
+    result = {"zone": file_name, "rows": len(df), "partitions": [p["file"] for p in partitions],
+              "started": started.isoformat(timespec="seconds")}
+    if df.empty:
+        result.update(status="❓ No Data", color="gray", healthy=False, models=[], predictions=None, prompt=None)
+        return result
+
+    health = evaluate_frame(df, file_name)
+    status, color, healthy = health["status"], health["color"], health["healthy"]
+    summary = summarize_frame(df)
+
+    models = []
+    prediction_frames = []
+    for target in df.select_dtypes(include=["float64", "int64"]).columns:
+        fitted = fit_model(df, target, file_name)
+        if fitted is None:
+            models.append({"target": target, "trained": False})
+            continue
+        # Residuals against the rows the model was fitted on: single-sensor
+        # files drop the lag warm-up, not only the rows with gaps
+        preds = fitted["model"].predict(fitted["X"])
+        actual = np.asarray(fitted["y"], dtype=np.float64)
+        residual = actual - preds
+        models.append({
+            "target": target,
+            "trained": True,
+            "mae": float(np.mean(np.abs(residual))),
+            "rmse": float(np.sqrt(np.mean(residual ** 2))),
+        })
+        prediction_frames.append(pd.DataFrame({
+            "zone": file_name,
+            "target": target,
+            "row": np.arange(len(preds)),
+            "actual": actual,
+            "prediction": preds,
+        }))
+
+    result.update(
+        status=status,
+        color=color,
+        healthy=healthy,
+        alerts={"active": health["active"], "raised": sum(e["event"] == "raise" for e in health["events"])},
+        summary=summary.to_frame().reset_index(names="column").to_dict(orient="records"),
+        models=models,
+        predictions=pd.concat(prediction_frames, ignore_index=True) if prediction_frames else None,
+        prompt=build_prompt(file_name, df, relevant_findings(file_name, f"{file_name} {' '.join(df.columns)}")),
+    )
+    return result
+
+
+def query_llm(gateway: LLMGateway, prompt: str) -> str:
+    try:
+        return gateway.generate(prompt, BATCH).get("response", "⚠️ No response from LLM.")
+    except Exception as e:
+        return f"Error querying LLM: {e}"
+
+
+def send_agent_message(port: str, zone: str, analysis: str) -> str:
+    import requests
+
+    try:
+        payload = {"from_agent": "B2Twin-Batch-Runner", "message": f"🌱 Batch analysis for zone: {zone}.\n{analysis}"}
+        response = requests.post(f"http://localhost:{port}/receive-message", json=payload, timeout=30)
+        return response.json().get("response")
+    except Exception as e:
+        return f"Error sending message: {e}"
+
+
+def select_zone_files(data_dir: str, zone_filters=None) -> list:
+    """
+    Zone datasets (all months of one zone and sensor, e.g. "Desert_CO2"),
+    optionally keeping only those whose name contains one of the filters
+    (case-insensitive).
+    """
+    datasets = get_store(data_dir).datasets()
+    if not zone_filters:
+        return datasets
+    wanted = [z.lower() for z in zone_filters]
+    return [d for d in datasets if any(w in d.lower() for w in wanted)]
+
+
+def write_table(df: pd.DataFrame, path_stem: str) -> str:
+    """
+    Write Parquet when a Parquet engine is installed, CSV otherwise.
+    """
+    try:
+        df.to_parquet(path_stem + ".parquet", index=False)
+        return path_stem + ".parquet"
+    except ImportError:
+        df.to_csv(path_stem + ".csv", index=False)
+        return path_stem + ".csv"
+
+
+def run_batch(data_dir=DATA_DIR, zones=None, start=None, end=None, workers=None,
+              llm=True, llm_concurrency=2, notify_port=None, out_dir="results") -> dict:
+    files = select_zone_files(data_dir, zones)
+    run_id = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.join(out_dir, f"run_{run_id}")
+    os.makedirs(run_dir, exist_ok=True)
+
+    results = {}
+    gateway = LLMGateway(concurrency=llm_concurrency)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as cpu_pool, \
+            ThreadPoolExecutor(max_workers=max(len(files), 1)) as io_pool:
+        llm_futures = {}
+        cpu_futures = {cpu_pool.submit(process_zone, data_dir, f, start, end): f for f in files}
+        for future in as_completed(cpu_futures):
+            zone = cpu_futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"zone": zone, "error": str(e), "prompt": None, "predictions": None}
+            results[zone] = result
+            if "error" in result:
+                print(f"❌ {zone}: {result['error']}", file=sys.stderr)
+            else:
+                print(f"✅ {zone}: {result['status']}", file=sys.stderr)
+            # LLM calls start as soon as each zone's CPU work finishes
+            if llm and result.get("prompt"):
+                llm_futures[io_pool.submit(query_llm, gateway, result["prompt"])] = zone
+
+        for future in as_completed(llm_futures):
+            zone = llm_futures[future]
+            results[zone]["llm_analysis"] = future.result()
+            if not results[zone]["llm_analysis"].startswith("Error querying LLM"):
+                get_index().add(zone, "analysis", results[zone]["llm_analysis"], source="batch_runner")
+            if notify_port:
+                results[zone]["agent_response"] = send_agent_message(notify_port, zone, results[zone]["llm_analysis"])
+
+    prediction_frames = [r.pop("predictions") for r in results.values() if r.get("predictions") is not None]
+    outputs = {}
+    if prediction_frames:
+        outputs["predictions"] = write_table(pd.concat(prediction_frames, ignore_index=True), os.path.join(run_dir, "predictions"))
+    health = pd.DataFrame([
+        {"zone": z, "rows": r.get("rows"), "status": r.get("status"), "healthy": r.get("healthy")}
+        for z, r in sorted(results.items())
+    ])
+    outputs["health"] = write_table(health, os.path.join(run_dir, "health"))
+
+    report = {
+        "run_id": run_id,
+        "data_dir": data_dir,
+        "zones": sorted(results),
+        "start": str(start) if start else None,
+        "end": str(end) if end else None,
+        "outputs": outputs,
+        "failed": sorted(z for z, r in results.items() if "error" in r),
+        "llm_gateway": gateway.stats() if llm else None,
+        "results": {z: {k: v for k, v in r.items() if k != "prompt"} for z, r in sorted(results.items())},
+    }
+    with open(os.path.join(run_dir, "results.json"), "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the B2Twin pipeline for all zones without the UI")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--zones", nargs="*", help="only zone datasets whose name contains one of these")
+    parser.add_argument("--start", help="first timestamp to include, e.g. 2025-02-10")
+    parser.add_argument("--end", help="last timestamp to include")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--llm-concurrency", type=int, default=2, help="concurrent Ollama requests")
+    parser.add_argument("--no-llm", action="store_true", help="skip the LLM analysis step")
+    parser.add_argument("--notify-port", help="send each analysis to the AI agent listening on this port")
+    parser.add_argument("--out", default="results", help="output directory")
+    args = parser.parse_args(argv)
+
+    report = run_batch(args.data_dir, args.zones, args.start, args.end, args.workers,
+                       not args.no_llm, args.llm_concurrency, args.notify_port, args.out)
+    print(json.dumps({"run_id": report["run_id"], "zones": len(report["zones"]), "failed": report["failed"],
+                      "outputs": report["outputs"]}))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
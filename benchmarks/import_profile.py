@@ -0,0 +1,172 @@
+# import_profile.py
+#
+# Cold-start import profile of the app entry points: for each one, the
+# modules its top-level import statements load before it can render or serve
+# anything, with per-module cumulative import time from `python -X importtime`.
+# Usage (from the repository root):
+#   python benchmarks/import_profile.py
+#   python benchmarks/import_profile.py --repeat 5 --check --out import_profile.json
+
+import argparse
+import ast
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = (
+    "digital_twin_simulator.py",
+    "zone_visualizer_for_data.py",
+    "ai_comm_server.py",
+    "batch_runner.py",
+    "old_code/ollama_chat.py",
+)
+# Heavy dependencies that must load only when the feature using them runs
+DEFERRED = ("sklearn", "scipy", "statsmodels", "matplotlib", "plotly", "river", "joblib")
+MARKER = "--- entry point imports ---"
+TOP_MODULES = 15
+
+
+def startup_imports(path: str) -> str:
+    """
+    The module-level import statements of a file, as source. Imports inside
+    functions (the deferred ones) are not part of start-up.
+    """
+    with open(path) as f:
+        tree = ast.parse(f.read(), filename=path)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def parse_importtime(stderr: str) -> list:
+    """
+    [(depth, module, self_us, cumulative_us)] from -X importtime output after MARKER.
+    """
+    rows = []
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_once(entry: str) -> dict:
+    path = os.path.join(ROOT, entry)
+    code = "\n".join([
+        "import json, sys, time",
+        f"sys.path[:0] = [{os.path.dirname(path)!r}, {ROOT!r}]",
+        f"sys.stderr.write({MARKER!r} + '\\n'); sys.stderr.flush()",
+        "start = time.perf_counter()",
+        startup_imports(path),
+        "elapsed = time.perf_counter() - start",
+        f"print(json.dumps({{'wall_s': elapsed, 'deferred_loaded': [m for m in {DEFERRED!r} if m in sys.modules]}}))",
+    ])
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"error": (proc.stderr.strip().splitlines() or ["unknown error"])[-1]}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["rows"] = parse_importtime(proc.stderr)
+    return result
+
+
+def profile_entry_point(entry: str, repeat: int = 3) -> dict:
+    """
+    Median start-up import wall time of one entry point over `repeat` fresh
+    interpreters, the median cumulative time of each module it imports
+    directly and of the slowest modules overall, and which DEFERRED
+    dependencies it loads.
+    """
+    runs = [profile_once(entry) for _ in range(repeat)]
+    failed = [r for r in runs if "error" in r]
+    if failed:
+        return {"error": failed[0]["error"]}
+    direct, overall = {}, {}
+    for run in runs:
+        for depth, name, _, cumulative_us in run["rows"]:
+            if depth == 0:
+                direct.setdefault(name, []).append(cumulative_us)
+            overall.setdefault(name, []).append(cumulative_us)
+
+    def top(times):
+        medians = {name: statistics.median(us) / 1000.0 for name, us in times.items()}
+        return dict(sorted(medians.items(), key=lambda item: -item[1])[:TOP_MODULES])
+
+    return {
+        "wall_s": statistics.median(r["wall_s"] for r in runs),
+        "runs_s": [r["wall_s"] for r in runs],
+        "modules_loaded": len(runs[0]["rows"]),
+        "deferred_loaded": runs[0]["deferred_loaded"],
+        "direct_ms": top(direct),
+        "slowest_ms": top(overall),
+    }
+
+
+def profile_entry_points(entries=ENTRY_POINTS, repeat: int = 3) -> dict:
+    return {entry: profile_entry_point(entry, repeat) for entry in entries}
+
+
+def violations(profile: dict, budget_s: float = None) -> list:
+    """
+    Entry points that load a DEFERRED dependency at start-up or exceed the wall-time budget.
+    """
+    problems = []
+    for entry, result in profile.items():
+        if "error" in result:
+            continue
+        for module in result["deferred_loaded"]:
+            problems.append(f"{entry} imports {module} at start-up")
+        if budget_s is not None and result["wall_s"] > budget_s:
+            problems.append(f"{entry} start-up imports take {result['wall_s']:.2f} s (budget {budget_s:.2f} s)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start-up import time of the B2Twin entry points")
+    parser.add_argument("entries", nargs="*", default=list(ENTRY_POINTS), help="entry point files, relative to the repository root")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh interpreters per entry point")
+    parser.add_argument("--budget", type=float, default=None, help="max start-up import seconds per entry point (with --check)")
+    parser.add_argument("--check", action="store_true", help="exit 1 if an entry point loads a deferred dependency or exceeds --budget")
+    parser.add_argument("--out", default=None, help="write JSON results to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    profile = profile_entry_points(args.entries, args.repeat)
+    problems = violations(profile, args.budget)
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+        },
+        "entry_points": profile,
+        "violations": problems,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Import profile written to {args.out}")
+    else:
+        print(text)
+    for entry, result in profile.items():
+        summary = result.get("error") or f"{result['wall_s']:.3f} s, {result['modules_loaded']} modules"
+        print(f"{entry}: {summary}", file=sys.stderr)
+    for problem in problems:
+        print(f"FAIL: {problem}", file=sys.stderr)
+    if args.check and problems:
+        sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
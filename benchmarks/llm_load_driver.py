@@ -0,0 +1,182 @@
+# llm_load_driver.py
+#
+# Replays a realistic prompt mix against an Ollama-compatible server.
+# Usage (from the repository root):
+#   python benchmarks/llm_load_driver.py --clients 8 --requests 200 --latency 0.2 --token-rate 50
+#   python benchmarks/llm_load_driver.py --url http://localhost:11434/api/generate --mode gateway
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from synthetic_data import generate_dataset
+from dataset_loader import load_zone_datasets
+from prompt_engine import build_prompt, build_small_talk_prompt
+from fake_ollama_server import serve_in_thread, canned_response
+from llm_gateway import LLMGateway, CHAT, ANALYSIS, BATCH
+
+# share of each request kind in the replayed mix
+DEFAULT_MIX = {"analysis": 0.3, "small_talk": 0.2, "chat": 0.4, "batch": 0.1}
+PRIORITIES = {"analysis": ANALYSIS, "small_talk": CHAT, "chat": CHAT, "batch": BATCH}
+
+
+def build_prompt_pool(zones: dict) -> dict:
+    """
+    The prompts the dashboards actually send, built from real zone frames.
+    """
+    analysis = {name: build_prompt(name, df) for name, df in zones.items()}
+    small_talk = [build_small_talk_prompt(name, canned_response(p)) for name, p in analysis.items()]
+    chat = [
+        f"Analysis Context: {canned_response(p)}\nUser: What should we check first in {name}?\nAssistant: "
+        for name, p in analysis.items()
+    ]
+    return {"analysis": list(analysis.values()), "small_talk": small_talk, "chat": chat,
+            "batch": list(analysis.values())}
+
+
+def make_schedule(pool: dict, n_requests: int, mix: dict, seed: int, hot_share: float) -> list:
+    """
+    (kind, prompt) pairs. hot_share of analysis requests reuse the first zone's
+    prompt, as when several operators open the same zone.
+    """
+    rng = random.Random(seed)
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    schedule = []
+    for _ in range(n_requests):
+        kind = rng.choices(kinds, weights)[0]
+        prompts = pool[kind]
+        if kind == "analysis" and rng.random() < hot_share:
+            prompt = prompts[0]
+        else:
+            prompt = rng.choice(prompts)
+        schedule.append((kind, prompt))
+    return schedule
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def replay(url: str, schedule: list, clients: int, mode: str, stream: bool, concurrency: int) -> dict:
+    """
+    Send the schedule from `clients` threads. mode "direct" posts to the server
+    from per-client sessions; mode "gateway" goes through one LLMGateway.
+    """
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    gateway = LLMGateway(url=url, model="load-driver", concurrency=concurrency) if mode == "gateway" else None
+    local = threading.local()
+
+    def send(item):
+        kind, prompt = item
+        start = time.perf_counter()
+        try:
+            if gateway is not None:
+                gateway.generate(prompt, PRIORITIES[kind])
+            else:
+                session = getattr(local, "session", None)
+                if session is None:
+                    session = local.session = requests.Session()
+                payload = {"model": "load-driver", "prompt": prompt, "stream": stream}
+                response = session.post(url, json=payload, stream=stream, timeout=300)
+                response.raise_for_status()
+                if stream:
+                    for line in response.iter_lines():
+                        if line and json.loads(line).get("done"):
+                            break
+                else:
+                    response.json()
+            failed = False
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.setdefault(kind, []).append(elapsed)
+            errors[kind] = errors.get(kind, 0) + failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(send, schedule))
+    wall = time.perf_counter() - started
+
+    by_kind = {
+        kind: {
+            "requests": len(values),
+            "errors": errors.get(kind, 0),
+            "p50_s": _percentile(values, 0.50),
+            "p95_s": _percentile(values, 0.95),
+            "p99_s": _percentile(values, 0.99),
+            "mean_s": statistics.fmean(values),
+        }
+        for kind, values in sorted(latencies.items())
+    }
+    return {
+        "wall_s": wall,
+        "requests_per_s": len(schedule) / wall if wall else None,
+        "errors": sum(errors.values()),
+        "by_kind": by_kind,
+        "gateway": gateway.stats() if gateway is not None else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a dashboard-like prompt mix against an Ollama-compatible server")
+    parser.add_argument("--url", help="target /api/generate URL (default: start the fake server in-process)")
+    parser.add_argument("--data-dir", help="zone CSVs to build prompts from (default: synthetic data)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--clients", type=int, default=4, help="concurrent simulated users")
+    parser.add_argument("--mode", choices=["direct", "gateway"], default="direct")
+    parser.add_argument("--concurrency", type=int, default=1, help="gateway generation limit")
+    parser.add_argument("--stream", action="store_true", help="use streaming responses in direct mode")
+    parser.add_argument("--hot-share", type=float, default=0.5, help="share of analysis requests for the same zone")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake server: seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="fake server: tokens per second")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake server: share of failed requests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write JSON results to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir
+        if data_dir is None:
+            generate_dataset(tmp, 1, 1, 1, seed=args.seed)
+            data_dir = tmp
+        pool = build_prompt_pool(load_zone_datasets(data_dir))
+    schedule = make_schedule(pool, args.requests, DEFAULT_MIX, args.seed, args.hot_share)
+
+    if args.url:
+        result = replay(args.url, schedule, args.clients, args.mode, args.stream, args.concurrency)
+    else:
+        with serve_in_thread(latency_s=args.latency, tokens_per_s=args.token_rate,
+                             error_rate=args.error_rate, seed=args.seed) as url:
+            result = replay(url, schedule, args.clients, args.mode, args.stream, args.concurrency)
+    report = {"params": vars(args), "result": result}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Load driver results written to {args.out}")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# run_benchmarks.py
+#
+# Usage (from the repository root):
+#   python benchmarks/run_benchmarks.py --zones 2 --sensors 1 --months 3 --out bench_results.json
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from synthetic_data import generate_dataset
+from dataset_loader import load_zone_datasets
+from zone_health import assess_zone_health
+from ml_utils_simple import train_and_predict
+from prompt_engine import build_prompt, build_small_talk_prompt
+from fake_ollama_server import serve_in_thread
+from archive_codec import archive_datasets, open_archive
+from import_profile import profile_entry_points, violations
+
+
+def time_call(fn, repeat: int) -> dict:
+    """
+    Run fn `repeat` times and return timing statistics in seconds.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {
+        "runs": runs,
+        "min_s": min(runs),
+        "median_s": statistics.median(runs),
+        "mean_s": statistics.fmean(runs),
+    }
+
+
+# -------------------------
+# BENCHMARKS
+# -------------------------
+def bench_load(data_dir, repeat):
+    return time_call(lambda: load_zone_datasets(data_dir), repeat)
+
+
+def bench_health(zones, repeat):
+    return time_call(lambda: [assess_zone_health(df, file_name=name) for name, df in zones.items()], repeat)
+
+
+def bench_train(zones, repeat):
+    def run():
+        for df in zones.values():
+            numeric = df.select_dtypes(include=["float64", "int64"]).columns
+            if len(numeric):
+                train_and_predict(df, numeric[0])
+    return time_call(run, repeat)
+
+
+def bench_prompts(zones, repeat):
+    def run():
+        for name, df in zones.items():
+            summary = build_prompt(name, df)
+            build_small_talk_prompt(name, summary)
+    return time_call(run, repeat)
+
+
+def bench_comm_server(n_requests, repeat):
+    from ai_comm_server import app
+    client = app.test_client()
+    payload = {"from_agent": "bench", "message": "x" * 512}
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(n_requests):
+                client.post("/receive-message", json=payload)
+    result = time_call(run, repeat)
+    result["requests_per_s"] = n_requests / result["median_s"]
+    return result
+
+
+def bench_llm(zones, n_requests, latency_s, repeat):
+    name, df = next(iter(zones.items()))
+    prompt = build_prompt(name, df)
+    with serve_in_thread(latency_s=latency_s) as url:
+        session = requests.Session()
+
+        def run():
+            for _ in range(n_requests):
+                session.post(url, json={"model": "stub", "prompt": prompt, "stream": False}).json()
+        result = time_call(run, repeat)
+    result["requests_per_s"] = n_requests / result["median_s"]
+    result["stub_latency_s"] = latency_s
+    return result
+
+
+def bench_archive(data_dir, repeat):
+    """
+    Archive size against the CSVs, and reading every dataset back from the
+    archive against parsing the CSVs.
+    """
+    with tempfile.TemporaryDirectory() as out_dir:
+        report = archive_datasets(data_dir, out_dir)
+        result = time_call(lambda: [open_archive(name, out_dir).read() for name in report], repeat)
+    result["csv_bytes"] = sum(r["csv_bytes"] for r in report.values())
+    result["archive_bytes"] = sum(r["archive_bytes"] for r in report.values())
+    result["ratio"] = result["archive_bytes"] / result["csv_bytes"]
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_suite(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        files = generate_dataset(data_dir, args.zones, args.sensors, args.months, seed=args.seed)
+        zones = load_zone_datasets(data_dir)
+        rows = sum(len(df) for df in zones.values())
+
+        results["load_zone_datasets"] = bench_load(data_dir, args.repeat)
+        results["health_tracker"] = bench_health(zones, args.repeat)
+        results["train_and_predict"] = bench_train(zones, args.repeat)
+        results["prompt_builders"] = bench_prompts(zones, args.repeat)
+        results["ai_comm_server"] = bench_comm_server(args.requests, args.repeat)
+        results["archive_read"] = bench_archive(data_dir, args.repeat)
+        if not args.skip_llm:
+            results["llm_stub_roundtrip"] = bench_llm(zones, args.requests, args.llm_latency, args.repeat)
+    if not args.skip_imports:
+        profile = profile_entry_points(repeat=args.repeat)
+        results["startup_imports"] = {"entry_points": profile, "violations": violations(profile)}
+
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args),
+            "files": len(files),
+            "rows": rows,
+        },
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="B2Twin performance benchmarks on synthetic Biosphere 2 data")
+    parser.add_argument("--zones", type=int, default=1, help="zone replication factor")
+    parser.add_argument("--sensors", type=int, default=1, help="sensor columns multiplication factor")
+    parser.add_argument("--months", type=int, default=1, help="consecutive months per sensor")
+    parser.add_argument("--repeat", type=int, default=3, help="timed repetitions per benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="requests per server benchmark run")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="fake Ollama latency per request (s)")
+    parser.add_argument("--skip-llm", action="store_true", help="skip the fake Ollama round-trip benchmark")
+    parser.add_argument("--skip-imports", action="store_true", help="skip the start-up import profile")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="write JSON results to this path (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+        print(f"Benchmark results written to {args.out}")
+    else:
+        print(text)
+    for problem in report["results"].get("startup_imports", {}).get("violations", []):
+        print(f"FAIL: {problem}", file=sys.stderr)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# synthetic_data.py
+
+import os
+import numpy as np
+import pandas as pd
+
+# Grid positions used by the LEO-W HMP60 / SQ-110 / DVI7911 files (y_x_l)
+LEO_GRID = [
+    (4, 0, 1), (4, 0, 2), (4, 0, 3), (4, 0, 4),
+    (10, -2, 1), (10, -2, 2), (10, -2, 3), (10, -2, 4), (10, -2, 5),
+    (10, 2, 1), (10, 2, 2), (10, 2, 3), (10, 2, 4), (10, 2, 5),
+    (17, 0, 1), (17, 0, 2), (17, 0, 3), (17, 0, 4), (17, 0, 5),
+    (24, 0, 1), (24, 0, 2), (24, 0, 3), (24, 0, 4), (24, 0, 5),
+]
+
+# (file stem, column headers, baseline, daily amplitude, noise)
+SINGLE_SENSOR_FILES = [
+    ("Desert_CO2", ["CO2_desert[ppm]"], 400.0, 40.0, 8.0),
+    ("RF_CO2", ["CO2_MNT[ppm]", "CO2_LL1m[ppm]", "CO2_LL13m[ppm]"], 600.0, 150.0, 20.0),
+]
+TEMP_RH_FILES = ["Desert_Temp_RH", "RF_LowLand_Temp_RH", "RF_Mountain_Temp_RH", "RF_TigerPond_Temp_RH"]
+LEO_GRID_FILES = [
+    ("LEO-W_HMP60_Temp_degC", 25.0, 5.0, 0.3),
+    ("LEO-W_HMP60_RH_%", 30.0, 8.0, 0.5),
+    ("LEO-W_SQ-110_PAR_umolm-2s-1", 200.0, 400.0, 5.0),
+    ("LEO-W_DVI7911_ws_ms-1", 0.5, 0.5, 0.1),
+]
+OCEAN_COLUMNS = [("pH[pH]", 8.05, 0.02, 0.01), ("Temp[degC]", 25.1, 0.05, 0.02),
+                 ("Sal[psu]", 30.0, 0.1, 0.05), ("ODO[mgpl]", 6.4, 0.2, 0.05)]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+
+def _timestamps(year: int, month: int, freq: str = "15min") -> pd.DatetimeIndex:
+    start = pd.Timestamp(year=year, month=month, day=1)
+    end = start + pd.offsets.MonthBegin(1)
+    return pd.date_range(start, end, freq=freq, inclusive="left")
+
+
+def _diurnal(rng, stamps, base, amplitude, noise, n_cols):
+    """
+    Daily sinusoid plus noise, one column per sensor, with a small random phase per column.
+    """
+    hours = (stamps.hour + stamps.minute / 60.0).to_numpy()[:, None]
+    phase = rng.uniform(-1.5, 1.5, size=n_cols)[None, :]
+    wave = np.sin((hours - 9.0 + phase) / 24.0 * 2 * np.pi)
+    return base + amplitude * wave + rng.normal(0.0, noise, size=(len(stamps), n_cols))
+
+
+def _write(path, stamps, columns, values):
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, "DateTime", stamps.strftime("%Y-%m-%d %H:%M:%S"))
+    df.to_csv(path, index=False)
+    return path
+
+
+def generate_dataset(out_dir: str, zone_factor: int = 1, sensor_factor: int = 1, months: int = 1,
+                     start_year: int = 2025, start_month: int = 2, seed: int = 0) -> list:
+    """
+    Write synthetic Biosphere 2 CSVs that mimic the real file shapes and headers
+    into `out_dir` and return the written paths.
+
+    - zone_factor: replicate every zone this many times (Desert, Desert2, ...)
+    - sensor_factor: multiply the number of sensor columns per file
+    - months: number of consecutive monthly files per sensor (e.g. FEB-2025, MAR-2025)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    written = []
+    for m in range(months):
+        month_index = (start_month - 1 + m) % 12
+        year = start_year + (start_month - 1 + m) // 12
+        tag = f"{MONTHS[month_index]}-{year}"
+        stamps = _timestamps(year, month_index + 1)
+
+        for z in range(zone_factor):
+            suffix = "" if z == 0 else str(z + 1)
+
+            def stem(name):
+                head, _, tail = name.partition("_")
+                return f"{head}{suffix}_{tail}"
+
+            for name, cols, base, amp, noise in SINGLE_SENSOR_FILES:
+                columns = _scaled(cols, sensor_factor)
+                values = _diurnal(rng, stamps, base, amp, noise, len(columns))
+                written.append(_write(os.path.join(out_dir, f"{stem(name)}_{tag}.csv"), stamps, columns, values))
+
+            for name in TEMP_RH_FILES:
+                columns = _scaled(["Temp[F]", "RH[%]"], sensor_factor)
+                temps = _diurnal(rng, stamps, 25.0, 3.0, 0.2, len(columns) // 2)
+                rh = _diurnal(rng, stamps, 60.0, 10.0, 1.0, len(columns) // 2)
+                values = np.empty((len(stamps), len(columns)))
+                values[:, 0::2], values[:, 1::2] = temps, rh
+                written.append(_write(os.path.join(out_dir, f"{stem(name)}_{tag}.csv"), stamps, columns, values))
+
+            for name, base, amp, noise in LEO_GRID_FILES:
+                grid = [f"LEO-W_{y}_{x}_{l}" for y, x, l in LEO_GRID]
+                columns = _scaled(grid, sensor_factor)
+                values = _diurnal(rng, stamps, base, amp, noise, len(columns))
+                written.append(_write(os.path.join(out_dir, f"{stem(name)}_{tag}.csv"), stamps, columns, values))
+
+            columns = _scaled([c for c, *_ in OCEAN_COLUMNS], sensor_factor)
+            values = np.hstack([
+                _diurnal(rng, stamps, base, amp, noise, sensor_factor)
+                for _, base, amp, noise in OCEAN_COLUMNS
+            ])
+            # hstack groups by parameter; reorder to match the interleaved column list
+            order = np.arange(len(columns)).reshape(len(OCEAN_COLUMNS), sensor_factor).T.ravel()
+            written.append(_write(os.path.join(out_dir, f"Ocean{suffix}_{tag}.csv"), stamps, columns, values[:, order]))
+    return written
+
+
+def _scaled(columns, factor):
+    """
+    Repeat a header list `factor` times, tagging copies as CO2_desert#2[ppm], LEO-W_4_0_1#2, ...
+    """
+    if factor <= 1:
+        return list(columns)
+    out = []
+    for k in range(factor):
+        for col in columns:
+            if k == 0:
+                out.append(col)
+            elif "[" in col:
+                name, _, unit = col.partition("[")
+                out.append(f"{name}#{k + 1}[{unit}")
+            else:
+                out.append(f"{col}#{k + 1}")
+    return out
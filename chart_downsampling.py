@@ -0,0 +1,174 @@
+# chart_downsampling.py
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from constants import CHART_POINT_BUDGET
+from dataset_loader import find_time_column, parse_timestamps
+
+_CACHE_SIZE = 256
+_cache = OrderedDict()  # (cache_key, column, x_range, n_out, method) -> index array; parsed x axes too
+_cache_lock = threading.Lock()
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: pick n_out row indices that preserve the
+    visual shape of the series. The first and last points are always kept.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # Bucket edges for the n_out - 2 interior buckets
+    edges = (np.floor(np.arange(n_out - 1) * (n - 2) / (n_out - 2)) + 1).astype(np.int64)
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    avg_x = np.add.reduceat(x[: n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(y[: n - 1], edges[:-1]) / counts
+    # The "next bucket" average for the last interior bucket is the final point
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        xs = x[start:end]
+        ys = y[start:end]
+        area = np.abs((x[a] - next_x[i]) * (ys - y[a]) - (x[a] - xs) * (next_y[i] - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max bucketing: keep the lowest and highest point of each of n_out / 2
+    equal-width buckets. Fully vectorized; preserves spikes exactly.
+    """
+    n = len(y)
+    buckets = max(n_out // 2, 1)
+    if n_out >= n:
+        return np.arange(n)
+    size = int(np.ceil(n / buckets))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    filled = ~np.all(np.isnan(grid), axis=1)
+    grid = grid[filled]
+    offsets = np.flatnonzero(filled) * size
+    lo = offsets + np.nanargmin(grid, axis=1)
+    hi = offsets + np.nanargmax(grid, axis=1)
+    return np.unique(np.concatenate([[0], lo, hi, [n - 1]]))
+
+
+def downsample_indices(x, y, n_out: int = CHART_POINT_BUDGET, method: str = "lttb") -> np.ndarray:
+    """
+    Indices into (x, y) that survive downsampling. NaN values are skipped.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) == 0:
+        return valid
+    if method == "minmax":
+        picked = minmax_indices(y[valid], n_out)
+    else:
+        picked = lttb_indices(np.asarray(x, dtype=np.float64)[valid], y[valid], n_out)
+    return valid[picked]
+
+
+def _x_values(df: pd.DataFrame, x_col):
+    """
+    Numeric x positions for a frame: timestamps as int64 nanoseconds, or the row number.
+    """
+    if x_col is None:
+        return np.arange(len(df), dtype=np.float64), pd.RangeIndex(len(df))
+    stamps = parse_timestamps(df, x_col)
+    if stamps is not None and stamps.notna().any():
+        return stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64), stamps
+    col = df[x_col]
+    return col.to_numpy(dtype=np.float64), col
+
+
+def downsample_frame(df: pd.DataFrame, y_cols=None, x_col="auto", n_out: int = CHART_POINT_BUDGET,
+                     method: str = "lttb", x_range=None, cache_key=None) -> pd.DataFrame:
+    """
+    Downsample each y column to the point budget and return a long frame
+    (x, series, value) ready for plotly. `x_range` is an optional (start, end)
+    zoom window; indices are cached per (cache_key, column, x_range, n_out, method)
+    so repeated reruns at the same zoom level skip the computation entirely.
+    """
+    if x_col == "auto":
+        x_col = find_time_column(df)
+    if y_cols is None:
+        y_cols = df.select_dtypes(include=["number"]).columns.tolist()
+
+    x_key = (cache_key, "__x__", x_col) if cache_key is not None else None
+    cached_x = _cache_get(x_key)
+    if cached_x is None:
+        cached_x = _x_values(df, x_col)
+        _cache_put(x_key, cached_x)
+    x_num, x_display = cached_x
+    window = np.arange(len(df))
+    if x_range is not None:
+        lo, hi = (pd.Timestamp(v).value if not isinstance(v, (int, float)) else v for v in x_range)
+        window = np.flatnonzero((x_num >= lo) & (x_num <= hi))
+
+    range_key = tuple(str(v) for v in x_range) if x_range is not None else None
+    x_display = np.asarray(x_display)
+    parts = []
+    for col in y_cols:
+        key = (cache_key, col, range_key, n_out, method) if cache_key is not None else None
+        idx = _cache_get(key)
+        if idx is None:
+            y = df[col].to_numpy(dtype=np.float64, na_value=np.nan)[window]
+            idx = window[downsample_indices(x_num[window], y, n_out, method)]
+            _cache_put(key, idx)
+        parts.append(pd.DataFrame({
+            "x": x_display[idx],
+            "series": col,
+            "value": df[col].to_numpy()[idx],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=["x", "series", "value"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def downsample_array(y, n_out: int = CHART_POINT_BUDGET, method: str = "lttb") -> pd.Series:
+    """
+    Downsample a plain 1-D array (e.g. model predictions) keyed by its row index.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    idx = downsample_indices(np.arange(len(y), dtype=np.float64), y, n_out, method)
+    return pd.Series(y[idx], index=idx)
+
+
+def _cache_get(key):
+    if key is None:
+        return None
+    with _cache_lock:
+        idx = _cache.get(key)
+        if idx is not None:
+            _cache.move_to_end(key)
+        return idx
+
+
+def _cache_put(key, idx):
+    if key is None:
+        return
+    with _cache_lock:
+        _cache[key] = idx
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def clear_chart_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -1,4 +1,35 @@
 # constants.py
+import os
+
 DATA_DIR = "data/clean_data"
+SHARED_CACHE_DIR = "data/.shared_cache"  # memory-mappable column copies of the zone CSVs
+METADATA_PATH = "data/metadata.xlsx"
+PARTITION_INDEX_PATH = "data/partition_index.json"  # month partitions with timestamp ranges, rebuilt incrementally
+SENSOR_CATALOG_PATH = "data/sensor_catalog.json"  # built from METADATA_PATH + CSV headers on first use
 OLLAMA_URL = "http://localhost:11434/api/generate"
 MODEL_NAME = "gemma3:4b"
+LLM_CONCURRENCY = int(os.environ.get("B2TWIN_LLM_CONCURRENCY", "1"))  # generations run at once against Ollama
+CHART_POINT_BUDGET = 1500  # max points per series sent to the browser
+PYRAMID_LEVELS = ("1h", "6h", "1D")  # pre-aggregated resolutions kept per zone
+METRICS_ENABLED = os.environ.get("B2TWIN_METRICS", "0") == "1"  # timing spans and counters
+METRICS_LOG_PATH = os.environ.get("B2TWIN_METRICS_LOG", "logs/metrics.jsonl")
+# Prometheus /metrics port of each dashboard process (the spans live in the process that records them)
+TWIN_METRICS_PORT = int(os.environ.get("B2TWIN_TWIN_METRICS_PORT", "9101"))
+VIZ_METRICS_PORT = int(os.environ.get("B2TWIN_VIZ_METRICS_PORT", "9102"))
+MEMORY_LOG_DIR = "logs/memory"  # one append-only JSONL file per dashboard session
+MEMORY_LOG_CAPACITY = 200  # memory log entries kept in RAM per session
+MEMORY_LOG_PAGE_SIZE = 20
+ANALYSIS_INDEX_PATH = os.environ.get("B2TWIN_ANALYSIS_INDEX", "logs/analysis_index.jsonl")  # searchable past findings
+ALERT_RULES_PATH = os.environ.get("B2TWIN_ALERT_RULES")  # JSON list of zone alert rules; built-in rules when unset
+ALERT_EVENT_HISTORY = 500  # alert raise/clear events kept per zone
+PREDICT_BATCH_WINDOW_MS = float(os.environ.get("B2TWIN_PREDICT_WINDOW_MS", "5"))  # how long a /predict batch collects requests
+PREDICT_MAX_BATCH = 512  # rows per vectorized predict call
+MODEL_CHECK_INTERVAL_S = float(os.environ.get("B2TWIN_MODEL_CHECK_S", "5"))  # how often /predict re-checks a model's data
+SCENARIO_DRAWS = 2000  # Monte Carlo draws per what-if scenario
+SCENARIO_HORIZON = "24h"  # length of each simulated window
+ARCHIVE_DIR = "data/archive"  # compressed long-term copies of the zone datasets, one file per dataset
+ARCHIVE_BLOCK_ROWS = 2048  # rows per independently decodable block (about three weeks of 15-minute readings)
+ARCHIVE_CODEC = os.environ.get("B2TWIN_ARCHIVE_CODEC", "zlib")  # "zlib" (fast) or "lzma" (smaller)
+SEVERITY_TREND_ROWS = 16  # latest readings in the severity trend slope (4 hours at 15 minutes)
+SEVERITY_TREND_HORIZON = "2h"  # how far ahead the trend is projected toward a threshold
+SEVERITY_ANOMALY_HALFLIFE_ROWS = 96  # rows after which an outlier counts half in the anomaly rate
@@ -1,12 +1,42 @@
 # dataset_loader.py
 import os
 import pandas as pd
+from instrumentation import span, count
 
 def load_zone_datasets(folder_path):
+    from regular_series import compact_frame  # regular_series builds on the helpers below
+
     zones = {}
     for file in os.listdir(folder_path):
         if file.endswith(".csv"):
-            df = pd.read_csv(os.path.join(folder_path, file))
+            with span("load.read_csv"):
+                df = pd.read_csv(os.path.join(folder_path, file))
             df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+            with span("load.compact_time"):
+                df = compact_frame(df)
             zones[file] = df
+            count("load.rows", len(df))
     return zones
+
+def find_time_column(df):
+    """
+    Return the first column whose name looks like a timestamp ("datetime" in every B2 file).
+    """
+    for col in df.columns:
+        name = str(col).lower()
+        if "date" in name or "time" in name:
+            return col
+    return None
+
+def parse_timestamps(df, time_col=None):
+    """
+    Parse the timestamp column of a zone frame. Handles both the
+    "2025-02-01 00:00:00" and "2025/02/01 00:00" layouts found in the data.
+    """
+    time_col = time_col or find_time_column(df)
+    if time_col is None:
+        return None
+    col = df[time_col]
+    if pd.api.types.is_datetime64_any_dtype(col):
+        return col
+    return pd.to_datetime(col.astype(str).str.strip().str.replace("/", "-", regex=False), errors="coerce")
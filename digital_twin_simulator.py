@@ -1,14 +1,31 @@
 # digital_twin_simulator.py
 
+import json
+
 import streamlit as st
-import requests
 import pandas as pd
-from constants import DATA_DIR, OLLAMA_URL, MODEL_NAME
-from dataset_loader import load_zone_datasets
+from constants import DATA_DIR, SCENARIO_DRAWS, TWIN_METRICS_PORT
 from prompt_engine import build_prompt, build_small_talk_prompt
 from ml_utils_simple import train_and_predict
+from model_zoo import select_model
+from summary_engine import get_zone_summary
+from chart_downsampling import downsample_array
+from resample_pyramid import build_zone_pyramids
+from rule_engine import AlertMonitor
+from instrumentation import span, start_rerun, render_rerun_panel, start_metrics_server
+from rerun_cache import RerunCache
+from shared_datasets import session_datasets
+from upload_ingest import UploadIngest
+from llm_gateway import get_gateway, CHAT, ANALYSIS
+from analysis_index import get_index, relevant_findings
+from memory_log import MemoryLog
+from leo_grid import build_leo_grids, grid_columns
+from sensor_catalog import get_catalog, zone_from_filename
+from scenario_engine import DEFAULT_SCENARIOS, KINDS, run_scenarios, zone_summary, dataset_summary
 
 st.set_page_config("B2Twin - Digital Twin Navigator", layout="wide")
+start_rerun()
+start_metrics_server(TWIN_METRICS_PORT)  # this process's spans at /metrics; no-op unless B2TWIN_METRICS=1
 st.title("🌿 B2Twin - AI-Powered Ecosystem Insight Agent")
 
 # Header-level link to second Streamlit app
@@ -25,29 +42,57 @@ st.markdown(
 
 # Load datasets
 if "datasets" not in st.session_state:
-    st.session_state.datasets = load_zone_datasets(DATA_DIR)
+    # Zone frames and pyramids are shared by all sessions; uploads go to this session's overlay
+    with span("twin.load_datasets"):
+        st.session_state.datasets, st.session_state.pyramids = session_datasets(DATA_DIR)
     st.session_state.zone_list = list(st.session_state.datasets.keys())
     st.session_state.zone_index = 0
-    st.session_state.logs = []
+    st.session_state.logs = MemoryLog()  # ring buffer in RAM, full history on disk
+    st.session_state.data_versions = {}  # zone -> version, bumped whenever the zone's data changes
+    st.session_state.rerun_cache = RerunCache()
+    st.session_state.uploaded_file_key = None  # content hash of the current upload
+    st.session_state.upload_ingest = UploadIngest()
+    st.session_state.alerts = AlertMonitor()  # per-zone alert state; only new rows are evaluated
+
+# Sections wrapped in a fragment rerun on their own when their buttons are clicked
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+cache = st.session_state.rerun_cache
+cache.start_rerun()
+
+def data_version(zone):
+    return st.session_state.data_versions.get(zone, 0)
+
+def go_to_zone(step):
+    st.session_state.zone_index = (st.session_state.zone_index + step) % len(st.session_state.zone_list)
 
 zones = st.session_state.datasets
 zone_names = st.session_state.zone_list
-index = st.session_state.zone_index
-current_zone = zone_names[index]
-df = zones[current_zone]
 
 # CSV Uploader
 st.markdown("---")
 st.subheader("📤 Upload Your Own Dataset (CSV)")
 uploaded_file = st.file_uploader("Upload a .csv file", type=["csv"])
 if uploaded_file:
-    uploaded_df = pd.read_csv(uploaded_file)
-    uploaded_df.columns = [col.strip().lower().replace(" ", "_") for col in uploaded_df.columns]
-    st.session_state.datasets["Uploaded CSV"] = uploaded_df
-    if "Uploaded CSV" not in st.session_state.zone_list:
-        st.session_state.zone_list.append("Uploaded CSV")
+    with span("twin.parse_upload"):
+        file_key, uploaded_df = st.session_state.upload_ingest.parse(uploaded_file, normalize=True)
+    if file_key != st.session_state.uploaded_file_key:
+        st.session_state.datasets["Uploaded CSV"] = uploaded_df
+        st.session_state.pyramids.pop("Uploaded CSV", None)
+        st.session_state.pyramids.update(build_zone_pyramids({"Uploaded CSV": uploaded_df}))
+        st.session_state.data_versions["Uploaded CSV"] = data_version("Uploaded CSV") + 1
+        st.session_state.uploaded_file_key = file_key
+        st.session_state.alerts.reset("Uploaded CSV")
+        st.session_state.alerts.observe("Uploaded CSV", uploaded_df)
+        cache.invalidate("Uploaded CSV")
+        if "Uploaded CSV" not in st.session_state.zone_list:
+            st.session_state.zone_list.append("Uploaded CSV")
     st.success("✅ Uploaded CSV added as new zone")
 
+index = st.session_state.zone_index
+current_zone = zone_names[index]
+df = zones[current_zone]
+version = data_version(current_zone)
+
 # Current Zone Viewer
 st.markdown("---")
 st.subheader(f"📍 Current Zone: {current_zone}")
@@ -55,111 +100,260 @@ st.dataframe(df.head(10))
 
 col1, col2 = st.columns(2)
 with col1:
-    if st.button("⬅️ Previous Zone"):
-        st.session_state.zone_index = (index - 1) % len(zone_names)
+    st.button("⬅️ Previous Zone", on_click=go_to_zone, args=(-1,))
 with col2:
-    if st.button("➡️ Next Zone"):
-        st.session_state.zone_index = (index + 1) % len(zone_names)
+    st.button("➡️ Next Zone", on_click=go_to_zone, args=(1,))
+
+# Sensor history read from the zone's pyramid: a few hundred pre-aggregated buckets instead of every raw row
+@fragment
+def history_section(zone):
+    pyramid = st.session_state.pyramids.get(zone)
+    if pyramid is None:
+        return
+    resolution = st.select_slider("History resolution", pyramid.freqs, value=pyramid.freqs[-1], key="history_resolution")
+    with span("twin.history"):
+        freq, level = pyramid.query(resolution=resolution)
+    if level is None or level.empty:
+        return
+    st.line_chart(level.xs("mean", axis=1, level=1))
+    st.caption(f"{len(level)} {freq} means from {int(level.xs('count', axis=1, level=1).max(axis=1).sum())} readings")
+
+history_section(current_zone)
 
 # ML Training
-st.markdown("---")
-st.subheader("📈 In-Memory ML Training & Prediction")
-numeric_cols = df.select_dtypes(include=["float64", "int64"]).columns.tolist()
-if numeric_cols:
-    target_col = st.selectbox("Select target variable", numeric_cols)
-    if st.button("Train + Predict"):
-        model, preds = train_and_predict(df, target_col)
-        if preds is not None:
-            st.line_chart(preds[:100])
-            st.success("✅ Predictions ready")
-        else:
-            st.warning("⚠️ Model failed to train/predict")
-else:
-    st.warning("No numeric columns available")
-
-# Main LLM Analysis
-st.markdown("---")
-st.subheader("🤖 LLM Scientific Insight (Main Agent)")
-if st.button("Ask LLM for Scientific Analysis"):
-    prompt = build_prompt(current_zone, df)
-    try:
-        res = requests.post(OLLAMA_URL, json={"model": MODEL_NAME, "prompt": prompt, "stream": False})
-        json_resp = res.json()
-        response_text = json_resp.get("response") or json_resp.get("output") or str(json_resp)
-        st.text_area("LLM Response", response_text, height=250)
-        st.session_state.logs.append(f"{current_zone}: {response_text}")
-        st.session_state.last_llm_response = response_text
-    except Exception as e:
-        st.error(f"❌ LLM error: {str(e)}")
-
-# AI Agent Log
-st.markdown("---")
-st.subheader("📘 AI Agent Memory Log")
-st.text_area("Memory Log", "\n".join(st.session_state.logs), height=300)
+@fragment
+def ml_section(zone, df, version):
+    st.markdown("---")
+    st.subheader("📈 In-Memory ML Training & Prediction")
+    with span("twin.numeric_columns"):
+        numeric_cols = cache.get("numeric_cols", (zone, version),
+                                 lambda: df.select_dtypes(include=["float64", "int64"]).columns.tolist())
+    if numeric_cols:
+        target_col = st.selectbox("Select target variable", numeric_cols)
+        if st.button("Train + Predict"):
+            with span("twin.train_and_predict"):
+                model, preds = train_and_predict(df, target_col)
+            if preds is not None:
+                st.line_chart(downsample_array(preds))
+                st.success("✅ Predictions ready")
+            else:
+                st.warning("⚠️ Model failed to train/predict")
+        cross_zone = st.checkbox("Use cross-zone lag features", value=False)
+        if st.button("Compare Models (time-series CV)"):
+            with span("twin.select_model"):
+                selection = cache.get("model_zoo", (zone, version, target_col, cross_zone),
+                                      lambda: select_model(df, target_col, zones=zones if cross_zone else None, zone=zone))
+            if selection is not None:
+                st.dataframe(selection["scores"].style.format({"mae": "{:.4f}", "rmse": "{:.4f}", "fit_s": "{:.3f}"}))
+                st.caption("Out-of-fold predictions: each block forecast by the best model trained only on earlier rows")
+                st.line_chart(downsample_array(selection["predictions"]))
+                st.success(f"✅ Best model: {selection['best']} (held-out RMSE {selection['scores']['rmse'].iloc[0]:.4f})")
+            else:
+                st.warning("⚠️ Not enough data to cross-validate models")
+    else:
+        st.warning("No numeric columns available")
+
+ml_section(current_zone, df, version)
+
+# What-if scenarios: Monte Carlo draws propagated through the zone models
+@fragment
+def scenario_section(zone):
+    st.markdown("---")
+    st.subheader("🎲 What-if Scenarios")
+    presets = {s["name"]: s for s in DEFAULT_SCENARIOS}
+    chosen = st.multiselect("Scenarios", list(presets), default=list(presets), key="scenario_presets")
+    scenarios = [presets[name] for name in chosen]
+    with st.expander("➕ Custom perturbation"):
+        catalog = get_catalog()
+        units = {}
+        for name in zone_names:
+            for column in zones[name].columns:
+                entry = catalog.entry(name, column)
+                if entry["quantity"] is not None:
+                    units.setdefault(entry["quantity"], entry["unit"])
+        units.update(temperature="C")
+        targets = ["All zones"] + sorted({catalog.zone_of(name) for name in zone_names} - {None}) + zone_names
+        c1, c2, c3 = st.columns(3)
+        target = c1.selectbox("Zone or dataset", targets, key="scenario_zone")
+        quantity = c2.selectbox("Quantity", sorted(units), key="scenario_quantity")
+        kind = c3.selectbox("Change", KINDS, key="scenario_kind")
+        c4, c5 = st.columns(2)
+        value = c4.number_input(f"Value ({units[quantity] or 'raw'})", value=2.0, key="scenario_value")
+        spread = c5.number_input("Spread (std. dev.)", value=0.0, min_value=0.0, key="scenario_spread")
+        if st.checkbox("Include custom scenario", key="scenario_custom"):
+            scenarios.append({"name": f"{target}: {quantity} {kind} {value:g} {units[quantity] or ''}".strip(),
+                              "perturbations": [{"zone": None if target == "All zones" else target, "quantity": quantity,
+                                                 "kind": kind, "value": value, "unit": units[quantity], "spread": spread}]})
+    c1, c2 = st.columns(2)
+    draws = c1.select_slider("Monte Carlo draws", [500, 1000, 2000, 5000, 10000], value=SCENARIO_DRAWS, key="scenario_draws")
+    horizon = c2.selectbox("Window", ["6h", "24h", "3D"], index=1, key="scenario_horizon")
+    if st.button("Run what-if"):
+        key = (json.dumps(scenarios, sort_keys=True), draws, horizon, tuple((z, data_version(z)) for z in zone_names))
+        with span("twin.scenarios"):
+            result = cache.get("scenarios", key, lambda: run_scenarios({z: zones[z] for z in zone_names}, scenarios, draws, horizon))
+        st.caption(f"{draws} draws × {len(result['scenarios'])} scenarios × {len(zone_names)} datasets "
+                   f"in {result['elapsed_s']:.2f} s")
+        by_zone = zone_summary(result).pivot(index="zone", columns="scenario", values="p_healthy")
+        st.markdown("**Probability that no dataset in the zone has an active alert at the end of the window**")
+        st.dataframe(by_zone[list(result["scenarios"])].style.format("{:.1%}"))
+        st.dataframe([{"scenario": name, "zones stable (mean)": s["stable"]["mean"],
+                       "5th pct": s["stable"]["p5"], "95th pct": s["stable"]["p95"], "of": s["stable"]["total"]}
+                      for name, s in result["scenarios"].items()])
+        detail = dataset_summary(result, zone)
+        if not detail.empty:
+            st.markdown(f"**{zone}: window means per sensor (5th / 50th / 95th percentile)**")
+            st.dataframe(detail)
+
+scenario_section(current_zone)
+
+# LEO slope grid: gridded sensors as one (time x position) tensor
+@fragment
+def leo_section(zone, df):
+    st.markdown("---")
+    st.subheader("🗺️ LEO Slope Grid")
+    with span("twin.leo_grids"):
+        grids = build_leo_grids({name: zones[name] for name in zone_names})
+    own = list(grid_columns(zone, df.columns))
+    options = list(grids)
+    default = next((i for i, name in enumerate(options) if own and name.startswith(own[0])), 0)
+    quantity = st.selectbox("Grid quantity", options, index=default, key="leo_grid_quantity")
+    grid = grids[quantity]
+
+    def charts():
+        times = pd.DatetimeIndex(grid.times)
+        levels, by_level = grid.aggregate("level")
+        level_means = pd.DataFrame(by_level, index=times, columns=[f"level {g}" for g in levels]).resample("1h").mean()
+        gradient = pd.Series(grid.gradient("y"), index=times, name="per m downslope").resample("1h").mean()
+        along, profile = grid.profile("y", 25)
+        return level_means, gradient, pd.Series(profile[-1], index=along, name="latest downslope profile")
+
+    level_means, gradient, latest = cache.get("leo_grid", (quantity, len(grid)), charts)
+    st.caption(f"{len(grid.columns)} sensors, {len(grid)} timestamps, {grid.unit or ''} — "
+               f"{grid.nbytes / 1024:.0f} KiB as float32")
+    st.line_chart(level_means)
+    st.line_chart(gradient)
+    st.line_chart(latest)
+
+if zone_from_filename(current_zone) == "LEO" and grid_columns(current_zone, df.columns):
+    leo_section(current_zone, df)
+
+# Main LLM Analysis, AI Agent Log and Small Talk share one fragment so new replies reach the log
+@fragment
+def agent_section(zone, df):
+    st.markdown("---")
+    st.subheader("🤖 LLM Scientific Insight (Main Agent)")
+    if st.button("Ask LLM for Scientific Analysis"):
+        findings = relevant_findings(zone, f"{zone} {' '.join(df.columns)}")
+        prompt = build_prompt(zone, df, findings)
+        try:
+            with span("twin.llm_analysis"):
+                json_resp = get_gateway().generate(prompt, ANALYSIS)
+            response_text = json_resp.get("response") or json_resp.get("output") or str(json_resp)
+            st.text_area("LLM Response", response_text, height=250)
+            st.session_state.logs.append(zone, f"{zone}: {response_text}")
+            get_index().add(zone, "analysis", response_text, source="digital_twin")
+            st.session_state.last_llm_response = response_text
+        except Exception as e:
+            st.error(f"❌ LLM error: {str(e)}")
+
+    # AI Agent Log
+    st.markdown("---")
+    st.subheader("📘 AI Agent Memory Log")
+    logs = st.session_state.logs
+    col_zone, col_page = st.columns(2)
+    with col_zone:
+        log_zone = st.selectbox("Filter by zone", ["All zones"] + logs.zones(), key="memory_log_zone")
+    log_zone = None if log_zone == "All zones" else log_zone
+    n_pages = logs.pages(log_zone)
+    if st.session_state.get("memory_log_page", 1) > n_pages:
+        st.session_state.memory_log_page = n_pages
+    with col_page:
+        log_page = st.number_input("Page (newest first)", min_value=1, max_value=n_pages,
+                                   key="memory_log_page")
+    with span("twin.memory_log"):
+        log_text = logs.page_text(log_page - 1, log_zone)
+    st.text_area("Memory Log", log_text, height=300)
+
+    # Small Talk Assistant AI
+    st.markdown("---")
+    st.subheader("🧠 Assistant AI Small Talk Collaboration")
+    if "last_llm_response" not in st.session_state:
+        st.session_state.last_llm_response = "No previous response from main agent."
+    st.text_area("Main Agent Last Summary", st.session_state.last_llm_response, height=200)
+
+    if st.button("🤖 Talk to Assistant AI Agent"):
+        try:
+            findings = relevant_findings(zone, st.session_state.last_llm_response)
+            small_talk_prompt = build_small_talk_prompt(zone, st.session_state.last_llm_response, findings)
+            with span("twin.llm_small_talk"):
+                res = get_gateway().generate(small_talk_prompt, CHAT)
+            assistant_reply = res.get("response") or res.get("output") or "No response"
+            st.text_area("Assistant AI Reply", assistant_reply, height=200)
+            st.session_state.logs.append(zone, f"AssistantAI to {zone}: {assistant_reply}")
+            get_index().add(zone, "assistant", assistant_reply, source="digital_twin")
+        except Exception as e:
+            st.error(f"❌ Assistant AI error: {str(e)}")
+
+agent_section(current_zone, df)
 
 # Ecosystem Health Tracker
+def health_tracker_html():
+    health_count = 0
+    blocks = []
+    alerts = st.session_state.alerts
+    for z in zone_names:
+        alerts.observe(z, zones[z])
+        status, color, healthy = alerts.status(z)
+        if healthy:
+            health_count += 1
+        blocks.append(f"<div style='background-color:{color};padding:10px;border-radius:5px;margin:5px'>{z} ➜ {status}</div>")
+    return "".join(blocks), health_count
+
 st.markdown("---")
 st.subheader("🏁 Mission Ecosystem Health Tracker")
-health_count = 0
 total_zones = len(zone_names)
-
-for z in zone_names:
-    df_z = zones[z]
-    rh_col = [c for c in df_z.columns if "rh" in c.lower()]
-    temp_col = [c for c in df_z.columns if "temp" in c.lower()]
-    co2_col = [c for c in df_z.columns if "co2" in c.lower()]
-    status = "✅ Healthy"
-    color = "green"
-    try:
-        if temp_col and df_z[temp_col[0]].mean() > 35:
-            status = "🔥 Hot"
-            color = "red"
-        elif co2_col and df_z[co2_col[0]].mean() > 700:
-            status = "☣ High CO2"
-            color = "orange"
-        elif rh_col and df_z[rh_col[0]].mean() < 30:
-            status = "💨 Low RH"
-            color = "blue"
-        else:
-            health_count += 1
-    except:
-        status = "❓ Check Data"
-        color = "gray"
-    st.markdown(f"<div style='background-color:{color};padding:10px;border-radius:5px;margin:5px'>{z} ➜ {status}</div>", unsafe_allow_html=True)
+with span("twin.health_tracker"):
+    health_key = tuple((z, data_version(z)) for z in zone_names)
+    health_html, health_count = cache.get("health", (health_key,), health_tracker_html)
+st.markdown(health_html, unsafe_allow_html=True)
 
 progress = health_count / total_zones
 st.progress(progress)
 st.metric("Zones Stable", f"{health_count}/{total_zones}")
+with st.expander("🚨 Recent alerts"):
+    recent = st.session_state.alerts.recent_events(limit=20)
+    if recent:
+        st.dataframe([{"zone": e["zone"], "time": e["time"], "rule": e["rule"], "sensor": e["column"],
+                       "event": e["event"], "value": e["value"]} for e in recent])
+    else:
+        st.write("No alerts raised.")
 
 # Inter-AI Communication Demo
+@fragment
+def comm_section(zone, df, version):
+    st.markdown("---")
+    st.subheader("🔗 Inter-AI Communication Protocol Demo")
+    demo_port = st.text_input("Enter Recipient AI Port", value="5001")
+    with span("twin.demo_summary"):
+        demo_message = cache.get("demo_message", (zone, version), lambda: (
+            f"🌱 AI Agent update from zone: {zone}.\nSample sensor snapshot:\n"
+            f"{get_zone_summary(zone, df).describe().to_string()}"
+        ))
+
+    if st.button("🚀 Send Demo Message to Other AI Agent"):
+        import requests
+
+        try:
+            demo_payload = {"from_agent": "B2Twin-AI-Agent-Demo", "message": demo_message}
+            demo_url = f"http://localhost:{demo_port}/receive-message"
+            response = requests.post(demo_url, json=demo_payload)
+            response_json = response.json()
+            st.success(f"✅ Inter-AI Response: {response_json.get('response')}")
+        except Exception as e:
+            st.error(f"❌ Failed to communicate with other AI: {e}")
+
+comm_section(current_zone, df, version)
+
 st.markdown("---")
-st.subheader("🔗 Inter-AI Communication Protocol Demo")
-demo_port = st.text_input("Enter Recipient AI Port", value="5001")
-demo_message = f"🌱 AI Agent update from zone: {current_zone}.\nSample sensor snapshot:\n{df.describe().to_string()}"
-
-if st.button("🚀 Send Demo Message to Other AI Agent"):
-    try:
-        demo_payload = {"from_agent": "B2Twin-AI-Agent-Demo", "message": demo_message}
-        demo_url = f"http://localhost:{demo_port}/receive-message"
-        response = requests.post(demo_url, json=demo_payload)
-        response_json = response.json()
-        st.success(f"✅ Inter-AI Response: {response_json.get('response')}")
-    except Exception as e:
-        st.error(f"❌ Failed to communicate with other AI: {e}")
-
-# Small Talk Assistant AI
-st.markdown("---")
-st.subheader("🧠 Assistant AI Small Talk Collaboration")
-if "last_llm_response" not in st.session_state:
-    st.session_state.last_llm_response = "No previous response from main agent."
-st.text_area("Main Agent Last Summary", st.session_state.last_llm_response, height=200)
-
-if st.button("🤖 Talk to Assistant AI Agent"):
-    try:
-        small_talk_prompt = build_small_talk_prompt(current_zone, st.session_state.last_llm_response)
-        res = requests.post(OLLAMA_URL, json={"model": MODEL_NAME, "prompt": small_talk_prompt, "stream": False})
-        assistant_reply = res.json().get("response") or res.json().get("output") or "No response"
-        st.text_area("Assistant AI Reply", assistant_reply, height=200)
-        st.session_state.logs.append(f"AssistantAI to {current_zone}: {assistant_reply}")
-    except Exception as e:
-        st.error(f"❌ Assistant AI error: {str(e)}")
+st.caption(cache.report())
+render_rerun_panel(st)
@@ -0,0 +1,154 @@
+# fake_ollama_server.py
+#
+# Ollama-compatible stand-in for load and latency testing without a model:
+#   python fake_ollama_server.py --port 11434 --latency 0.5 --token-rate 20 --error-rate 0.05
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import json
+import random
+import threading
+import time
+
+from flask import Flask, request, jsonify, Response
+
+CANNED_RESPONSES = [
+    "Conditions are within expected ranges. Temperature and humidity follow a normal diurnal cycle; no action is needed.",
+    "CO2 concentration is elevated during night hours, consistent with plant respiration. Recommend checking ventilation schedules.",
+    "Relative humidity dropped below the comfort band for several hours. Consider increasing misting in the affected zone.",
+    "Sensor readings show a short gap and a step change afterwards, which suggests a recalibration. Verify the instrument log.",
+]
+
+
+def canned_response(prompt: str, canned=None) -> str:
+    """
+    Deterministic reply: the first canned keyword found in the prompt wins,
+    otherwise a reply chosen by the prompt's hash.
+    """
+    for keyword, text in (canned or {}).items():
+        if keyword in prompt:
+            return text
+    digest = int(hashlib.sha1(prompt.encode()).hexdigest(), 16)
+    return CANNED_RESPONSES[digest % len(CANNED_RESPONSES)]
+
+
+def create_app(latency_s: float = 0.0, tokens_per_s: float = 0.0, error_rate: float = 0.0,
+               seed: int = 0, canned=None, model: str = None) -> Flask:
+    """
+    Flask app implementing /api/generate (streaming and non-streaming) and /api/tags.
+    latency_s is spent before the first token, tokens_per_s (0 = unlimited)
+    paces the words of the reply, and error_rate fails that share of requests
+    with HTTP 500, drawn from a seeded generator so runs are reproducible.
+    """
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {"requests": 0, "errors": 0}
+
+    def should_fail():
+        with rng_lock:
+            stats["requests"] += 1
+            failed = error_rate > 0 and rng.random() < error_rate
+            stats["errors"] += failed
+            return failed
+
+    def base(payload):
+        return {"model": model or payload.get("model", "fake"),
+                "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+
+    def final(payload, prompt, tokens, started, first_token):
+        end = time.perf_counter()
+        return {
+            **base(payload),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((end - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": int((first_token - started) * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int((end - first_token) * 1e9),
+        }
+
+    @app.route("/api/generate", methods=["POST"])
+    def generate():
+        started = time.perf_counter()
+        payload = request.get_json(force=True, silent=True) or {}
+        prompt = payload.get("prompt", "")
+        if should_fail():
+            return jsonify({"error": "injected failure"}), 500
+        text = canned_response(prompt, canned)
+        tokens = [w + " " for w in text.split(" ")]
+        tokens[-1] = tokens[-1].rstrip()
+        time.sleep(latency_s)
+        first_token = time.perf_counter()
+        delay = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+
+        if payload.get("stream", True) is False:
+            time.sleep(delay * len(tokens))
+            return jsonify({**final(payload, prompt, tokens, started, first_token), "response": text})
+
+        def chunks():
+            for token in tokens:
+                if delay:
+                    time.sleep(delay)
+                yield json.dumps({**base(payload), "response": token, "done": False}) + "\n"
+            yield json.dumps({**final(payload, prompt, tokens, started, first_token), "response": ""}) + "\n"
+
+        return Response(chunks(), mimetype="application/x-ndjson")
+
+    @app.route("/api/tags", methods=["GET"])
+    def tags():
+        return jsonify({"models": [{"name": model or "fake", "model": model or "fake"}]})
+
+    @app.route("/fake/stats", methods=["GET"])
+    def fake_stats():
+        with rng_lock:
+            return jsonify(dict(stats))
+
+    return app
+
+
+@contextlib.contextmanager
+def serve_in_thread(host: str = "127.0.0.1", port: int = 0, **config):
+    """
+    Run the fake server in a background thread; yields its /api/generate URL.
+    """
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, create_app(**config), threaded=True, request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_port}/api/generate"
+    finally:
+        server.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ollama-compatible fake /api/generate server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=0.0, help="tokens per second (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--canned", help="JSON file mapping prompt keywords to fixed responses")
+    args = parser.parse_args(argv)
+
+    canned = None
+    if args.canned:
+        with open(args.canned) as f:
+            canned = json.load(f)
+    app = create_app(args.latency, args.token_rate, args.error_rate, args.seed, canned)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# feature_builder.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dataset_loader import parse_timestamps
+from regular_series import regular_asof, regular_cadence
+from summary_engine import frame_fingerprint
+from instrumentation import span, count
+
+DEFAULT_LAGS = (1, 4, 96)    # 15 min, 1 h and 1 day at the zone files' 15-minute cadence
+DEFAULT_WINDOWS = (4, 96)    # trailing means of the target over 1 h and 1 day
+CROSS_ZONE_LAGS = (4,)       # other zones contribute their current value and the value 1 h earlier
+ASOF_TOLERANCE = pd.Timedelta("1h")  # other zones' readings older than this are treated as missing
+_NS_PER_DAY = 86_400 * 10**9
+
+
+# -------------------------
+# VECTORIZED BUILDING BLOCKS
+# -------------------------
+def lag_matrix(values: np.ndarray, lags) -> np.ndarray:
+    """
+    Column j holds values shifted back by lags[j] rows. Built from one strided
+    window view over the edge-padded series, so only the selected lags are copied.
+    """
+    max_lag = max(lags)
+    padded = np.pad(np.asarray(values, dtype=np.float32), (max_lag, 0), mode="edge")
+    windows = sliding_window_view(padded, max_lag + 1)
+    return windows[:, max_lag - np.asarray(lags)]
+
+
+def rolling_mean_matrix(values: np.ndarray, windows) -> np.ndarray:
+    """
+    Trailing means over each window length, ignoring NaNs, from two cumulative sums.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    sums = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    counts = np.concatenate([[0], np.cumsum(valid)])
+    end = np.arange(1, len(values) + 1)
+    out = np.empty((len(values), len(windows)), dtype=np.float32)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for j, w in enumerate(windows):
+            start = np.maximum(end - w, 0)
+            out[:, j] = (sums[end] - sums[start]) / (counts[end] - counts[start])
+    return out
+
+
+def time_of_day(stamps_ns: np.ndarray) -> np.ndarray:
+    """
+    Sine and cosine of the time of day, so 23:45 and 00:00 are neighbours.
+    """
+    phase = (stamps_ns % _NS_PER_DAY) / _NS_PER_DAY * 2 * np.pi
+    return np.column_stack([np.sin(phase), np.cos(phase)]).astype(np.float32)
+
+
+def asof_align(source_ns: np.ndarray, source_values: np.ndarray, target_ns: np.ndarray,
+               tolerance_ns: int) -> np.ndarray:
+    """
+    Latest source reading at or before each target timestamp (NaN when none
+    within the tolerance). Both timestamp arrays must be sorted.
+    """
+    pos = np.searchsorted(source_ns, target_ns, side="right") - 1
+    found = pos >= 0
+    pos = np.clip(pos, 0, None)
+    aligned = source_values[pos].astype(np.float32)
+    aligned[~found | (target_ns - source_ns[pos] > tolerance_ns)] = np.nan
+    return aligned
+
+
+# -------------------------
+# CACHES
+# -------------------------
+_cache_lock = threading.Lock()
+_stamp_cache = {}    # (zone, fingerprint) -> (int64 ns timestamps, sort order, regular cadence or None), or None
+_feature_cache = {}  # key of inputs and parameters -> feature dict
+_FEATURE_CACHE_SIZE = 32
+
+
+def _zone_stamps(zone: str, df: pd.DataFrame, fingerprint):
+    key = (zone, fingerprint)
+    with _cache_lock:
+        if key in _stamp_cache:
+            return _stamp_cache[key]
+    stamps = parse_timestamps(df)
+    if stamps is None or stamps.isna().all():
+        result = None
+    else:
+        ns = stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        missing = stamps.isna().to_numpy()
+        ns[missing] = np.iinfo(np.int64).max  # unparsable rows sort last and never match
+        cadence = None if missing.any() else regular_cadence(ns)
+        order = np.arange(len(ns)) if cadence is not None else np.argsort(ns, kind="stable")
+        result = (ns, order, cadence)
+    with _cache_lock:
+        _stamp_cache[key] = result
+    return result
+
+
+def _numeric_columns(df: pd.DataFrame):
+    return df.select_dtypes(include=["float64", "int64"]).columns.tolist()
+
+
+def clear_feature_cache():
+    with _cache_lock:
+        _stamp_cache.clear()
+        _feature_cache.clear()
+
+
+# -------------------------
+# FEATURE MATRIX
+# -------------------------
+def build_features(zones: dict, target_zone: str, target_col: str, lags=DEFAULT_LAGS,
+                   windows=DEFAULT_WINDOWS, cross_zone: bool = True, cross_lags=CROSS_ZONE_LAGS,
+                   tolerance: pd.Timedelta = ASOF_TOLERANCE) -> dict:
+    """
+    float32 feature matrix with one row per row of zones[target_zone]:
+
+    - lags and trailing means (up to the previous row) of the target itself
+    - the zone's other numeric columns and their lags
+    - every numeric column of the other zones, as-of joined on the timestamp, and their `cross_lags`
+    - time-of-day sine/cosine
+
+    Cross-zone and time features need a timestamp column; without one only the
+    zone's own columns are used. Results are cached per data fingerprint.
+    Returns a dict with "X", "y", "names" and "rows" (positions in the target frame).
+    """
+    target_df = zones[target_zone]
+    fingerprints = {target_zone: frame_fingerprint(target_df)}
+    target_stamps = _zone_stamps(target_zone, target_df, fingerprints[target_zone])
+    others = []
+    if cross_zone and target_stamps is not None:
+        for name, df in zones.items():
+            if name == target_zone:
+                continue
+            fingerprints[name] = frame_fingerprint(df)
+            stamps = _zone_stamps(name, df, fingerprints[name])
+            if stamps is not None and _numeric_columns(df):
+                others.append((name, df, stamps))
+
+    key = (tuple(sorted(fingerprints.items(), key=lambda kv: kv[0])), target_zone, target_col,
+           tuple(lags), tuple(windows), cross_zone, tuple(cross_lags), tolerance)
+    with _cache_lock:
+        cached = _feature_cache.get(key)
+    if cached is not None:
+        count("features.cache_hits")
+        return cached
+
+    with span("features.build"):
+        own_cols = [c for c in _numeric_columns(target_df) if c != target_col]
+        other_cols = [(name, df, stamps, c) for name, df, stamps in others for c in _numeric_columns(df)]
+        n_rows = len(target_df)
+        n_lags, n_windows = len(lags), len(windows)
+        n_features = (n_lags + n_windows + len(own_cols) * (1 + n_lags) + len(other_cols) * (1 + len(cross_lags))
+                      + (2 if target_stamps is not None else 0))
+        X = np.empty((n_rows, n_features), dtype=np.float32)
+        names = []
+        pos = 0
+
+        def put(block, block_names):
+            nonlocal pos
+            X[:, pos:pos + block.shape[1]] = block
+            names.extend(block_names)
+            pos += block.shape[1]
+
+        y = target_df[target_col].to_numpy(dtype=np.float64)
+        put(lag_matrix(y, lags), [f"{target_col}:lag{k}" for k in lags])
+        for j, k in enumerate(lags):
+            X[:k, j] = np.nan  # edge padding would leak the current target value
+        previous = np.concatenate([[np.nan], y[:-1]])
+        put(rolling_mean_matrix(previous, windows), [f"{target_col}:mean{w}" for w in windows])
+
+        for c in own_cols:
+            values = target_df[c].to_numpy(dtype=np.float32)
+            put(values[:, None], [c])
+            put(lag_matrix(values, lags), [f"{c}:lag{k}" for k in lags])
+
+        if target_stamps is not None:
+            target_ns = target_stamps[0]
+            tolerance_ns = int(tolerance.value)
+            for name, df, (ns, order, cadence), c in other_cols:
+                if cadence is not None:
+                    # regular cadence: the as-of join is index arithmetic
+                    rows = regular_asof(*cadence, target_ns, tolerance_ns)
+                    values = df[c].to_numpy(dtype=np.float32)[np.maximum(rows, 0)]
+                    values[rows < 0] = np.nan
+                else:
+                    values = asof_align(ns[order], df[c].to_numpy(dtype=np.float64)[order], target_ns, tolerance_ns)
+                put(values[:, None], [f"{name}:{c}"])
+                put(lag_matrix(values, cross_lags), [f"{name}:{c}:lag{k}" for k in cross_lags])
+            put(time_of_day(target_ns), ["time_of_day_sin", "time_of_day_cos"])
+
+    result = {"X": X, "y": y, "names": names, "rows": np.arange(n_rows)}
+    with _cache_lock:
+        if len(_feature_cache) >= _FEATURE_CACHE_SIZE:
+            _feature_cache.pop(next(iter(_feature_cache)))
+        _feature_cache[key] = result
+    count("features.built")
+    return result
+
+
+def own_history_inputs(df: pd.DataFrame, target_col: str, zone: str = None):
+    """
+    Inputs for files with no other numeric column: the target's own lags,
+    trailing means and time of day. Built on the full frame, in time order, so
+    lags reach the actual previous rows; rows with a missing target or feature
+    (including the lag warm-up) are dropped afterwards.
+    Returns (X, y, names), or None when no row or feature remains.
+    """
+    zone = zone or target_col
+    features = build_features({zone: df}, zone, target_col, cross_zone=False)
+    X, y = features["X"], features["y"]
+    keep_cols = ~np.isnan(X).all(axis=0)
+    X = X[:, keep_cols]
+    keep_rows = ~np.isnan(y) & ~np.isnan(X).any(axis=1)
+    if not keep_cols.any() or not keep_rows.any():
+        return None
+    names = [n for n, keep in zip(features["names"], keep_cols) if keep]
+    return X[keep_rows], y[keep_rows], names
+
+
+def model_inputs(features: dict):
+    """
+    Rows with a known target and all-missing columns dropped. Remaining gaps
+    stay NaN; fill them with fill_missing() from the rows a model is fitted
+    on, so cross-validation folds never see means of their test rows.
+    Returns (X, y, names, rows).
+    """
+    X, y = features["X"], features["y"]
+    keep_rows = ~np.isnan(y)
+    X = X[keep_rows]
+    keep_cols = np.isfinite(X).any(axis=0)
+    X = X[:, keep_cols]
+    names = [n for n, keep in zip(features["names"], keep_cols) if keep]
+    return X, y[keep_rows], names, features["rows"][keep_rows]
+
+
+def fill_missing(X_train: np.ndarray, *others) -> tuple:
+    """
+    X_train and `others` with gaps filled by X_train's column means (0 for a
+    column with no training values). Returns the arrays unchanged when
+    nothing is missing.
+    """
+    arrays = (X_train,) + others
+    if not any(np.isnan(X).any() for X in arrays):
+        return arrays
+    finite = np.isfinite(X_train)
+    counts = finite.sum(axis=0)
+    means = np.where(finite, X_train, 0).sum(axis=0, dtype=np.float64) / np.maximum(counts, 1)
+    means = means.astype(X_train.dtype)
+    return tuple(np.where(np.isnan(X), means, X) for X in arrays)
@@ -0,0 +1,224 @@
+# instrumentation.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import METRICS_ENABLED, METRICS_LOG_PATH
+
+_lock = threading.Lock()
+_enabled = METRICS_ENABLED
+_timings = {}   # span name -> [count, total_s, max_s]
+_counters = {}  # counter name -> value
+_rerun = threading.local()  # per-thread (per Streamlit session) rerun breakdown
+_server = None  # this process's /metrics server, once started
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def enable(flag: bool = True):
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(name: str):
+    """
+    Time a block: `with span("load.csv"): ...`. Returns a shared no-op context
+    manager when instrumentation is disabled, so the cost is one function call.
+    """
+    if not _enabled:
+        return _NOOP
+    return _timed(name)
+
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """
+    Decorator form of span().
+    """
+    def wrap(fn):
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _timed(name):
+                return fn(*args, **kwargs)
+        inner.__name__ = fn.__name__
+        inner.__doc__ = fn.__doc__
+        return inner
+    return wrap
+
+
+def record(name: str, seconds: float):
+    with _lock:
+        entry = _timings.get(name)
+        if entry is None:
+            _timings[name] = [1, seconds, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+    breakdown = getattr(_rerun, "breakdown", None)
+    if breakdown is not None:
+        breakdown[name] = breakdown.get(name, 0.0) + seconds
+
+
+def count(name: str, value: float = 1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def start_rerun():
+    """
+    Begin collecting a per-rerun breakdown for the current Streamlit script run.
+    """
+    _rerun.breakdown = {} if _enabled else None
+    _rerun.started = time.perf_counter()
+
+
+def rerun_breakdown() -> dict:
+    """
+    Seconds spent per span since start_rerun(), plus the total elapsed time.
+    """
+    breakdown = dict(getattr(_rerun, "breakdown", None) or {})
+    started = getattr(_rerun, "started", None)
+    if started is not None:
+        breakdown["rerun.total"] = time.perf_counter() - started
+    return breakdown
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "timings": {
+                name: {"count": c, "total_s": total, "max_s": peak, "mean_s": total / c}
+                for name, (c, total, peak) in _timings.items()
+            },
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def write_json_log(path: str = METRICS_LOG_PATH, extra: dict = None):
+    """
+    Append the current snapshot as one JSON line to a local log file.
+    """
+    if not _enabled:
+        return
+    entry = {"ts": time.time(), "pid": os.getpid(), **snapshot()}
+    if extra:
+        entry.update(extra)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def _metric_name(name: str) -> str:
+    return "b2twin_" + "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def prometheus_text() -> str:
+    """
+    Render all spans and counters in the Prometheus text exposition format.
+    """
+    snap = snapshot()
+    lines = []
+    if snap["timings"]:
+        lines.append("# TYPE b2twin_span_seconds_total counter")
+        for name, t in sorted(snap["timings"].items()):
+            lines.append(f'b2twin_span_seconds_total{{span="{name}"}} {t["total_s"]:.6f}')
+        lines.append("# TYPE b2twin_span_calls_total counter")
+        for name, t in sorted(snap["timings"].items()):
+            lines.append(f'b2twin_span_calls_total{{span="{name}"}} {t["count"]}')
+        lines.append("# TYPE b2twin_span_max_seconds gauge")
+        for name, t in sorted(snap["timings"].items()):
+            lines.append(f'b2twin_span_max_seconds{{span="{name}"}} {t["max_s"]:.6f}')
+    for name, value in sorted(snap["counters"].items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """
+    Serve prometheus_text() at http://host:port/metrics from a daemon thread,
+    so processes without a web framework of their own (the Streamlit
+    dashboards) export the spans they record. Starts once per process and
+    only when instrumentation is enabled; returns the server, or None when
+    disabled or the port is taken (e.g. by a second copy of the dashboard).
+    """
+    global _server
+    if not _enabled:
+        return None
+    with _lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            _server = ThreadingHTTPServer((host, port), Handler)
+        except OSError:
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def render_rerun_panel(st):
+    """
+    Optional Streamlit expander showing where this rerun's time went.
+    """
+    if not _enabled:
+        return
+    breakdown = rerun_breakdown()
+    with st.expander("⏱️ Rerun timing breakdown"):
+        rows = sorted(breakdown.items(), key=lambda kv: kv[1], reverse=True)
+        st.table({"stage": [k for k, _ in rows], "ms": [round(v * 1000, 2) for _, v in rows]})
+    write_json_log(extra={"rerun": breakdown})
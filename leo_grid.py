@@ -0,0 +1,227 @@
+# leo_grid.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dataset_loader import parse_timestamps
+from sensor_catalog import get_catalog, zone_from_filename
+
+AXES = ("y", "x", "level")  # order of the numbers in "leo-w_<y>_<x>_<level>"
+MISSING_SENTINEL = -9999.0
+
+
+def grid_columns(file_name: str, columns) -> dict:
+    """
+    {quantity: [(column, (y, x, level)), ...]} for the columns of a LEO file
+    that have a grid position, either in the header ("leo-w_10_-2_3") or in
+    the file name (the CNR4 radiometers).
+    """
+    catalog = get_catalog()
+    grouped = {}
+    for column in columns:
+        entry = catalog.entry(file_name, column)
+        if entry["grid_position"] is not None and entry["quantity"] is not None:
+            grouped.setdefault(entry["quantity"], []).append((column, tuple(entry["grid_position"])))
+    return grouped
+
+
+class LeoGrid:
+    """
+    One LEO quantity as a dense (time x position) float32 tensor plus an
+    int16 (position x 3) coordinate table (y, x, level). Missing readings are
+    NaN. Aggregates, gradients and interpolation are matrix operations over
+    all timestamps at once; nothing loops over sensor names.
+    """
+
+    def __init__(self, quantity: str, unit, times, positions, values, columns=None):
+        self.quantity = quantity
+        self.unit = unit
+        self.times = np.asarray(times, dtype="datetime64[ns]")
+        self.positions = np.asarray(positions, dtype=np.int16).reshape(-1, 3)
+        self.values = np.asarray(values, dtype=np.float32)
+        self.columns = list(columns) if columns is not None else [
+            "leo-w_" + "_".join(str(v) for v in p) for p in self.positions]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, file_name: str, quantity: str = None):
+        """
+        Grid of one quantity of a zone frame (the file's only gridded quantity
+        when `quantity` is None). Returns None when the frame has no grid columns.
+        """
+        grouped = grid_columns(file_name, df.columns)
+        if not grouped:
+            return None
+        quantity = quantity or next(iter(grouped))
+        if quantity not in grouped:
+            return None
+        columns = [c for c, _ in grouped[quantity]]
+        stamps = parse_timestamps(df)
+        times = stamps.to_numpy(dtype="datetime64[ns]") if stamps is not None else np.arange(len(df)).astype("datetime64[ns]")
+        values = df[columns].to_numpy(dtype=np.float32, na_value=np.nan)
+        values = np.where(values == MISSING_SENTINEL, np.float32(np.nan), values)
+        unit = get_catalog().entry(file_name, columns[0])["unit"]
+        return cls(quantity, unit, times, [p for _, p in grouped[quantity]], values, columns)
+
+    @classmethod
+    def combine(cls, grids: list):
+        """
+        One grid from grids of the same quantity at different positions (e.g. the
+        two CNR4 radiometer files), aligned on the first grid's timestamps.
+        """
+        base = grids[0]
+        if len(grids) == 1:
+            return base
+        blocks = [base.values]
+        for grid in grids[1:]:
+            if len(grid.times) == len(base.times) and np.array_equal(grid.times, base.times):
+                blocks.append(grid.values)
+                continue
+            rows = pd.Index(grid.times).get_indexer(base.times)
+            block = np.full((len(base.times), grid.values.shape[1]), np.nan, dtype=np.float32)
+            block[rows >= 0] = grid.values[rows[rows >= 0]]
+            blocks.append(block)
+        return cls(base.quantity, base.unit, base.times,
+                   np.vstack([g.positions for g in grids]), np.hstack(blocks),
+                   [c for g in grids for c in g.columns])
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.positions.nbytes + self.times.nbytes
+
+    def coords(self, axis: str) -> np.ndarray:
+        return self.positions[:, AXES.index(axis)]
+
+    def select(self, **where):
+        """
+        Sub-grid of the positions matching every given coordinate, e.g. select(level=1).
+        """
+        keep = np.ones(len(self.positions), dtype=bool)
+        for axis, value in where.items():
+            keep &= np.isin(self.coords(axis), np.atleast_1d(value))
+        return LeoGrid(self.quantity, self.unit, self.times, self.positions[keep], self.values[:, keep],
+                       [c for c, k in zip(self.columns, keep) if k])
+
+    def mean(self) -> np.ndarray:
+        """
+        Grid-wide mean per timestamp, ignoring missing sensors.
+        """
+        return self.aggregate(None)[1][:, 0]
+
+    def aggregate(self, axis: str = "level", func: str = "mean"):
+        """
+        (groups, (time x group) array) of the sensors grouped by one coordinate,
+        e.g. the mean per level or per downslope distance. func is "mean", "min"
+        or "max"; axis None pools the whole grid.
+        """
+        if axis is None:
+            groups, inverse = np.zeros(1, dtype=np.int16), np.zeros(len(self.positions), dtype=np.intp)
+        else:
+            groups, inverse = np.unique(self.coords(axis), return_inverse=True)
+        if func == "mean":
+            membership = np.zeros((len(self.positions), len(groups)), dtype=np.float32)
+            membership[np.arange(len(self.positions)), inverse] = 1.0
+            present = ~np.isnan(self.values)
+            sums = np.where(present, self.values, 0.0) @ membership
+            counts = present.astype(np.float32) @ membership
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return groups, np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+        reduce = {"min": np.fmin, "max": np.fmax}[func]
+        order = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[order], np.arange(len(groups)))
+        return groups, reduce.reduceat(self.values[:, order], starts, axis=1)
+
+    def gradient(self, axis: str = "y") -> np.ndarray:
+        """
+        Least-squares slope of the value along one coordinate at every
+        timestamp (units per metre along y or x, per level step along level),
+        using only the sensors reporting at that time.
+        """
+        coord = self.coords(axis).astype(np.float64)
+        present = ~np.isnan(self.values)
+        weight = present.astype(np.float64)
+        values = np.where(present, self.values, 0.0).astype(np.float64)
+        n = weight.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            c_mean = (weight @ coord) / n
+            v_mean = values.sum(axis=1) / n
+            dc = (coord[None, :] - c_mean[:, None]) * weight
+            cov = (dc * (values - v_mean[:, None] * weight)).sum(axis=1)
+            var = (dc * dc).sum(axis=1)
+            return np.where(var > 0, cov / var, np.nan).astype(np.float32)
+
+    def interpolate(self, points, power: float = 2.0) -> np.ndarray:
+        """
+        Values at arbitrary (y, x, level) points for every timestamp by
+        inverse-distance weighting over the reporting sensors: a (time x point)
+        array from two matrix products. A point on a sensor returns its reading
+        at the timestamps where that sensor reports, and is interpolated from
+        the others where its reading is missing.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        distance = np.linalg.norm(self.positions[:, None, :].astype(np.float64) - points[None, :, :], axis=2)
+        exact = distance == 0
+        with np.errstate(divide="ignore"):
+            weights = np.where(exact, 0.0, distance ** -power)
+        # Exact-hit and inverse-distance weights side by side, so both come from the same two products
+        weights = np.hstack([exact, weights]).astype(np.float32)
+        present = ~np.isnan(self.values)
+        sums = np.where(present, self.values, 0.0) @ weights
+        norm = present.astype(np.float32) @ weights
+        n = len(points)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            on_sensor = np.where(norm[:, :n] > 0, sums[:, :n] / norm[:, :n], np.nan)
+            around = np.where(norm[:, n:] > 0, sums[:, n:] / norm[:, n:], np.nan)
+        return np.where(norm[:, :n] > 0, on_sensor, around).astype(np.float32)
+
+    def profile(self, axis: str = "y", n_points: int = 25, **fixed) -> tuple:
+        """
+        (coordinates, (time x point) values) interpolated at evenly spaced
+        points along one axis, with the other coordinates held at `fixed`
+        values (their grid means by default), e.g. a downslope slice at level 1.
+        """
+        along = np.linspace(self.coords(axis).min(), self.coords(axis).max(), n_points)
+        points = np.empty((n_points, 3))
+        for i, name in enumerate(AXES):
+            points[:, i] = along if name == axis else fixed.get(name, self.coords(name).mean())
+        return along, self.interpolate(points)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values, index=pd.DatetimeIndex(self.times, name="datetime"), columns=self.columns)
+
+
+_grids = {}  # (dataset names, shapes) -> {quantity: LeoGrid}
+_grids_lock = threading.Lock()
+
+
+def build_leo_grids(zones: dict) -> dict:
+    """
+    {quantity: LeoGrid} over every LEO dataset in `zones`, so quantities that
+    are split across files by position (the CNR4 radiometers) share one grid.
+    Files measuring a quantity in different units are not mixed: the unit
+    with the most sensors keeps the plain name, the others are keyed
+    "quantity[unit]" (e.g. "temperature[K]" for the radiometer bodies).
+    Cached per process for the same datasets.
+    """
+    leo = {name: df for name, df in zones.items() if zone_from_filename(name) == "LEO"}
+    key = tuple(sorted((name, df.shape) for name, df in leo.items()))
+    with _grids_lock:
+        if key in _grids:
+            return _grids[key]
+    parts = {}
+    for name, df in leo.items():
+        for quantity in grid_columns(name, df.columns):
+            grid = LeoGrid.from_frame(df, name, quantity)
+            parts.setdefault(quantity, {}).setdefault(grid.unit, []).append(grid)
+    grids = {}
+    for quantity, by_unit in parts.items():
+        ranked = sorted(by_unit.values(), key=lambda found: -sum(len(g.columns) for g in found))
+        for i, found in enumerate(ranked):
+            grids[quantity if i == 0 else f"{quantity}[{found[0].unit}]"] = LeoGrid.combine(found)
+    with _grids_lock:
+        _grids[key] = grids
+    return grids
@@ -0,0 +1,165 @@
+# llm_gateway.py
+
+import heapq
+import itertools
+import json
+import threading
+import time
+
+from constants import OLLAMA_URL, MODEL_NAME, LLM_CONCURRENCY
+from instrumentation import record, count, is_enabled
+
+# Lower value = served first
+CHAT = 0       # conversational replies an operator is waiting on
+ANALYSIS = 1   # on-demand zone analysis from the dashboards
+BATCH = 2      # headless batch runs
+PRIORITY_NAMES = {CHAT: "chat", ANALYSIS: "analysis", BATCH: "batch"}
+
+
+class _Request:
+    def __init__(self, key, payload, priority):
+        self.key = key
+        self.payload = payload
+        self.priority = priority
+        self.enqueued = time.perf_counter()
+        self.started = None
+        self.waiters = 1
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMGateway:
+    """
+    Shared front door to the Ollama server. Requests wait in a priority queue,
+    at most `concurrency` generations run at once, and identical prompts that
+    are already queued or running share one generation instead of starting another.
+    """
+
+    def __init__(self, url: str = OLLAMA_URL, model: str = MODEL_NAME,
+                 concurrency: int = LLM_CONCURRENCY, timeout: int = 300):
+        self.url = url
+        self.model = model
+        self.concurrency = max(int(concurrency), 1)
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._queue = []      # heap of (priority, seq, request)
+        self._inflight = {}   # key -> request, from submit until the generation finishes
+        self._seq = itertools.count()
+        self._workers = []
+        self._stats = {}      # priority -> [requests, coalesced, generations, wait_s, max_wait_s, service_s, max_service_s]
+
+    def _start_workers(self):
+        while len(self._workers) < self.concurrency:
+            worker = threading.Thread(target=self._work, daemon=True, name=f"llm-gateway-{len(self._workers)}")
+            self._workers.append(worker)
+            worker.start()
+
+    def submit(self, prompt: str, priority: int = ANALYSIS, **options) -> _Request:
+        payload = {"model": self.model, "prompt": prompt, "stream": False, **options}
+        key = json.dumps(payload, sort_keys=True)
+        with self._cond:
+            stats = self._stats.setdefault(priority, [0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            request = self._inflight.get(key)
+            if request is not None:
+                request.waiters += 1
+                stats[1] += 1
+                count("llm.coalesced")
+                if priority < request.priority and request.started is None:
+                    # re-queue at the more urgent priority; the stale heap entry is skipped
+                    request.priority = priority
+                    heapq.heappush(self._queue, (priority, next(self._seq), request))
+                    self._cond.notify()
+                return request
+            request = _Request(key, payload, priority)
+            self._inflight[key] = request
+            heapq.heappush(self._queue, (priority, next(self._seq), request))
+            self._start_workers()
+            self._cond.notify()
+        return request
+
+    def generate(self, prompt: str, priority: int = ANALYSIS, **options) -> dict:
+        """
+        Blocking call returning Ollama's JSON response. Raises whatever the
+        underlying request raised, for every caller sharing the generation.
+        """
+        request = self.submit(prompt, priority, **options)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _work(self):
+        import requests  # loaded by the worker, off the app's start-up path
+
+        session = requests.Session()
+        while True:
+            with self._cond:
+                while True:
+                    while not self._queue:
+                        self._cond.wait()
+                    priority, _, request = heapq.heappop(self._queue)
+                    if request.started is None and priority == request.priority:
+                        break
+                request.started = time.perf_counter()
+            try:
+                response = session.post(self.url, json=request.payload, timeout=self.timeout)
+                response.raise_for_status()
+                request.result = response.json()
+            except Exception as e:
+                request.error = e
+            finished = time.perf_counter()
+            self._finish(request, request.started - request.enqueued, finished - request.started)
+
+    def _finish(self, request, wait_s, service_s):
+        with self._cond:
+            self._inflight.pop(request.key, None)
+            stats = self._stats.setdefault(request.priority, [0, 0, 0, 0.0, 0.0, 0.0, 0.0])
+            stats[2] += 1
+            stats[3] += wait_s
+            stats[4] = max(stats[4], wait_s)
+            stats[5] += service_s
+            stats[6] = max(stats[6], service_s)
+        request.done.set()
+        if is_enabled():
+            name = PRIORITY_NAMES.get(request.priority, str(request.priority))
+            record(f"llm.{name}.queue_wait", wait_s)
+            record(f"llm.{name}.service", service_s)
+
+    def stats(self) -> dict:
+        """
+        Per-priority request counts, coalesced requests and mean/max queue wait
+        and service time (per generation), plus the current queue depth.
+        """
+        with self._cond:
+            out = {"queued": sum(1 for p, _, r in self._queue if r.started is None and p == r.priority),
+                   "in_flight": sum(1 for r in self._inflight.values() if r.started is not None),
+                   "concurrency": self.concurrency}
+            for priority, (n, coalesced, generations, wait, max_wait, service, max_service) in sorted(self._stats.items()):
+                out[PRIORITY_NAMES.get(priority, str(priority))] = {
+                    "requests": n,
+                    "coalesced": coalesced,
+                    "generations": generations,
+                    "mean_wait_s": wait / max(generations, 1),
+                    "max_wait_s": max_wait,
+                    "mean_service_s": service / max(generations, 1),
+                    "max_service_s": max_service,
+                }
+            return out
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """
+    Process-wide gateway shared by every Streamlit session.
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
@@ -0,0 +1,98 @@
+# memory_log.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from array import array
+from collections import deque
+
+from constants import MEMORY_LOG_DIR, MEMORY_LOG_CAPACITY, MEMORY_LOG_PAGE_SIZE
+
+
+class MemoryLog:
+    """
+    Agent memory log for one session. The newest `capacity` entries live in a
+    ring buffer; every entry is also appended to a JSONL file, and older pages
+    are read back from it on demand through a byte-offset index. RAM holds at
+    most `capacity` entries plus 8 bytes of offset per entry ever written.
+    """
+
+    def __init__(self, path: str = None, capacity: int = MEMORY_LOG_CAPACITY):
+        if path is None:
+            path = os.path.join(MEMORY_LOG_DIR, f"session_{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}.jsonl")
+        self.path = path
+        self.capacity = capacity
+        self.recent = deque(maxlen=capacity)
+        self.offsets = array("q")  # seq -> byte offset of the entry in the file
+        self.zone_seqs = {}        # zone -> array of seqs, for filtered pages
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def append(self, zone, text: str) -> dict:
+        with self._lock:
+            entry = {"seq": len(self.offsets), "ts": time.time(), "zone": zone, "text": text}
+            line = (json.dumps(entry) + "\n").encode()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self.offsets.append(self._end)
+            self._end += len(line)
+            self.recent.append(entry)
+            self.zone_seqs.setdefault(zone, array("q")).append(entry["seq"])
+            return entry
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def count(self, zone=None) -> int:
+        if zone is None:
+            return len(self.offsets)
+        return len(self.zone_seqs.get(zone, ()))
+
+    def zones(self) -> list:
+        return [z for z in self.zone_seqs if z is not None]
+
+    def pages(self, zone=None, page_size: int = MEMORY_LOG_PAGE_SIZE) -> int:
+        return max((self.count(zone) + page_size - 1) // page_size, 1)
+
+    def _read(self, seqs) -> list:
+        """
+        Entries by seq: from the ring buffer when still there, otherwise from disk.
+        """
+        oldest_recent = self.recent[0]["seq"] if self.recent else len(self.offsets)
+        entries = []
+        missing = []
+        for seq in seqs:
+            if seq >= oldest_recent:
+                entries.append(self.recent[seq - oldest_recent])
+            else:
+                entries.append(None)
+                missing.append((len(entries) - 1, seq))
+        if missing:
+            with open(self.path, "rb") as f:
+                for pos, seq in missing:
+                    f.seek(self.offsets[seq])
+                    entries[pos] = json.loads(f.readline())
+        return entries
+
+    def page(self, number: int = 0, zone=None, page_size: int = MEMORY_LOG_PAGE_SIZE) -> list:
+        """
+        Page `number` of the log, newest first (page 0 holds the latest entries).
+        """
+        with self._lock:
+            seqs = self.zone_seqs.get(zone, array("q")) if zone is not None else None
+            total = len(seqs) if seqs is not None else len(self.offsets)
+            stop = total - number * page_size
+            start = max(stop - page_size, 0)
+            if stop <= 0:
+                return []
+            positions = range(stop - 1, start - 1, -1)
+            wanted = [seqs[i] for i in positions] if seqs is not None else list(positions)
+            return self._read(wanted)
+
+    def page_text(self, number: int = 0, zone=None, page_size: int = MEMORY_LOG_PAGE_SIZE) -> str:
+        return "\n".join(e["text"] for e in self.page(number, zone, page_size))
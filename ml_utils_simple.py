@@ -1,21 +1,42 @@
 # ml_utils_simple.py
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
+from feature_builder import own_history_inputs
 
-def train_and_predict(df, target_col):
-    df = df.dropna()
-    if target_col not in df.columns or df.shape[0] < 5:
-        return None, None
+def fit_model(df, target_col, zone=None):
+    """
+    Fit the scaler and linear model train_and_predict uses. Returns a dict with
+    "model", "scaler", "features" (input column names, in order), the scaled
+    training matrix "X" and target "y", or None when there is nothing to fit.
+    """
+    if target_col not in df.columns:
+        return None
+    others = df.drop(columns=[target_col]).select_dtypes(include=['float64', 'int64'])
+    if others.shape[1] == 0:
+        # Single-sensor files: fall back to the target's own lags, trailing means and time of day
+        inputs = own_history_inputs(df, target_col, zone)
+        if inputs is None or len(inputs[1]) < 5:
+            return None
+        X, y, features = inputs
+    else:
+        df = df.dropna()
+        if df.shape[0] < 5:
+            return None
+        X = df[others.columns]
+        y = df[target_col]
+        features = list(X.columns)
 
-    X = df.drop(columns=[target_col]).select_dtypes(include=['float64', 'int64'])
-    y = df[target_col]
-
-    if X.shape[1] == 0:
-        return None, None
+    # scikit-learn takes seconds to import; load it on the first fit, not at app start
+    from sklearn.linear_model import LinearRegression
+    from sklearn.preprocessing import StandardScaler
 
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X)
     model = LinearRegression()
     model.fit(X_scaled, y)
-    preds = model.predict(X_scaled)
-    return model, preds
+    return {"model": model, "scaler": scaler, "features": features, "X": X_scaled, "y": y}
+
+def train_and_predict(df, target_col):
+    fitted = fit_model(df, target_col)
+    if fitted is None:
+        return None, None
+    preds = fitted["model"].predict(fitted["X"])
+    return fitted["model"], preds
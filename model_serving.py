@@ -0,0 +1,298 @@
+# model_serving.py
+
+import threading
+import time
+
+import numpy as np
+
+from constants import DATA_DIR, PREDICT_BATCH_WINDOW_MS, PREDICT_MAX_BATCH, MODEL_CHECK_INTERVAL_S
+from ml_utils_simple import fit_model
+from shared_datasets import get_shared_datasets
+from summary_engine import frame_fingerprint
+from instrumentation import count
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+LATENCY_BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout (upper bounds, +Inf last).
+    """
+
+    def __init__(self, buckets):
+        self.buckets = np.asarray(buckets, dtype=np.float64)
+        self.counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)
+        self.sum = 0.0
+
+    def observe(self, values):
+        values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+        self.counts += np.bincount(np.searchsorted(self.buckets, values, side="left"), minlength=len(self.counts))
+        self.sum += float(values.sum())
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum())
+
+    def to_dict(self) -> dict:
+        cumulative = np.cumsum(self.counts)
+        return {"buckets": {**{f"{b:g}": int(c) for b, c in zip(self.buckets, cumulative)}, "+Inf": int(cumulative[-1])},
+                "count": self.count, "sum": self.sum}
+
+    def prometheus_lines(self, metric: str, labels: str) -> list:
+        cumulative = np.cumsum(self.counts)
+        lines = [f'{metric}_bucket{{{labels},le="{b:g}"}} {int(c)}' for b, c in zip(self.buckets, cumulative)]
+        lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {int(cumulative[-1])}')
+        lines.append(f"{metric}_sum{{{labels}}} {self.sum:.6f}")
+        lines.append(f"{metric}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class ServedModel:
+    """
+    A fitted zone model ready for serving. The scaler and linear model are
+    folded into one weight vector and intercept, so a batch of rows is
+    predicted with a single matrix-vector product.
+    """
+
+    def __init__(self, zone: str, target: str, fitted: dict, fingerprint=None):
+        self.zone = zone
+        self.target = target
+        self.features = list(fitted["features"])
+        scaler, model = fitted["scaler"], fitted["model"]
+        scale = np.where(scaler.scale_ == 0, 1.0, scaler.scale_)
+        self.weights = np.asarray(model.coef_, dtype=np.float64) / scale
+        self.intercept = float(model.intercept_ - np.dot(self.weights, scaler.mean_))
+        self.means = np.asarray(scaler.mean_, dtype=np.float64)  # fills features a request leaves out
+        self.rows = len(fitted["y"])
+        self.fingerprint = fingerprint
+        self.trained_at = time.time()
+
+    def rows_from(self, instances) -> np.ndarray:
+        """
+        (n x features) matrix from a list of {feature: value} dicts or of
+        value lists in feature order. Missing or null features get the training mean.
+        """
+        if not instances:
+            return np.empty((0, len(self.features)))
+        objects = [isinstance(row, dict) for row in instances]
+        if any(objects) and not all(objects):
+            raise ValueError("instances must be all objects or all value lists")
+        if objects[0]:
+            unknown = set().union(*instances) - set(self.features)
+            if unknown:
+                raise ValueError(f"unknown features: {sorted(unknown)}")
+            X = np.array([[row.get(f, np.nan) for f in self.features] for row in instances], dtype=np.float64)
+        else:
+            X = np.array(instances, dtype=np.float64).reshape(len(instances), -1)
+            if X.shape[1] != len(self.features):
+                raise ValueError(f"expected {len(self.features)} values per instance, got {X.shape[1]}")
+        return np.where(np.isnan(X), self.means, X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.weights + self.intercept
+
+    def describe(self) -> dict:
+        return {"zone": self.zone, "target": self.target, "features": self.features,
+                "training_rows": self.rows, "trained_at": self.trained_at}
+
+
+class _Pending:
+    def __init__(self, X):
+        self.X = X
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.batch_size = 0
+
+
+class MicroBatcher:
+    """
+    Collects concurrent predict requests for one model for up to `window_s`
+    (or until `max_batch` rows are waiting) and answers them all with one
+    vectorized predict call. Keeps batch-size and latency histograms.
+    """
+
+    def __init__(self, served: ServedModel, window_s: float = PREDICT_BATCH_WINDOW_MS / 1000.0,
+                 max_batch: int = PREDICT_MAX_BATCH):
+        self.served = served
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._rows = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.latency = Histogram(LATENCY_BUCKETS_S)
+        self.batches = 0
+        self._worker = threading.Thread(target=self._work, daemon=True,
+                                        name=f"predict-{served.zone}-{served.target}")
+        self._worker.start()
+
+    def predict(self, instances) -> dict:
+        """
+        Blocking call: predictions for the instances plus the size of the batch they rode in.
+        """
+        pending = _Pending(self.served.rows_from(instances))
+        with self._cond:
+            self._pending.append(pending)
+            self._rows += len(pending.X)
+            self._cond.notify()
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return {"predictions": pending.result.tolist(), "batch_size": pending.batch_size}
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].enqueued + self.window_s
+                while self._rows < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending, self._rows = self._pending, [], 0
+            sizes = [len(p.X) for p in batch]
+            try:
+                predictions = self.served.predict(np.vstack([p.X for p in batch]))
+            except Exception as e:
+                for p in batch:
+                    p.error = e
+                    p.done.set()
+                continue
+            finished = time.perf_counter()
+            offsets = np.cumsum([0] + sizes)
+            for p, start, stop in zip(batch, offsets[:-1], offsets[1:]):
+                p.result = predictions[start:stop]
+                p.batch_size = int(offsets[-1])
+                p.done.set()
+            with self._cond:
+                self.batches += 1
+                self.batch_sizes.observe(offsets[-1])
+                self.latency.observe([finished - p.enqueued for p in batch])
+            count("predict.batches")
+            count("predict.requests", len(batch))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"batches": self.batches, "requests": self.latency.count,
+                    "batch_size": self.batch_sizes.to_dict(), "latency_s": self.latency.to_dict()}
+
+
+def _targets(df) -> list:
+    return df.select_dtypes(include=["float64", "int64"]).columns.tolist()
+
+
+class ModelRegistry:
+    """
+    Zone models served by ai_comm_server, trained on first use from the
+    process-wide zone frames with ml_utils_simple and retrained when a
+    zone's data changes. One MicroBatcher per (zone, target). A served model
+    is checked against its data at most every MODEL_CHECK_INTERVAL_S, and
+    training holds only that model's lock, so other models keep answering.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, check_interval_s: float = MODEL_CHECK_INTERVAL_S):
+        self.data_dir = data_dir
+        self.check_interval_s = check_interval_s
+        self._batchers = {}   # (zone, target) -> MicroBatcher
+        self._checked = {}    # (zone, target) -> (monotonic time of the last check, frame it was checked against)
+        self._fit_locks = {}  # (zone, target) -> lock held while checking or training that model
+        self._lock = threading.Lock()
+
+    def zones(self) -> dict:
+        """
+        {zone: [numeric target columns]} that can be served.
+        """
+        zones, _ = get_shared_datasets(self.data_dir)
+        return {name: _targets(df) for name, df in zones.items()}
+
+    def _fresh(self, key):
+        """
+        The batcher for `key` if it was checked recently enough; call with self._lock held.
+        """
+        batcher, checked = self._batchers.get(key), self._checked.get(key)
+        if batcher is not None and time.monotonic() - checked[0] < self.check_interval_s:
+            return batcher
+        return None
+
+    def batcher(self, zone: str, target: str) -> MicroBatcher:
+        key = (zone, target)
+        with self._lock:
+            batcher = self._fresh(key)
+        if batcher is not None:
+            return batcher
+        zones, _ = get_shared_datasets(self.data_dir)
+        if zone not in zones:
+            raise KeyError(f"unknown zone: {zone}")
+        df = zones[zone]
+        # checked before fitting: the time column or a typo must not train (and keep) a model
+        if target not in _targets(df):
+            raise KeyError(f"unknown target for {zone}: {target}")
+        with self._lock:
+            fit_lock = self._fit_locks.setdefault(key, threading.Lock())
+        with fit_lock:
+            with self._lock:
+                batcher = self._fresh(key)  # another request may have checked it while this one waited
+                checked = self._checked.get(key)
+            if batcher is not None:
+                return batcher
+            batcher = self._batchers.get(key)
+            # The shared frames are read-only and replaced on change: the same object needs no hashing
+            if batcher is None or checked[1] is not df:
+                fingerprint = frame_fingerprint(df)
+                if batcher is None or batcher.served.fingerprint != fingerprint:
+                    fitted = fit_model(df, target, zone)
+                    if fitted is None:
+                        raise ValueError(f"cannot train a model for {target} in {zone}")
+                    served = ServedModel(zone, target, fitted, fingerprint)
+                    if batcher is not None:
+                        batcher.served = served  # keep the worker and histograms, swap the model
+                    else:
+                        batcher = MicroBatcher(served)
+                    count("predict.models_trained")
+            with self._lock:
+                self._batchers[key] = batcher
+                self._checked[key] = (time.monotonic(), df)
+            return batcher
+
+    def predict(self, zone: str, target: str, instances) -> dict:
+        return self.batcher(zone, target).predict(instances)
+
+    def stats(self) -> dict:
+        with self._lock:
+            batchers = list(self._batchers.items())
+        return {f"{zone}/{target}": b.stats() for (zone, target), b in batchers}
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            batchers = list(self._batchers.items())
+        if not batchers:
+            return ""
+        lines = ["# TYPE b2twin_predict_batch_size histogram"]
+        for (zone, target), b in batchers:
+            with b._cond:
+                lines += b.batch_sizes.prometheus_lines("b2twin_predict_batch_size", f'zone="{zone}",target="{target}"')
+        lines.append("# TYPE b2twin_predict_latency_seconds histogram")
+        for (zone, target), b in batchers:
+            with b._cond:
+                lines += b.latency.prometheus_lines("b2twin_predict_latency_seconds", f'zone="{zone}",target="{target}"')
+        return "\n".join(lines) + "\n"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ModelRegistry:
+    """
+    Process-wide registry shared by every request thread.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -0,0 +1,135 @@
+# model_zoo.py
+
+import os
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from feature_builder import build_features, fill_missing, model_inputs, own_history_inputs
+from instrumentation import span
+
+CANDIDATES = ("linear", "ridge", "gradient_boosting")
+CV_SPLITS = 5
+MIN_ROWS = 20  # fewer rows than this cannot be split into meaningful folds
+INLINE_ROWS = 2000  # below this the folds are cheaper than shipping them to workers
+
+
+def make_model(name: str):
+    """
+    Fresh, unfitted candidate. Built by name so worker processes receive only strings.
+    scikit-learn is imported here, on first use, to keep it out of app start-up.
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import LinearRegression, Ridge
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if name == "linear":
+        return make_pipeline(StandardScaler(), LinearRegression())
+    if name == "ridge":
+        return make_pipeline(StandardScaler(), Ridge(alpha=1.0))
+    if name == "gradient_boosting":
+        return HistGradientBoostingRegressor(max_iter=100, random_state=0)
+    raise ValueError(f"Unknown model: {name}")
+
+
+def prepare_xy(df: pd.DataFrame, target_col: str, zone: str = None):
+    """
+    Features and target the same way train_and_predict builds them.
+    Returns (X, y, feature names) or (None, None, None).
+    """
+    if target_col not in df.columns:
+        return None, None, None
+    others = df.drop(columns=[target_col]).select_dtypes(include=["float64", "int64"])
+    if others.shape[1] == 0:
+        # single-sensor files: the target's own lags, trailing means and time of day
+        return own_history_inputs(df, target_col, zone) or (None, None, None)
+    df = df.dropna()
+    X = df[others.columns]
+    return X.to_numpy(dtype=float), df[target_col].to_numpy(dtype=float), list(X.columns)
+
+
+def _fit_fold(name, X_train, y_train, X_test, y_test):
+    X_train, X_test = fill_missing(X_train, X_test)  # from the training rows only
+    model = make_model(name)
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+    predicted = model.predict(X_test)
+    residual = y_test - predicted
+    return name, float(np.mean(np.abs(residual))), float(np.sqrt(np.mean(residual ** 2))), fit_s, predicted
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """
+    One process pool for the whole process, created on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        return _pool
+
+
+def select_model(df: pd.DataFrame, target_col: str, candidates=CANDIDATES, n_splits: int = CV_SPLITS,
+                 parallel=None, zones=None, zone=None) -> dict:
+    """
+    Score every candidate on rolling-origin time-series folds (train on the past,
+    test on the next block), then refit the lowest-RMSE candidate on all rows.
+    Rows are assumed to be in time order, as they are in the zone files.
+    Pass all `zones` and the `zone` name of df to use cross-zone lagged features.
+
+    Returns None when the data cannot be modelled, otherwise a dict with
+    "scores" (one row per candidate), "best", "model", "predictions" and "features".
+    "predictions" are the best candidate's out-of-fold forecasts: each test
+    block predicted by the model trained on the rows before it, at positions
+    "prediction_rows" of the model rows (the first training block has none).
+    """
+    if zones is not None and zone in zones:
+        X, y, features, _ = model_inputs(build_features(zones, zone, target_col))
+    else:
+        X, y, features = prepare_xy(df, target_col, zone)
+    if X is None or len(y) < MIN_ROWS:
+        return None
+    from sklearn.model_selection import TimeSeriesSplit
+
+    splits = list(TimeSeriesSplit(n_splits=min(n_splits, len(y) // 5)).split(X))
+    tasks = [(name, X[tr], y[tr], X[te], y[te]) for name in candidates for tr, te in splits]
+    if parallel is None:
+        parallel = len(y) >= INLINE_ROWS and (os.cpu_count() or 1) > 1
+
+    with span("model_zoo.cross_validate"):
+        if parallel:
+            results = list(_get_pool().map(_fit_fold, *zip(*tasks)))
+        else:
+            results = [_fit_fold(*task) for task in tasks]
+
+    scores = (
+        pd.DataFrame([r[:4] for r in results], columns=["model", "mae", "rmse", "fit_s"])
+        .groupby("model", sort=False)
+        .agg(mae=("mae", "mean"), rmse=("rmse", "mean"), fit_s=("fit_s", "mean"), folds=("mae", "size"))
+        .sort_values("rmse")
+        .reset_index()
+    )
+    best = scores["model"].iloc[0]
+    # tasks and results are in the same order: candidates x folds
+    out_of_fold = [(te, r[4]) for (name, *_), (tr, te), r in zip(tasks, splits * len(candidates), results) if name == best]
+    with span("model_zoo.refit"):
+        model = make_model(best)
+        model.fit(fill_missing(X)[0], y)
+    return {
+        "target": target_col,
+        "scores": scores,
+        "best": best,
+        "model": model,
+        "predictions": np.concatenate([p for _, p in out_of_fold]),
+        "prediction_rows": np.concatenate([te for te, _ in out_of_fold]),
+        "features": features,
+    }
@@ -2,9 +2,7 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import streamlit as st
-from statsmodels.tsa.arima.model import ARIMA
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -15,6 +13,8 @@ def local_descriptive_analysis(df: pd.DataFrame, file_name: str):
     - Plots histograms for each numeric column.
     Returns the text summary.
     """
+    import matplotlib.pyplot as plt
+
     summary_lines = [f"Descriptive Analysis for {file_name}:"]
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     for col in numeric_cols:
@@ -39,6 +39,8 @@ def local_analytical_analysis(df: pd.DataFrame, file_name: str, z_thresh=3.0):
     Performs analytical analysis using Z-score based anomaly detection.
     Returns a text summary of potential outliers for each numeric column and plots boxplots.
     """
+    import matplotlib.pyplot as plt
+
     outlier_info = {}
     numeric_cols = df.select_dtypes(include=[np.number]).columns
     for col in numeric_cols:
@@ -62,6 +64,9 @@ def local_predictive_analysis(df: pd.DataFrame, file_name: str, target_var: str,
     Performs simple time series forecasting using ARIMA on the target variable.
     Plots the forecast and returns a forecast summary.
     """
+    import matplotlib.pyplot as plt
+    from statsmodels.tsa.arima.model import ARIMA
+
     if target_var not in df.columns:
         return f"Target variable '{target_var}' not found in {file_name}."
     
@@ -1,22 +1,26 @@
 # custom_inputs.py
 
+from sensor_catalog import get_catalog
+
 def get_dataset_custom_context(df, file_name: str) -> str:
     """
     Inspects the DataFrame's columns and returns dataset-specific context.
     """
     columns = df.columns.tolist()
     context_lines = [f"Dataset '{file_name}' includes the following variables: {', '.join(columns)}."]
+    catalog = get_catalog()
+    quantities = {catalog.quantity_of(file_name, col) for col in columns}
     
     # Adjust context based on common ecological variables:
-    if any(col in columns for col in ['temp', 'temperature']):
+    if "temperature" in quantities:
         context_lines.append("Temperature data is critical; consider diurnal patterns and verify unit conversion.")
-    if any(col in columns for col in ['rh', 'relative_humidity']):
+    if "relative_humidity" in quantities:
         context_lines.append("Relative humidity data influences evaporation and plant stress.")
-    if any(col in columns for col in ['ph']):
+    if "ph" in quantities:
         context_lines.append("pH values help assess water quality in aquatic ecosystems.")
-    if any(col in columns for col in ['salinity']):
+    if "salinity" in quantities:
         context_lines.append("Salinity levels are important for marine or estuarine conditions.")
-    if any(col in columns for col in ['co2']):
+    if "co2" in quantities:
         context_lines.append("CO₂ data reflects carbon cycling and greenhouse gas dynamics.")
     
     return "\n".join(context_lines)
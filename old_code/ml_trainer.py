@@ -1,16 +1,11 @@
 # ml_trainer.py
 import os
-import joblib
 import re
 import numpy as np
-from sklearn.linear_model import SGDRegressor
-from sklearn.preprocessing import StandardScaler
 from constants import MODEL_DIR
 
-# ✅ Get absolute path to models directory
+# ✅ Get absolute path to models directory (created on the first save)
 ABS_MODEL_DIR = os.path.abspath(MODEL_DIR)
-if not os.path.exists(ABS_MODEL_DIR):
-    os.makedirs(ABS_MODEL_DIR)
 
 # ✅ Utility to sanitize filenames
 def sanitize_filename(name):
@@ -19,6 +14,10 @@ def sanitize_filename(name):
     return name
 
 def train_zone_model(df, zone_name, target_col):
+    import joblib
+    from sklearn.linear_model import SGDRegressor
+    from sklearn.preprocessing import StandardScaler
+
     df = df.dropna().select_dtypes(include=['float64', 'int64'])
     if target_col not in df.columns:
         return "❌ Target not found"
@@ -46,6 +45,8 @@ def train_zone_model(df, zone_name, target_col):
     return f"✅ Model trained and saved for {zone_name_clean}"
 
 def predict_zone_model(df, zone_name, target_col):
+    import joblib
+
     try:
         zone_name_clean = sanitize_filename(zone_name)
         model_path = os.path.join(ABS_MODEL_DIR, f"{zone_name_clean}_model.pkl")
@@ -1,9 +1,10 @@
 # online_trainer_river.py
-from river import linear_model, preprocessing
 
 zone_models = {}
 
 def initialize_online_model(zone_name):
+    from river import linear_model, preprocessing
+
     model = preprocessing.StandardScaler() | linear_model.LinearRegression()
     zone_models[zone_name] = model
     return model
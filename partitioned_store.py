@@ -0,0 +1,340 @@
+# partitioned_store.py
+
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from constants import DATA_DIR, PARTITION_INDEX_PATH, SHARED_CACHE_DIR
+from dataset_loader import find_time_column, parse_timestamps
+from sensor_catalog import dataset_stem, get_catalog
+from regular_series import RegularSeries
+from instrumentation import span, count
+
+CACHE_LAYOUT_VERSION = 2  # bump when the column cache format changes
+MONTH_TOKEN = re.compile(r"_([A-Z]{3})-(\d{4})$")
+
+
+def partition_month(file_name: str):
+    """
+    "2025-02" for "Desert_CO2_FEB-2025.csv", None for files without a month suffix.
+    """
+    match = MONTH_TOKEN.search(os.path.splitext(os.path.basename(file_name))[0])
+    if not match:
+        return None
+    month = datetime.datetime.strptime(f"{match.group(1).title()}-{match.group(2)}", "%b-%Y")
+    return month.strftime("%Y-%m")
+
+
+# -------------------------
+# MEMORY-MAPPABLE COLUMN CACHE
+# -------------------------
+def shared_cache_root(data_dir: str) -> str:
+    """
+    Where the column caches of a data directory's files go: SHARED_CACHE_DIR
+    for DATA_DIR, a .shared_cache directory inside any other one, so caches of
+    temporary or synthetic data disappear with their directory.
+    """
+    if os.path.abspath(data_dir) == os.path.abspath(DATA_DIR):
+        return SHARED_CACHE_DIR
+    return os.path.join(data_dir, ".shared_cache")
+
+
+def _cache_prefix(path: str) -> str:
+    """
+    Directory name prefix shared by every cached version of one source file.
+    """
+    source = hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:8]
+    return f"{os.path.splitext(os.path.basename(path))[0]}_{source}"
+
+
+def _cache_dir(cache_root: str, path: str) -> str:
+    stat = os.stat(path)
+    version = hashlib.sha1(f"{stat.st_mtime_ns}|{stat.st_size}|v{CACHE_LAYOUT_VERSION}".encode()).hexdigest()[:8]
+    return os.path.join(cache_root, _cache_prefix(path) + version)
+
+
+def _prune_column_caches(cache_root: str, path: str, current: str):
+    """
+    Remove the caches of earlier versions of a source file. Processes that
+    still map their columns keep them readable (POSIX unlink semantics).
+    """
+    prefix, keep = _cache_prefix(path), os.path.basename(current)
+    stale = re.compile(re.escape(prefix) + r"[0-9a-f]{8}$")
+    for name in os.listdir(cache_root):
+        if name != keep and stale.match(name):
+            shutil.rmtree(os.path.join(cache_root, name), ignore_errors=True)
+            count("shared.cache_pruned")
+
+
+def _write_column_cache(df: pd.DataFrame, directory: str):
+    """
+    One .npy per column: numeric columns as plain arrays (memory-mappable),
+    text columns as pickled object arrays. A regularly sampled time column is
+    stored as start + step (plus the slot of each row when there are gaps)
+    instead of one string per row. Written to a temp dir and renamed so
+    concurrent processes never see a half-written cache.
+    """
+    tmp = f"{directory}.tmp{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    layout = []
+    series = RegularSeries.from_frame(df)
+    for i, col in enumerate(df.columns):
+        if series is not None and col == series.time_col:
+            slots = None
+            if series.gaps is not None:
+                slots = f"{i}.npy"
+                np.save(os.path.join(tmp, slots), series.present_slots().astype(np.int32))
+            layout.append({"column": col, "file": slots, "mapped": True, "regular": {
+                "start": int(series.start.astype(np.int64)), "step": int(series.step.astype(np.int64)),
+                "rows": len(series), "format": series.time_format}})
+            continue
+        values = df[col].to_numpy()
+        mapped = values.dtype != object and values.dtype.kind in "biuf"
+        if not mapped:
+            values = np.asarray(df[col], dtype=object)
+        np.save(os.path.join(tmp, f"{i}.npy"), values, allow_pickle=not mapped)
+        layout.append({"column": col, "file": f"{i}.npy", "mapped": mapped})
+    with open(os.path.join(tmp, "layout.json"), "w") as f:
+        json.dump(layout, f)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # another process finished first; use its copy
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+def _read_column_cache(directory: str) -> pd.DataFrame:
+    with open(os.path.join(directory, "layout.json")) as f:
+        layout = json.load(f)
+    columns = {}
+    time_format = None
+    for entry in layout:
+        regular = entry.get("regular")
+        if regular is not None:
+            slots = (np.load(os.path.join(directory, entry["file"]), mmap_mode="r") if entry["file"]
+                     else np.arange(regular["rows"]))
+            columns[entry["column"]] = (np.datetime64(regular["start"], "ns")
+                                        + slots.astype(np.int64) * np.timedelta64(regular["step"], "ns"))
+            time_format = regular["format"]
+            continue
+        path = os.path.join(directory, entry["file"])
+        if entry["mapped"]:
+            columns[entry["column"]] = np.load(path, mmap_mode="r")
+        else:
+            columns[entry["column"]] = np.load(path, allow_pickle=True)
+    df = pd.DataFrame(columns, copy=False)
+    if time_format is not None:
+        df.attrs["time_format"] = time_format
+    return df
+
+
+def load_shared_frame(path: str, cache_root: str = None) -> pd.DataFrame:
+    """
+    A zone CSV as a DataFrame whose numeric columns are read-only memory maps
+    of a column cache next to the data. The OS page cache shares those pages
+    between every process that maps them; the CSV is parsed only when the
+    cache is missing or older than the file. Regularly sampled files get a
+    datetime64 time column rebuilt from start + step (see regular_series);
+    RegularSeries.to_frame restores the original timestamp strings.
+    `cache_root` defaults to shared_cache_root() of the file's directory.
+    """
+    cache_root = cache_root or shared_cache_root(os.path.dirname(path))
+    directory = _cache_dir(cache_root, path)
+    if not os.path.exists(os.path.join(directory, "layout.json")):
+        with span("shared.parse_csv"):
+            df = pd.read_csv(path)
+        df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+        try:
+            os.makedirs(cache_root, exist_ok=True)
+            _write_column_cache(df, directory)
+            _prune_column_caches(cache_root, path, directory)
+        except OSError:
+            return df
+        count("shared.cache_writes")
+    with span("shared.map_columns"):
+        try:
+            return _read_column_cache(directory)
+        except FileNotFoundError:
+            # pruned by another process after the file changed again
+            return load_shared_frame(path, cache_root)
+
+
+# -------------------------
+# PARTITION INDEX
+# -------------------------
+def _scan_partition(path: str) -> dict:
+    """
+    Row count, columns and timestamp range of one file, reading only its time column.
+    """
+    header = pd.read_csv(path, nrows=0)
+    columns = [col.strip().lower().replace(" ", "_") for col in header.columns]
+    raw_time = find_time_column(header)
+    min_ts = max_ts = None
+    if raw_time is not None:
+        times = pd.read_csv(path, usecols=[raw_time])
+        stamps = parse_timestamps(times, raw_time).dropna()
+        rows = len(times)
+        if len(stamps):
+            min_ts, max_ts = stamps.min().isoformat(), stamps.max().isoformat()
+    else:
+        with open(path) as f:
+            rows = sum(1 for _ in f) - 1
+    return {"rows": rows, "columns": columns, "min_ts": min_ts, "max_ts": max_ts}
+
+
+class PartitionedStore:
+    """
+    Zone files grouped into datasets (zone + sensor, e.g. "Desert_CO2") and
+    partitioned by month. The partition index records each file's row count,
+    columns and timestamp range; it is persisted as JSON and only files whose
+    size or mtime changed are rescanned. Range queries read only the partitions
+    whose timestamp range overlaps the query.
+    """
+
+    def __init__(self, data_dir: str = DATA_DIR, index_path: str = PARTITION_INDEX_PATH):
+        self.data_dir = data_dir
+        self.index_path = index_path
+        self.partitions = {}  # file -> partition entry
+        self._lock = threading.Lock()
+        self._load_index()
+        self.refresh()
+
+    def _load_index(self):
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                with open(self.index_path) as f:
+                    saved = json.load(f)
+                if saved.get("data_dir") == os.path.abspath(self.data_dir):
+                    self.partitions = saved.get("partitions", {})
+            except (OSError, ValueError):
+                self.partitions = {}
+
+    def _save_index(self):
+        if not self.index_path:
+            return
+        try:
+            with open(self.index_path, "w") as f:
+                json.dump({"data_dir": os.path.abspath(self.data_dir), "partitions": self.partitions}, f, indent=1)
+        except OSError:
+            pass
+
+    def refresh(self) -> int:
+        """
+        Scan new or changed files and drop deleted ones. Returns how many files were scanned.
+        """
+        with self._lock:
+            files = sorted(f for f in os.listdir(self.data_dir) if f.endswith(".csv"))
+            scanned = 0
+            for file_name in files:
+                path = os.path.join(self.data_dir, file_name)
+                stat = os.stat(path)
+                known = self.partitions.get(file_name)
+                if known and known["mtime_ns"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+                    continue
+                with span("partitions.scan"):
+                    entry = _scan_partition(path)
+                entry.update(
+                    file=file_name,
+                    dataset=dataset_stem(file_name),
+                    zone=get_catalog().zone_of(file_name),
+                    month=partition_month(file_name),
+                    mtime_ns=stat.st_mtime_ns,
+                    size=stat.st_size,
+                )
+                self.partitions[file_name] = entry
+                scanned += 1
+            removed = set(self.partitions) - set(files)
+            for file_name in removed:
+                del self.partitions[file_name]
+            if scanned or removed:
+                self._save_index()
+            return scanned
+
+    def datasets(self, zone: str = None) -> list:
+        return sorted({p["dataset"] for p in self.partitions.values() if zone is None or p["zone"] == zone})
+
+    def partitions_for(self, dataset: str, start=None, end=None) -> list:
+        """
+        Partitions of a dataset overlapping [start, end], oldest first. Partitions
+        without timestamps cannot be pruned and are always included.
+        """
+        start = pd.Timestamp(start).isoformat() if start is not None else None
+        end = pd.Timestamp(end).isoformat() if end is not None else None
+        selected = []
+        for p in self.partitions.values():
+            if p["dataset"] != dataset:
+                continue
+            if p["min_ts"] is not None:
+                if end is not None and p["min_ts"] > end:
+                    continue
+                if start is not None and p["max_ts"] < start:
+                    continue
+            selected.append(p)
+        return sorted(selected, key=lambda p: (p["month"] or "", p["min_ts"] or "", p["file"]))
+
+    def query(self, dataset: str, start=None, end=None, columns=None) -> pd.DataFrame:
+        """
+        Rows of a dataset in [start, end] (inclusive), reading only overlapping
+        partitions. `columns` projects the result (the time column is always kept).
+        """
+        parts = self.partitions_for(dataset, start, end)
+        count("partitions.read", len(parts))
+        lo = pd.Timestamp(start) if start is not None else None
+        hi = pd.Timestamp(end) if end is not None else None
+        frames = []
+        for p in parts:
+            df = load_shared_frame(os.path.join(self.data_dir, p["file"]))
+            inside = (p["min_ts"] is not None
+                      and (lo is None or pd.Timestamp(p["min_ts"]) >= lo)
+                      and (hi is None or pd.Timestamp(p["max_ts"]) <= hi))
+            if (lo is not None or hi is not None) and not inside:
+                stamps = parse_timestamps(df)
+                if stamps is not None:
+                    mask = pd.Series(True, index=df.index)
+                    if lo is not None:
+                        mask &= stamps >= lo
+                    if hi is not None:
+                        mask &= stamps <= hi
+                    df = df[mask.to_numpy()]
+            if columns is not None:
+                time_col = find_time_column(df)
+                keep = ([time_col] if time_col and time_col not in columns else []) + [c for c in columns if c in df.columns]
+                df = df[keep]
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+        return pd.concat(frames, ignore_index=True)
+
+    def load_datasets(self, start=None, end=None) -> dict:
+        """
+        {dataset: frame} with every month of each dataset concatenated in time order.
+        """
+        return {name: self.query(name, start, end) for name in self.datasets()}
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(data_dir: str = DATA_DIR) -> PartitionedStore:
+    """
+    Process-wide store per data directory; rescans changed files on each call.
+    """
+    with _stores_lock:
+        store = _stores.get(data_dir)
+        if store is None:
+            store = _stores[data_dir] = PartitionedStore(data_dir, PARTITION_INDEX_PATH if data_dir == DATA_DIR else None)
+        else:
+            store.refresh()
+        return store
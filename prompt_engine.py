@@ -1,20 +1,29 @@
 # prompt_engine.py
 
-def build_prompt(zone, df):
+def format_findings(findings):
+    if not findings:
+        return ""
+    lines = "\n".join(f"- {f}" for f in findings)
+    return f"""
+Relevant past findings:
+{lines}
+"""
+
+def build_prompt(zone, df, findings=None):
     return f"""
 You are a scientific ecosystem expert for Biosphere 2. Analyze the sensor data from zone: {zone} and give insights.
 
 Data Snapshot:
 {df.head(10).to_string(index=False)}
-"""
+{format_findings(findings)}"""
 
-def build_small_talk_prompt(zone, summary):
+def build_small_talk_prompt(zone, summary, findings=None):
     return f"""
 You are a friendly Assistant AI in Biosphere 2 working with your scientist AI partner.
 
 They have analyzed zone: {zone}. Here's their summary:
 \"\"\"{summary}\"\"\"
-
+{format_findings(findings)}
 Respond with:
 1. Encouragement or fun comment,
 2. A quirky ecological insight or analogy,
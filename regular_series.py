@@ -0,0 +1,205 @@
+# regular_series.py
+
+import numpy as np
+import pandas as pd
+
+from dataset_loader import find_time_column, parse_timestamps
+
+# Layouts of the timestamp strings in the zone files, tried in order
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S")
+MAX_GAP_SHARE = 0.5  # series with more missing slots than present rows are not treated as regular
+
+
+def regular_cadence(ns: np.ndarray):
+    """
+    (start, step, slots) when int64 ns timestamps are strictly increasing and
+    all fall on start + k * step, else None. `slots` is each row's k.
+    """
+    if len(ns) < 2:
+        return None
+    diffs = np.diff(ns)
+    if diffs.min() <= 0:
+        return None
+    step = int(np.gcd.reduce(diffs))
+    slots = (ns - ns[0]) // step
+    if slots[-1] + 1 > len(ns) * (1 + MAX_GAP_SHARE):
+        return None
+    return int(ns[0]), step, slots
+
+
+def detect_time_format(strings: pd.Series, stamps: pd.Series):
+    """
+    The strftime layout that reproduces every original timestamp string, or None.
+    """
+    sample = str(strings.iloc[0]).strip()
+    index = pd.DatetimeIndex(stamps)
+    for fmt in TIME_FORMATS:
+        if pd.Timestamp(stamps.iloc[0]).strftime(fmt) == sample:
+            if np.array_equal(index.strftime(fmt).to_numpy(dtype=object), strings.to_numpy(dtype=object)):
+                return fmt
+    return None
+
+
+def regular_asof(start: int, step: int, slots: np.ndarray, target_ns: np.ndarray, tolerance_ns: int = None) -> np.ndarray:
+    """
+    As-of join against a regular series by index arithmetic: the row of the
+    latest reading at or before each target timestamp, -1 when there is none
+    (or it is older than tolerance_ns). `slots` are the rows' slot numbers,
+    as returned by regular_cadence. Replaces a binary search per target.
+    """
+    row_at_slot = np.full(int(slots[-1]) + 1, -1, dtype=np.int64)
+    row_at_slot[slots] = np.arange(len(slots))
+    np.maximum.accumulate(row_at_slot, out=row_at_slot)
+    target = (np.asarray(target_ns, dtype=np.int64) - start) // step
+    rows = np.where(target >= 0, row_at_slot[np.clip(target, 0, len(row_at_slot) - 1)], -1)
+    if tolerance_ns is not None:
+        age = target_ns - (start + slots[np.maximum(rows, 0)] * step)
+        rows = np.where(age > tolerance_ns, -1, rows)
+    return rows
+
+
+class RegularSeries:
+    """
+    Regularly sampled zone data as start + step + one contiguous (slot x column)
+    float64 array. Slots with no row in the source are marked in an explicit gap
+    mask (their values are NaN), so a reading that is NaN and a row that never
+    arrived stay distinguishable. Timestamps are never stored: a time maps to
+    its slot by index arithmetic, which turns range slicing and as-of joins
+    into integer math.
+    """
+
+    def __init__(self, start, step, values, columns, gaps=None, dtypes=None, time_col="datetime", time_format=None):
+        self.start = np.datetime64(int(start), "ns") if not isinstance(start, np.datetime64) else start.astype("datetime64[ns]")
+        self.step = np.timedelta64(int(step), "ns") if not isinstance(step, np.timedelta64) else step.astype("timedelta64[ns]")
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.columns = list(columns)
+        self.gaps = gaps if gaps is not None and gaps.any() else None
+        self.dtypes = dtypes or {c: "float64" for c in self.columns}
+        self.time_col = time_col
+        self.time_format = time_format
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        """
+        Regular representation of a zone frame, or None when the frame has no
+        parsable time column, irregular or duplicated timestamps, or
+        non-numeric sensor columns (then the DataFrame stays the representation).
+        """
+        time_col = find_time_column(df)
+        if time_col is None or len(df) < 2:
+            return None
+        columns = [c for c in df.columns if c != time_col]
+        if any(not pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_bool_dtype(df[c]) for c in columns):
+            return None
+        stamps = parse_timestamps(df, time_col)
+        if stamps.isna().any():
+            return None
+        ns = stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        cadence = regular_cadence(ns)
+        if cadence is None:
+            return None
+        time_format = None
+        if not pd.api.types.is_datetime64_any_dtype(df[time_col]):
+            time_format = detect_time_format(df[time_col], stamps)
+            if time_format is None:
+                return None
+        start, step, slots = cadence
+        n_slots = int(slots[-1]) + 1
+        values = np.full((n_slots, len(columns)), np.nan)
+        values[slots] = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        gaps = None
+        if n_slots != len(df):
+            gaps = np.ones(n_slots, dtype=bool)
+            gaps[slots] = False
+        dtypes = {c: str(df[c].dtype) for c in columns}
+        return cls(start, step, values, columns, gaps, dtypes, time_col, time_format)
+
+    @property
+    def n_slots(self) -> int:
+        return len(self.values)
+
+    def __len__(self):
+        return self.n_slots - (int(self.gaps.sum()) if self.gaps is not None else 0)
+
+    @property
+    def end(self) -> np.datetime64:
+        return self.start + (self.n_slots - 1) * self.step
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + (self.gaps.nbytes if self.gaps is not None else 0)
+
+    def present_slots(self) -> np.ndarray:
+        return np.flatnonzero(~self.gaps) if self.gaps is not None else np.arange(self.n_slots)
+
+    def timestamps(self) -> np.ndarray:
+        """
+        datetime64[ns] of every present row.
+        """
+        return self.start + self.present_slots() * self.step
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Values of one column for the present rows, in row order.
+        """
+        values = self.values[:, self.columns.index(name)]
+        return values if self.gaps is None else values[~self.gaps]
+
+    def slot_of(self, times) -> np.ndarray:
+        """
+        Slot of each timestamp (floor), by arithmetic; may be outside [0, n_slots).
+        """
+        times = np.asarray(times, dtype="datetime64[ns]")
+        return (times - self.start) // self.step
+
+    def slice(self, start=None, end=None):
+        """
+        Rows in [start, end] (inclusive) without scanning any timestamps.
+        """
+        first = 0 if start is None else int(np.clip(-((self.start - np.datetime64(pd.Timestamp(start), "ns")) // self.step), 0, self.n_slots))
+        last = self.n_slots if end is None else int(np.clip(self.slot_of(np.datetime64(pd.Timestamp(end), "ns")) + 1, first, self.n_slots))
+        gaps = self.gaps[first:last] if self.gaps is not None else None
+        return RegularSeries(self.start + first * self.step, self.step, self.values[first:last], self.columns,
+                             gaps, self.dtypes, self.time_col, self.time_format)
+
+    def asof_rows(self, times, tolerance=None) -> np.ndarray:
+        """
+        Row index (into the present rows) of the latest reading at or before each
+        timestamp, -1 when there is none within `tolerance`.
+        """
+        tolerance_ns = int(pd.Timedelta(tolerance).value) if tolerance is not None else None
+        return regular_asof(int(self.start.astype(np.int64)), int(self.step.astype(np.int64)), self.present_slots(),
+                            np.asarray(times, dtype="datetime64[ns]").astype(np.int64), tolerance_ns)
+
+    def to_frame(self, time_as: str = "original") -> pd.DataFrame:
+        """
+        The DataFrame this series came from: gap slots dropped, column dtypes
+        restored and, with time_as="original", the timestamp strings rebuilt in
+        their source layout. time_as="datetime" keeps a datetime64 column instead.
+        """
+        keep = self.present_slots()
+        stamps = pd.DatetimeIndex(self.start + keep * self.step)
+        if time_as == "original" and self.time_format is not None:
+            time_values = stamps.strftime(self.time_format).to_numpy(dtype=object)
+        else:
+            time_values = stamps.to_numpy()
+        data = {self.time_col: time_values}
+        values = self.values[keep] if self.gaps is not None else self.values
+        for j, c in enumerate(self.columns):
+            data[c] = values[:, j].astype(self.dtypes.get(c, "float64"))
+        return pd.DataFrame(data)
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The frame with its timestamp strings replaced by a datetime64 column when
+    the cadence is regular and the strings can be rebuilt exactly (see
+    RegularSeries.to_frame); other frames are returned unchanged.
+    """
+    series = RegularSeries.from_frame(df)
+    if series is None or series.time_format is None:
+        return df
+    out = df.copy(deep=False)
+    out[series.time_col] = series.start + series.present_slots() * series.step
+    out.attrs["time_format"] = series.time_format
+    return out
@@ -0,0 +1,66 @@
+# rerun_cache.py
+
+import time
+from collections import OrderedDict
+from instrumentation import count
+
+RERUN_CACHE_SIZE = 64  # entries kept per session, least recently used evicted first
+
+
+class RerunCache:
+    """
+    Memoized computations for a Streamlit session, keyed explicitly by
+    (name, zone, data version) instead of hashing DataFrames on every rerun.
+    Tracks how much work each rerun reused so the app can report it.
+    Holds at most `max_entries` results (every distinct scenario selection,
+    for example, is its own entry), dropping the least recently used.
+    """
+
+    def __init__(self, max_entries: int = RERUN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.store = OrderedDict()  # key -> (value, seconds it took to compute)
+        self.start_rerun()
+
+    def start_rerun(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+        self.spent_s = 0.0
+
+    def get(self, name: str, key: tuple, compute):
+        """
+        Return the cached value for (name, *key), computing it on a miss.
+        """
+        full_key = (name,) + tuple(key)
+        cached = self.store.get(full_key)
+        if cached is not None:
+            self.store.move_to_end(full_key)
+            self.hits += 1
+            self.saved_s += cached[1]
+            count("rerun_cache.hits")
+            return cached[0]
+        start = time.perf_counter()
+        value = compute()
+        elapsed = time.perf_counter() - start
+        self.store[full_key] = (value, elapsed)
+        while len(self.store) > self.max_entries:
+            self.store.popitem(last=False)
+        self.misses += 1
+        self.spent_s += elapsed
+        count("rerun_cache.misses")
+        return value
+
+    def invalidate(self, zone=None):
+        """
+        Drop every entry for one zone (keys whose first element is the zone), or everything.
+        """
+        if zone is None:
+            self.store.clear()
+            return
+        self.store = OrderedDict((k, v) for k, v in self.store.items() if len(k) < 2 or k[1] != zone)
+
+    def report(self) -> str:
+        return (
+            f"♻️ Rerun reused {self.hits} cached results (~{self.saved_s * 1000:.1f} ms skipped), "
+            f"recomputed {self.misses} ({self.spent_s * 1000:.1f} ms)."
+        )
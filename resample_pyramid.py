@@ -0,0 +1,191 @@
+# resample_pyramid.py
+
+import copy
+
+import numpy as np
+import pandas as pd
+
+from constants import PYRAMID_LEVELS
+from dataset_loader import parse_timestamps
+
+_STATS = ["sum", "count", "min", "max"]
+
+
+def _aggregate_rows(df: pd.DataFrame, freq: str) -> pd.DataFrame:
+    """
+    Bucket raw rows by `freq` and keep sum, count, min and max per numeric column.
+    Returns a frame indexed by bucket start with (column, stat) columns.
+    """
+    stamps = parse_timestamps(df)
+    numeric = df.select_dtypes(include=["number"])
+    keep = stamps.notna().to_numpy()
+    numeric = numeric[keep]
+    buckets = stamps[keep].dt.floor(freq).to_numpy()
+    out = numeric.groupby(buckets).agg(_STATS)
+    out.index.name = "bucket"
+    return out
+
+
+def _rollup(frame: pd.DataFrame, keys) -> pd.DataFrame:
+    """
+    Combine rows of an aggregated level that share a key: sums and counts add,
+    min and max take the extremes.
+    """
+    grouped = frame.groupby(keys)
+    out = grouped.sum()
+    stats = out.columns.get_level_values(1)
+    out.loc[:, stats == "min"] = grouped.min().loc[:, stats == "min"]
+    out.loc[:, stats == "max"] = grouped.max().loc[:, stats == "max"]
+    out.index.name = "bucket"
+    return out
+
+
+class ZonePyramid:
+    """
+    Pre-aggregated views of one zone at several resolutions (e.g. hourly,
+    6-hourly, daily). Each level stores sum, count, min and max per sensor so
+    that levels can be extended incrementally and re-rolled into coarser ones.
+    """
+
+    def __init__(self, levels=PYRAMID_LEVELS):
+        self.freqs = sorted(levels, key=pd.Timedelta)
+        self.levels = {freq: None for freq in self.freqs}
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, levels=PYRAMID_LEVELS):
+        pyramid = cls(levels)
+        pyramid.extend(df)
+        return pyramid
+
+    def extend(self, new_rows: pd.DataFrame):
+        """
+        Fold new rows into every level. Only the buckets the new rows touch are
+        recomputed; the finest level feeds the coarser ones.
+        """
+        if new_rows is None or len(new_rows) == 0 or parse_timestamps(new_rows) is None:
+            return self
+        finest = self.freqs[0]
+        fresh = _aggregate_rows(new_rows, finest)
+        if fresh.empty:
+            return self
+        self.levels[finest] = self._merge(self.levels[finest], fresh)
+
+        source = self.levels[finest]
+        for freq in self.freqs[1:]:
+            start = fresh.index.min().floor(freq)
+            touched = source[source.index >= start]
+            rolled = _rollup(touched, touched.index.floor(freq))
+            current = self.levels[freq]
+            if current is not None:
+                current = current[current.index < start]
+                rolled = pd.concat([current, rolled])
+            self.levels[freq] = rolled
+        return self
+
+    def extended(self, new_rows: pd.DataFrame):
+        """
+        A copy with new rows folded in, leaving this pyramid unchanged for
+        readers that still hold it (levels are replaced, never modified).
+        """
+        pyramid = copy.copy(self)
+        pyramid.levels = dict(self.levels)
+        return pyramid.extend(new_rows)
+
+    @staticmethod
+    def _merge(existing, fresh):
+        if existing is None:
+            return fresh
+        start = fresh.index.min()
+        overlap = existing[existing.index >= start]
+        if len(overlap):
+            combined = pd.concat([overlap, fresh])
+            merged = _rollup(combined, combined.index)
+        else:
+            merged = fresh
+        return pd.concat([existing[existing.index < start], merged]).sort_index()
+
+    def level(self, freq: str, start=None, end=None) -> pd.DataFrame:
+        """
+        A level as (column, stat) frame with mean, min, max and count.
+        """
+        raw = self.levels.get(freq)
+        if raw is None:
+            return None
+        if start is not None:
+            raw = raw[raw.index >= pd.Timestamp(start)]
+        if end is not None:
+            raw = raw[raw.index <= pd.Timestamp(end)]
+        sums = raw.xs("sum", axis=1, level=1)
+        counts = raw.xs("count", axis=1, level=1)
+        means = sums / counts.where(counts > 0)
+        return pd.concat({
+            "mean": means,
+            "min": raw.xs("min", axis=1, level=1),
+            "max": raw.xs("max", axis=1, level=1),
+            "count": counts,
+        }, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1, level=0, sort_remaining=False)
+
+    def query(self, start=None, end=None, resolution=None, max_points=None):
+        """
+        Pick the coarsest level that still answers the request and return
+        (freq, frame). `resolution` is the coarsest acceptable bucket width;
+        `max_points` picks the finest level with at most that many rows in range.
+        Returns (None, None) when only the raw rows are fine enough.
+        """
+        candidates = self.freqs
+        if resolution is not None:
+            limit = pd.Timedelta(resolution)
+            candidates = [f for f in self.freqs if pd.Timedelta(f) <= limit]
+            if not candidates:
+                return None, None
+            freq = candidates[-1]
+        else:
+            freq = self.freqs[-1]
+        if max_points is not None:
+            for f in candidates:
+                if self._rows_in_range(f, start, end) <= max_points:
+                    freq = f
+                    break
+        return freq, self.level(freq, start, end)
+
+    def _rows_in_range(self, freq, start, end):
+        index = self.levels[freq].index if self.levels.get(freq) is not None else pd.DatetimeIndex([])
+        lo = 0 if start is None else index.searchsorted(pd.Timestamp(start))
+        hi = len(index) if end is None else index.searchsorted(pd.Timestamp(end), side="right")
+        return hi - lo
+
+    def column_means(self) -> pd.Series:
+        """
+        Whole-history mean per sensor, read from the coarsest level.
+        """
+        raw = self.levels.get(self.freqs[-1])
+        if raw is None:
+            return pd.Series(dtype=np.float64)
+        sums = raw.xs("sum", axis=1, level=1).sum()
+        counts = raw.xs("count", axis=1, level=1).sum()
+        return sums / counts.where(counts > 0)
+
+
+def _appended(old: pd.DataFrame, new: pd.DataFrame) -> bool:
+    """
+    Whether `new` is `old` with rows added at the end.
+    """
+    return (list(old.columns) == list(new.columns) and len(old) <= len(new)
+            and new.iloc[:len(old)].reset_index(drop=True).equals(old.reset_index(drop=True)))
+
+
+def build_zone_pyramids(zones: dict, previous_zones: dict = None, previous: dict = None) -> dict:
+    """
+    Build a pyramid for every zone that has a parseable timestamp column.
+    With the zones and pyramids of an earlier load, unchanged zones keep their
+    pyramid and zones that only gained rows have just those rows folded in.
+    """
+    previous_zones, previous = previous_zones or {}, previous or {}
+    pyramids = {}
+    for name, df in zones.items():
+        old_df, old_pyramid = previous_zones.get(name), previous.get(name)
+        if old_pyramid is not None and old_df is not None and _appended(old_df, df):
+            pyramids[name] = old_pyramid if len(old_df) == len(df) else old_pyramid.extended(df.iloc[len(old_df):])
+        elif parse_timestamps(df) is not None:
+            pyramids[name] = ZonePyramid.build(df)
+    return pyramids
@@ -0,0 +1,251 @@
+# rule_engine.py
+
+import json
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from constants import ALERT_RULES_PATH, ALERT_EVENT_HISTORY
+from dataset_loader import find_time_column, parse_timestamps
+from sensor_catalog import get_catalog
+from instrumentation import span, count
+
+# Declarative zone alert rules, checked in list order (the first active rule sets
+# the zone status). Thresholds are in `unit` and converted to each sensor's
+# catalog unit when the rules are compiled. An alert raises once the value has
+# been past `threshold` for `duration`, and clears only when it crosses back
+# past `clear` (hysteresis). Sensors whose unit is in `skip_units` are ignored
+# (pyrgeometer body temperatures in Kelvin are not air temperatures).
+DEFAULT_RULES = [
+    {"name": "hot", "quantity": "temperature", "op": ">", "threshold": 35.0, "clear": 33.0, "unit": "C",
+     "duration": "30min", "skip_units": ["K"], "status": "🔥 Hot", "color": "red"},
+    {"name": "high_co2", "quantity": "co2", "op": ">", "threshold": 700.0, "clear": 650.0, "unit": "ppm",
+     "duration": "30min", "status": "☣ High CO2", "color": "orange"},
+    {"name": "low_rh", "quantity": "relative_humidity", "op": "<", "threshold": 30.0, "clear": 33.0, "unit": "%",
+     "duration": "30min", "status": "💨 Low RH", "color": "blue"},
+]
+MISSING_SENTINEL = -9999.0  # logger fill value for missing readings (e.g. the LI-COR CO2 file)
+HEALTHY = ("✅ Healthy", "green", True)
+NO_DATA = ("❓ No Data", "gray", False)
+
+_TO_CELSIUS = {"C": lambda v: v, "F": lambda v: (v - 32.0) * 5.0 / 9.0, "K": lambda v: v - 273.15}
+_FROM_CELSIUS = {"C": lambda v: v, "F": lambda v: v * 9.0 / 5.0 + 32.0, "K": lambda v: v + 273.15}
+
+
+def _base_unit(unit):
+    return str(unit).split()[0] if unit else None
+
+
+def convert(value: float, from_unit, to_unit) -> float:
+    """
+    Convert a threshold between catalog units. Only temperatures need it
+    ("ppm" and "ppm (umol/mol)" are the same unit); unknown units pass through.
+    """
+    from_unit, to_unit = _base_unit(from_unit), _base_unit(to_unit)
+    if from_unit == to_unit or from_unit not in _TO_CELSIUS or to_unit not in _FROM_CELSIUS:
+        return value
+    return _FROM_CELSIUS[to_unit](_TO_CELSIUS[from_unit](value))
+
+
+def load_rules(path: str = ALERT_RULES_PATH) -> list:
+    """
+    Rules from a JSON list in the DEFAULT_RULES format, or DEFAULT_RULES when no file is configured.
+    """
+    if not path:
+        return DEFAULT_RULES
+    with open(path) as f:
+        return json.load(f)
+
+
+class CompiledRules:
+    """
+    The rules bound to one file's columns: one (rule, sensor) pair per column
+    the rule applies to, with its thresholds already in the sensor's unit and
+    every comparison turned into `sign * value > sign * threshold`, so a block
+    of rows is evaluated for all pairs at once with a few array operations.
+    """
+
+    def __init__(self, rules: list, file_name: str, columns):
+        catalog = get_catalog()
+        self.rules = rules
+        self.columns = []
+        rule_ids, raise_at, clear_at, signs, durations = [], [], [], [], []
+        for rule_id, rule in enumerate(rules):
+            sign = 1.0 if rule["op"] == ">" else -1.0
+            for column in catalog.columns_for(file_name, rule["quantity"], list(columns)):
+                unit = catalog.entry(file_name, column)["unit"]
+                if _base_unit(unit) in rule.get("skip_units", ()):
+                    continue
+                self.columns.append(column)
+                rule_ids.append(rule_id)
+                signs.append(sign)
+                raise_at.append(sign * convert(rule["threshold"], rule.get("unit"), unit))
+                clear_at.append(sign * convert(rule.get("clear", rule["threshold"]), rule.get("unit"), unit))
+                durations.append(pd.Timedelta(rule.get("duration", 0)).total_seconds())
+        self.rule_ids = np.array(rule_ids, dtype=np.intp)
+        self.signs = np.array(signs)
+        self.raise_at = np.array(raise_at)
+        self.clear_at = np.minimum(np.array(clear_at), self.raise_at)
+        self.durations = np.array(durations)
+
+    def new_state(self) -> dict:
+        m = len(self.columns)
+        return {
+            "breach": np.zeros(m, dtype=bool),   # past the threshold, not yet back past the clear level
+            "since": np.full(m, np.nan),         # when the current breach started (epoch seconds)
+            "active": np.zeros(m, dtype=bool),   # breach has lasted at least the rule's duration
+            "rows": 0,
+        }
+
+    def evaluate(self, df: pd.DataFrame, state: dict) -> list:
+        """
+        Evaluate a block of new rows, continuing from `state` (updated in place).
+        Returns the raise/clear events in the block, oldest first. Frames without
+        a time column count every row as the same instant, so duration is ignored.
+        """
+        n, m = len(df), len(self.columns)
+        state["rows"] += n
+        if n == 0 or m == 0:
+            return []
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        values = np.where(values == MISSING_SENTINEL, np.nan, values)
+        stamps = parse_timestamps(df)
+        if stamps is not None:
+            ts = stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+            ts[stamps.isna().to_numpy()] = np.nan
+        else:
+            ts = np.zeros(n)
+        rows = np.arange(n)[:, None]
+        scaled = values * self.signs
+
+        # Hysteresis: rows past the threshold set the breach, rows back past the
+        # clear level reset it, anything in between (or NaN) keeps the last state.
+        raises = scaled > self.raise_at
+        clears = scaled < self.clear_at
+        last = np.maximum.accumulate(np.where(raises | clears, rows, -1), axis=0)
+        breach = np.where(last >= 0, np.take_along_axis(raises, np.maximum(last, 0), axis=0), state["breach"])
+
+        # Duration: time since the breach began, carrying a breach over from the previous block
+        previous = np.vstack([state["breach"][None, :], breach[:-1]])
+        onset = breach & ~previous
+        started = np.maximum.accumulate(np.where(onset, rows, -1), axis=0)
+        since = np.where(started >= 0, ts[np.maximum(started, 0)], state["since"])
+        with np.errstate(invalid="ignore"):
+            active = breach & (ts[:, None] - since >= self.durations)
+
+        was_active = np.vstack([state["active"][None, :], active[:-1]])
+        events = []
+        for kind, mask in (("raise", active & ~was_active), ("clear", was_active & ~active)):
+            for row, pair in zip(*np.nonzero(mask)):
+                rule = self.rules[self.rule_ids[pair]]
+                events.append({
+                    "row": int(state["rows"] - n + row),
+                    "ts": float(ts[row]),
+                    "time": pd.Timestamp(ts[row], unit="s").isoformat() if stamps is not None and ts[row] == ts[row] else None,
+                    "rule": rule["name"],
+                    "column": self.columns[pair],
+                    "event": kind,
+                    "value": float(values[row, pair]),
+                })
+        events.sort(key=lambda e: (e["row"], e["event"] == "raise"))
+
+        state["breach"] = breach[-1]
+        state["since"] = np.where(breach[-1], since[-1], np.nan)
+        state["active"] = active[-1]
+        return events
+
+    def status(self, state: dict) -> tuple:
+        """
+        (status, color, healthy) of the first rule with an active alert.
+        """
+        if not state["rows"]:
+            return NO_DATA
+        for rule_id, rule in enumerate(self.rules):
+            if np.any(state["active"][self.rule_ids == rule_id]):
+                return rule["status"], rule["color"], False
+        return HEALTHY
+
+    def active_alerts(self, state: dict) -> list:
+        return [{"rule": self.rules[self.rule_ids[i]]["name"], "column": self.columns[i]}
+                for i in np.flatnonzero(state["active"])]
+
+
+def _first_stamp(df):
+    col = find_time_column(df)
+    return None if col is None or df.empty else str(df[col].iloc[0])
+
+
+class AlertMonitor:
+    """
+    Alert state per zone. observe() evaluates only the rows appended since the
+    zone was last observed, so it can run on every ingest or rerun; a frame
+    that shrank, changed columns or starts at a different timestamp is treated
+    as new data and evaluated from the start.
+    """
+
+    def __init__(self, rules: list = None, history: int = ALERT_EVENT_HISTORY):
+        self.rules = rules if rules is not None else load_rules()
+        self.history = history
+        self.zones = {}  # zone -> {"compiled", "state", "columns", "first", "events"}
+        self._lock = threading.Lock()
+
+    def reset(self, zone):
+        with self._lock:
+            self.zones.pop(zone, None)
+
+    def observe(self, zone, df: pd.DataFrame) -> list:
+        """
+        Evaluate the new rows of a zone frame; returns the new events.
+        """
+        with self._lock:
+            tracked = self.zones.get(zone)
+            columns = tuple(df.columns)
+            if (tracked is None or tracked["columns"] != columns or len(df) < tracked["state"]["rows"]
+                    or tracked["first"] != _first_stamp(df)):
+                compiled = CompiledRules(self.rules, zone, columns)
+                tracked = self.zones[zone] = {"compiled": compiled, "state": compiled.new_state(),
+                                              "columns": columns, "first": _first_stamp(df),
+                                              "events": deque(maxlen=self.history)}
+            seen = tracked["state"]["rows"]
+            if seen == len(df):
+                return []
+            with span("alerts.evaluate"):
+                events = tracked["compiled"].evaluate(df.iloc[seen:], tracked["state"])
+            count("alerts.rows", len(df) - seen)
+            for e in events:
+                e["zone"] = zone
+            tracked["events"].extend(events)
+            return events
+
+    def status(self, zone) -> tuple:
+        with self._lock:
+            tracked = self.zones.get(zone)
+            return tracked["compiled"].status(tracked["state"]) if tracked else NO_DATA
+
+    def active_alerts(self, zone) -> list:
+        with self._lock:
+            tracked = self.zones.get(zone)
+            return tracked["compiled"].active_alerts(tracked["state"]) if tracked else []
+
+    def recent_events(self, zone=None, limit: int = 20) -> list:
+        """
+        Latest events, newest first, for one zone or all zones.
+        """
+        with self._lock:
+            tracked = [self.zones[zone]] if zone in self.zones else [] if zone is not None else list(self.zones.values())
+            events = [e for t in tracked for e in t["events"]]
+        return sorted(events, key=lambda e: (e["ts"], e["row"]), reverse=True)[:limit]
+
+
+def evaluate_frame(df: pd.DataFrame, file_name: str = None, rules: list = None) -> dict:
+    """
+    One-shot evaluation of a whole frame: final status, active alerts and all events.
+    """
+    compiled = CompiledRules(rules if rules is not None else load_rules(), file_name, df.columns)
+    state = compiled.new_state()
+    events = compiled.evaluate(df, state)
+    status, color, healthy = compiled.status(state)
+    return {"status": status, "color": color, "healthy": healthy,
+            "active": compiled.active_alerts(state), "events": events}
@@ -0,0 +1,352 @@
+# scenario_engine.py
+
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from constants import SCENARIO_DRAWS, SCENARIO_HORIZON
+from dataset_loader import parse_timestamps
+from ml_utils_simple import fit_model
+from model_serving import ServedModel
+from rule_engine import CompiledRules, MISSING_SENTINEL, convert, load_rules
+from sensor_catalog import get_catalog
+from summary_engine import frame_fingerprint
+from instrumentation import span, count
+
+# Built-in what-if scenarios. A perturbation applies to every sensor of one
+# quantity in a catalog zone ("Rainforest"), in one dataset ("RF_CO2"), or
+# everywhere (zone None). `value` is in `unit` and converted to each sensor's
+# catalog unit:
+#   shift  adds value to every reading (a difference, so +2 C is +3.6 F)
+#   set    holds the sensors at value
+#   ramp   moves linearly from the window's first reading to value at its end
+# `spread` is the standard deviation of value across Monte Carlo draws.
+DEFAULT_SCENARIOS = [
+    {"name": "Rainforest +2 °C", "perturbations": [
+        {"zone": "Rainforest", "quantity": "temperature", "kind": "shift", "value": 2.0, "unit": "C", "spread": 0.5}]},
+    {"name": "CO2 ramps to 800 ppm", "perturbations": [
+        {"zone": None, "quantity": "co2", "kind": "ramp", "value": 800.0, "unit": "ppm", "spread": 25.0}]},
+    {"name": "Desert heatwave, dry air", "perturbations": [
+        {"zone": "Desert", "quantity": "temperature", "kind": "shift", "value": 5.0, "unit": "C", "spread": 1.0},
+        {"zone": "Desert", "quantity": "relative_humidity", "kind": "shift", "value": -10.0, "unit": "%", "spread": 3.0}]},
+]
+KINDS = ("shift", "set", "ramp")
+BASELINE = "Baseline"
+MIN_COVERAGE = 0.5  # sensors missing more readings than this are left out of the zone models
+DEFAULT_WINDOW_ROWS = 96  # window length for datasets without timestamps
+
+
+class ZoneModels:
+    """
+    The linear models of one dataset as a (column x column) matrix:
+    coef[k, j] is how much column j moves per unit of column k, from
+    ml_utils_simple.fit_model of j on the other columns with the scaler
+    folded in (see model_serving.ServedModel). coef_se holds the standard
+    error of each coefficient so draws can sample the model uncertainty.
+    Single-sensor datasets have no cross-sensor models (all zeros).
+    """
+
+    def __init__(self, name: str, values: np.ndarray, columns: list):
+        n = len(columns)
+        self.columns = columns
+        self.coef = np.zeros((n, n))
+        self.coef_se = np.zeros((n, n))
+        self.modelled = np.zeros(n, dtype=bool)
+        coverage = (~np.isnan(values)).mean(axis=0) if len(values) else np.zeros(n)
+        usable = [j for j in range(n) if coverage[j] >= MIN_COVERAGE]
+        if len(usable) < 2:
+            return
+        frame = pd.DataFrame(values[:, usable], columns=[columns[j] for j in usable])
+        for j in usable:
+            fitted = fit_model(frame, columns[j], name)
+            if fitted is None or not set(fitted["features"]) <= set(frame.columns):
+                continue
+            served = ServedModel(name, columns[j], fitted)
+            X, y = fitted["X"], np.asarray(fitted["y"], dtype=np.float64)
+            residuals = y - fitted["model"].predict(X)
+            sigma2 = residuals @ residuals / max(len(y) - X.shape[1] - 1, 1)
+            scale = np.where(fitted["scaler"].scale_ == 0, 1.0, fitted["scaler"].scale_)
+            se = np.sqrt(sigma2 * np.clip(np.diag(np.linalg.pinv(X.T @ X)), 0, None)) / scale
+            rows = [columns.index(f) for f in served.features]
+            self.coef[rows, j] = served.weights
+            self.coef_se[rows, j] = se
+            self.modelled[j] = True
+
+
+_prepared = {}  # (dataset, fingerprint) -> readings, cadence and models
+_prepared_lock = threading.Lock()
+
+
+def _prepare(name: str, df: pd.DataFrame) -> dict:
+    """
+    Numeric readings (-9999 as NaN), sampling step and zone models of a
+    dataset, cached per process until the frame changes.
+    """
+    key = (name, frame_fingerprint(df))
+    with _prepared_lock:
+        if key in _prepared:
+            return _prepared[key]
+    columns = [c for c in df.columns
+               if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.where(values == MISSING_SENTINEL, np.nan, values)
+    stamps = parse_timestamps(df)
+    step_s = 0.0
+    if stamps is not None and stamps.notna().sum() > 1:
+        ns = stamps.dropna().to_numpy(dtype="datetime64[ns]").astype(np.int64)
+        diffs = np.diff(ns)
+        diffs = diffs[diffs > 0]
+        step_s = float(np.median(diffs)) / 1e9 if len(diffs) else 0.0
+    with span("scenarios.fit_models"):
+        models = ZoneModels(name, values, columns)
+    present = ~np.isnan(values)
+    start = np.zeros((1, len(columns)))
+    prepared = {"columns": columns, "values": values, "step_s": step_s, "models": models,
+                # prefix sums, so the mean of any historical window is two lookups
+                "sums": np.vstack([start, np.cumsum(np.where(present, values, 0.0), axis=0)]),
+                "counts": np.vstack([start, np.cumsum(present, axis=0)])}
+    with _prepared_lock:
+        _prepared[key] = prepared
+    return prepared
+
+
+def _matches(perturbation: dict, name: str, zone) -> bool:
+    target = perturbation.get("zone")
+    return target is None or target == zone or target == name
+
+
+def _alerted(window: np.ndarray, compiled: CompiledRules, step_s: float) -> tuple:
+    """
+    Alert state of each rule over each draw's window, given the (draw x row x
+    pair) readings of the compiled rules' columns. Returns two (draw x rule)
+    arrays: whether the rule's alert is still active at the window's last row
+    (what CompiledRules.evaluate leaves in state["active"] and the dashboard
+    reports as the zone's status) and the fraction of the window's rows it
+    spent in alert. Same hysteresis and duration logic as
+    CompiledRules.evaluate, with durations counted in rows of the dataset's
+    median step. Steps through the window's rows once, updating every draw
+    and sensor together.
+    """
+    draws, rows = window.shape[:2]
+    alerted = np.zeros((draws, len(compiled.rules)), dtype=bool)
+    share = np.zeros((draws, len(compiled.rules)))
+    if not compiled.columns:
+        return alerted, share
+    scaled = window * compiled.signs
+    raises = scaled > compiled.raise_at
+    # Only (draw, pair) windows with at least one reading past the threshold can alert
+    live = raises.any(axis=1)
+    if not live.any():
+        return alerted, share
+    draw_ids, pair_ids = np.flatnonzero(live.any(axis=1)), np.flatnonzero(live.any(axis=0))
+    raises = np.ascontiguousarray(raises[draw_ids][:, :, pair_ids].transpose(1, 0, 2))
+    holds = np.ascontiguousarray(~(scaled[draw_ids][:, :, pair_ids] < compiled.clear_at[pair_ids]).transpose(1, 0, 2))
+    # No timestamps: every row is the same instant and durations are ignored
+    needed = np.ceil(compiled.durations[pair_ids] / step_s).astype(np.int64) if step_s else 0
+    # Pairs are compiled rule by rule, so each rule's pairs are one contiguous slice
+    rule_ids = compiled.rule_ids[pair_ids]
+    rule_list, rule_starts = np.unique(rule_ids, return_index=True)
+    breach = np.zeros(raises.shape[1:], dtype=bool)
+    run = np.zeros(raises.shape[1:], dtype=np.int64)  # rows since the breach began
+    active = np.zeros(raises.shape[1:], dtype=bool)
+    in_alert = np.zeros((len(draw_ids), len(rule_list)), dtype=np.int64)
+    for row in range(rows):
+        breach &= holds[row]  # cleared once back past the clear level; NaN keeps the state
+        breach |= raises[row]
+        run += 1
+        run *= breach
+        np.greater(run, needed, out=active)
+        in_alert += np.logical_or.reduceat(active, rule_starts, axis=1)
+    alerted[np.ix_(draw_ids, rule_list)] = np.logical_or.reduceat(active, rule_starts, axis=1)
+    share[np.ix_(draw_ids, rule_list)] = in_alert / rows
+    return alerted, share
+
+
+def _window_means(window: np.ndarray) -> np.ndarray:
+    present = ~np.isnan(window)
+    counts = present.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, np.where(present, window, 0.0).sum(axis=1) / counts, np.nan)
+
+
+def _historical_means(prepared: dict, starts: np.ndarray, rows: int) -> np.ndarray:
+    """
+    (draw x column) means of the unperturbed windows from the prefix sums.
+    """
+    sums = prepared["sums"][starts + rows] - prepared["sums"][starts]
+    counts = prepared["counts"][starts + rows] - prepared["counts"][starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _summarize(zone, columns, alerts, means, compiled, baseline=None, perturbed=(), propagated=()) -> dict:
+    alerted, share = alerts
+    healthy = ~alerted.any(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # sensors with no readings in any window
+        p5, p50, p95 = np.nanpercentile(means, [5, 50, 95], axis=0) if len(columns) else ([], [], [])
+    result = {
+        "zone": zone,
+        "healthy": healthy,
+        "p_healthy": float(healthy.mean()),
+        "alerts": {rule["name"]: float(alerted[:, i].mean()) for i, rule in enumerate(compiled.rules)},
+        "alert_share": {rule["name"]: float(share[:, i].mean()) for i, rule in enumerate(compiled.rules)},
+        "columns": {c: {"p5": float(p5[j]), "p50": float(p50[j]), "p95": float(p95[j])} for j, c in enumerate(columns)},
+        "perturbed": list(perturbed),
+        "propagated": list(propagated),
+    }
+    result["baseline_p_healthy"] = baseline["p_healthy"] if baseline else result["p_healthy"]
+    for j, c in enumerate(columns):
+        result["columns"][c]["baseline_p50"] = (baseline or result)["columns"][c]["p50"]
+    return result
+
+
+def _perturb(perturbation: dict, name: str, columns: list, window: np.ndarray, magnitude: np.ndarray, delta: np.ndarray) -> list:
+    """
+    Add one perturbation's change to `delta` (draw x row x column) for every
+    matching column; returns the column indexes it touched.
+    """
+    catalog = get_catalog()
+    kind = perturbation.get("kind", "shift")
+    if kind not in KINDS:
+        raise ValueError(f"unknown perturbation kind: {kind}")
+    unit = perturbation.get("unit")
+    touched = []
+    for column in catalog.columns_for(name, perturbation["quantity"], columns):
+        j = columns.index(column)
+        to_unit = catalog.entry(name, column)["unit"]
+        if kind == "shift":
+            change = convert(magnitude, unit, to_unit) - convert(0.0, unit, to_unit)
+            delta[:, :, j] += change[:, None]
+        elif kind == "set":
+            delta[:, :, j] += convert(magnitude, unit, to_unit)[:, None] - window[:, :, j]
+        else:
+            ramp = np.linspace(0.0, 1.0, window.shape[1])
+            delta[:, :, j] += (convert(magnitude, unit, to_unit)[:, None] - window[:, :1, j]) * ramp
+        touched.append(j)
+    return touched
+
+
+def run_scenarios(zones: dict, scenarios: list = None, draws: int = SCENARIO_DRAWS,
+                  horizon: str = SCENARIO_HORIZON, seed: int = 0, rules: list = None) -> dict:
+    """
+    Monte Carlo what-if runs of every scenario over every dataset in `zones`.
+
+    Each draw takes a random historical window of `horizon` (the same point in
+    time for every dataset and scenario, so differences come from the
+    scenario), samples each perturbation's value, applies it to the matching
+    sensors and propagates the change to the dataset's other sensors through
+    its zone models, with coefficients sampled from their standard errors.
+    The alert rules are then evaluated on every draw. All draws of a dataset
+    are one batched array computation; nothing loops over draws.
+
+    Returns {"draws", "horizon", "elapsed_s", "scenarios": {name: {"datasets",
+    "zones", "stable"}}} with the Baseline (no perturbation) first. Per
+    dataset: probability of ending the window healthy (no alert active at its
+    last row, as rule_engine reports a zone's status), per-rule probabilities
+    of an active alert at the end of the window, per-rule mean fraction of the
+    window's rows spent in alert and 5/50/95th percentiles of each sensor's
+    window mean. Per zone: probability that all its datasets end healthy.
+    "stable": distribution of the number of datasets that end healthy.
+    """
+    started = time.perf_counter()
+    scenarios = DEFAULT_SCENARIOS if scenarios is None else scenarios
+    rules = rules if rules is not None else load_rules()
+    catalog = get_catalog()
+    rng = np.random.default_rng(seed)
+    position = rng.random(draws)
+    magnitudes = [[p.get("value", 0.0) + p.get("spread", 0.0) * rng.standard_normal(draws) for p in s["perturbations"]]
+                  for s in scenarios]
+    horizon_s = pd.Timedelta(horizon).total_seconds()
+    names = [BASELINE] + [s["name"] for s in scenarios]
+    results = {name: {"datasets": {}, "zones": {}} for name in names}
+
+    for name, df in zones.items():
+        prepared = _prepare(name, df)
+        columns, values, step_s, models = (prepared[k] for k in ("columns", "values", "step_s", "models"))
+        if not len(values) or not columns:
+            continue
+        zone = catalog.zone_of(name)
+        rows = min(int(horizon_s // step_s) + 1 if step_s else DEFAULT_WINDOW_ROWS, len(values))
+        with span("scenarios.simulate"):
+            starts = (position * (len(values) - rows + 1)).astype(np.intp)
+            index = starts[:, None] + np.arange(rows)
+            compiled = CompiledRules(rules, name, columns)
+            pair_cols = np.array([columns.index(c) for c in compiled.columns], dtype=np.intp)
+            # The baseline only needs the rule columns' windows; means come from the prefix sums
+            baseline = _summarize(zone, columns, _alerted(values[:, pair_cols][index], compiled, step_s),
+                                  _historical_means(prepared, starts, rows), compiled)
+            results[BASELINE]["datasets"][name] = baseline
+            window = noise = None
+            for scenario, scenario_magnitudes in zip(scenarios, magnitudes):
+                applied = [(p, m) for p, m in zip(scenario["perturbations"], scenario_magnitudes)
+                           if _matches(p, name, zone) and catalog.columns_for(name, p["quantity"], columns)]
+                if not applied:
+                    results[scenario["name"]]["datasets"][name] = baseline
+                    continue
+                if window is None:
+                    window = values[index]
+                delta = np.zeros_like(window)
+                perturbed = set()
+                for perturbation, magnitude in applied:
+                    perturbed.update(_perturb(perturbation, name, columns, window, magnitude, delta))
+                sources = sorted(perturbed)
+                targets = models.modelled.copy()
+                targets[sources] = False  # perturbed sensors follow the scenario, not their models
+                propagated = []
+                if targets.any():
+                    if noise is None:
+                        noise = rng.standard_normal((draws,) + models.coef.shape)
+                    coef = models.coef[sources][:, targets] + models.coef_se[sources][:, targets] * noise[:, sources][:, :, targets]
+                    delta[:, :, targets] += np.nan_to_num(delta[:, :, sources]) @ coef
+                    propagated = [columns[j] for j in np.flatnonzero(targets) if models.coef[sources, j].any()]
+                simulated = window + delta
+                results[scenario["name"]]["datasets"][name] = _summarize(
+                    zone, columns, _alerted(simulated[:, :, pair_cols], compiled, step_s), _window_means(simulated),
+                    compiled, baseline, [columns[j] for j in sources], propagated)
+        count("scenarios.draws", draws * len(names))
+
+    for name in names:
+        datasets = results[name]["datasets"]
+        by_zone = {}
+        for dataset in datasets.values():
+            by_zone.setdefault(dataset["zone"], []).append(dataset["healthy"])
+        results[name]["zones"] = {zone: {"p_healthy": float(np.logical_and.reduce(healthy).mean()), "datasets": len(healthy)}
+                                  for zone, healthy in by_zone.items()}
+        stable = np.sum([d["healthy"] for d in datasets.values()], axis=0) if datasets else np.zeros(draws)
+        results[name]["stable"] = {"mean": float(np.mean(stable)), "p5": float(np.percentile(stable, 5)),
+                                   "p95": float(np.percentile(stable, 95)), "total": len(datasets)}
+    for name in names:
+        for zone, entry in results[name]["zones"].items():
+            entry["baseline_p_healthy"] = results[BASELINE]["zones"][zone]["p_healthy"]
+        for dataset in results[name]["datasets"].values():
+            dataset.pop("healthy", None)
+    return {"draws": draws, "horizon": horizon, "elapsed_s": time.perf_counter() - started, "scenarios": results}
+
+
+def zone_summary(result: dict) -> pd.DataFrame:
+    """
+    One row per scenario and zone: probability that every dataset in the zone ends the window healthy.
+    """
+    rows = [{"scenario": name, "zone": zone, "p_healthy": entry["p_healthy"],
+             "baseline": entry["baseline_p_healthy"], "change": entry["p_healthy"] - entry["baseline_p_healthy"]}
+            for name, scenario in result["scenarios"].items() for zone, entry in scenario["zones"].items()]
+    return pd.DataFrame(rows, columns=["scenario", "zone", "p_healthy", "baseline", "change"])
+
+
+def dataset_summary(result: dict, dataset: str) -> pd.DataFrame:
+    """
+    One row per scenario and sensor of a dataset: percentiles of the window mean and alert probabilities.
+    """
+    rows = []
+    for name, scenario in result["scenarios"].items():
+        entry = scenario["datasets"].get(dataset)
+        if entry is None:
+            continue
+        for column, stats in entry["columns"].items():
+            role = "perturbed" if column in entry["perturbed"] else "propagated" if column in entry["propagated"] else ""
+            rows.append({"scenario": name, "sensor": column, "role": role, **stats, "p_healthy": entry["p_healthy"]})
+    return pd.DataFrame(rows)
@@ -0,0 +1,275 @@
+# sensor_catalog.py
+
+import json
+import os
+import re
+import threading
+
+from constants import DATA_DIR, METADATA_PATH, SENSOR_CATALOG_PATH
+
+# First filename token -> zone
+# zone names matched anywhere in a file name ("OceanTemp.csv", "desert-co2.csv")
+ZONE_NAMES = (("ocean", "Ocean"), ("desert", "Desert"), ("rainforest", "Rainforest"), ("leo", "LEO"))
+# abbreviations matched only as a whole token, so "surf_data.csv" is not Rainforest
+ZONE_TOKENS = {"rf": "Rainforest"}
+# metadata "Location" spellings -> zone
+LOCATION_ZONES = {"ocen": "Ocean", "ocean": "Ocean", "desert": "Desert", "rainforest": "Rainforest", "leo-w": "LEO"}
+QUANTITY_ALIASES = {
+    "carbon_dioxide": "co2",
+    "releative_humidity": "relative_humidity",
+}
+UNIT_ALIASES = {"degc": "C", "c": "C", "f": "F", "degk": "K", "k": "K", "ph": "pH"}
+# Token rules for headers that are not in the metadata (e.g. uploaded files)
+TOKEN_QUANTITIES = [
+    (("temp", "temperature", "pyrgeotemp"), "temperature"),
+    (("rh", "humidity"), "relative_humidity"),
+    (("co2",), "co2"),
+    (("ph",), "ph"),
+    (("sal", "salinity"), "salinity"),
+    (("odo", "oxygen"), "dissolved_oxygen"),
+    (("par",), "radiation_incoming_par"),
+    (("h2o",), "water_vapor_concentration"),
+    (("airpress", "pressure"), "pressure"),
+    (("windspeed", "ws"), "wind_speed"),
+    (("wd",), "wind_direction"),
+]
+LEO_POSITION = re.compile(r"leo-w_(-?\d+)_(-?\d+)_(-?\d+)")
+MONTH_SUFFIX = re.compile(r"_[A-Z]{3}-\d{4}$")
+
+
+def normalize_column(name: str) -> str:
+    """
+    Same normalization dataset_loader applies to headers.
+    """
+    return str(name).strip().lower().replace(" ", "_")
+
+
+def _tokens(name: str) -> list:
+    return [t for t in re.split(r"[^a-z0-9]+", name.lower()) if t]
+
+
+def _slug(text: str) -> str:
+    slug = "_".join(_tokens(str(text)))
+    return QUANTITY_ALIASES.get(slug, slug)
+
+
+def _unit_from_header(column: str):
+    match = re.search(r"[\[(]([^\])]+)[\])]", column)
+    if not match:
+        return None
+    unit = match.group(1).strip()
+    return UNIT_ALIASES.get(unit.lower(), unit)
+
+
+def zone_from_filename(file_name: str):
+    """
+    Zone from a file name: a zone name anywhere in it ("Ocean-data.csv" ->
+    Ocean), or an abbreviation as a whole token ("RF_CO2_FEB-2025.csv" ->
+    Rainforest).
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0].lower()
+    for name, zone in ZONE_NAMES:
+        if name in stem:
+            return zone
+    for token in re.split(r"[-_. ]+", stem):
+        if token in ZONE_TOKENS:
+            return ZONE_TOKENS[token]
+    return None
+
+
+def dataset_stem(file_name: str) -> str:
+    """
+    File name without extension and month suffix: "Desert_CO2_FEB-2025.csv" -> "Desert_CO2".
+    """
+    stem = os.path.splitext(os.path.basename(file_name))[0]
+    return MONTH_SUFFIX.sub("", stem)
+
+
+def _instrument_and_site(file_name: str):
+    parts = dataset_stem(file_name).split("_")
+    if parts[0].upper() == "LEO-W" and len(parts) > 1:
+        return parts[1], None
+    if len(parts) > 1 and parts[0].upper() in ("RF", "DESERT") and parts[1].upper() != "CO2":
+        return None, parts[1]
+    return None, None
+
+
+def _grid_position(column: str, file_name: str):
+    match = LEO_POSITION.search(column) or LEO_POSITION.search(file_name.lower())
+    if not match:
+        return None
+    return tuple(int(v) for v in match.groups())
+
+
+def classify_column(column: str) -> dict:
+    """
+    Best-effort entry for a header that is not in the metadata, using whole
+    tokens rather than substrings ("rh" no longer matches "shortradout").
+    """
+    column = normalize_column(column)
+    tokens = set(_tokens(column.split("[")[0].split("(")[0]))
+    quantity = None
+    for names, q in TOKEN_QUANTITIES:
+        if tokens.intersection(names):
+            quantity = q
+            break
+    return {"quantity": quantity, "unit": _unit_from_header(column), "source": "header"}
+
+
+class SensorCatalog:
+    """
+    Zone, instrument, quantity, unit and grid position for every sensor column,
+    with dict indexes so every lookup is O(1).
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.by_key = {(e["file"], e["column"]): e for e in entries}
+        self.by_stem = {}
+        self.by_file = {}
+        self.files_by_zone = {}
+        self.columns_by_quantity = {}
+        for e in entries:
+            self.by_stem.setdefault((dataset_stem(e["file"]), e["column"]), e)
+            self.by_file.setdefault(e["file"], []).append(e)
+            if e["zone"] and e["file"] not in self.files_by_zone.get(e["zone"], []):
+                self.files_by_zone.setdefault(e["zone"], []).append(e["file"])
+            self.columns_by_quantity.setdefault((e["file"], e["quantity"]), []).append(e["column"])
+        self._header_cache = {}
+
+    def entry(self, file_name: str, column: str) -> dict:
+        """
+        Catalog entry for a column. Files of other months share their stem's
+        entries; unknown headers fall back to token classification.
+        """
+        column = normalize_column(column)
+        base = os.path.basename(file_name) if file_name else ""
+        found = self.by_key.get((base, column)) or self.by_stem.get((dataset_stem(base), column))
+        if found is not None:
+            return found
+        cached = self._header_cache.get((base, column))
+        if cached is None:
+            cached = {"file": base, "column": column, "zone": zone_from_filename(base) if base else None,
+                      "instrument": None, "site": None, "grid_position": _grid_position(column, base),
+                      **classify_column(column)}
+            self._header_cache[(base, column)] = cached
+        return cached
+
+    def zone_of(self, file_name: str):
+        for e in self.entries_for_file(file_name):
+            return e["zone"]
+        return zone_from_filename(file_name)
+
+    def entries_for_file(self, file_name: str):
+        return self.by_file.get(os.path.basename(file_name), [])
+
+    def quantity_of(self, file_name: str, column: str):
+        return self.entry(file_name, column)["quantity"]
+
+    def columns_for(self, file_name: str, quantity: str, columns=None) -> list:
+        """
+        Columns of `quantity` in a file. Pass the frame's `columns` for files
+        that are not in the catalog (uploads); their headers are classified once.
+        """
+        base = os.path.basename(file_name) if file_name else ""
+        known = self.columns_by_quantity.get((base, quantity))
+        if known is not None and columns is None:
+            return list(known)
+        if columns is None:
+            return []
+        return [c for c in columns if self.entry(base, c)["quantity"] == quantity]
+
+    def to_json(self) -> str:
+        return json.dumps(self.entries, indent=1)
+
+
+def build_catalog(data_dir: str = DATA_DIR, metadata_path: str = METADATA_PATH) -> SensorCatalog:
+    """
+    Build the catalog from the metadata workbook and the CSV headers in data_dir.
+    """
+    import pandas as pd  # only needed when the saved catalog is missing or stale
+
+    metadata = {}
+    if metadata_path and os.path.exists(metadata_path):
+        try:
+            sheet = pd.read_excel(metadata_path, header=None)
+            header_row = sheet.index[sheet.iloc[:, 0].astype(str).str.strip().str.lower() == "filename"][0]
+            for _, row in sheet.iloc[header_row + 1:].iterrows():
+                if pd.isna(row.iloc[0]) or pd.isna(row.iloc[2]):
+                    continue
+                metadata[(str(row.iloc[0]).strip(), normalize_column(row.iloc[2]))] = row
+        except Exception:
+            metadata = {}
+
+    entries = []
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        header = pd.read_csv(os.path.join(data_dir, file_name), nrows=0).columns
+        instrument, site = _instrument_and_site(file_name)
+        for raw in header:
+            column = normalize_column(raw)
+            if "date" in column or "time" in column:
+                continue
+            meta = metadata.get((file_name, column))
+            if meta is not None:
+                zone = LOCATION_ZONES.get(str(meta.iloc[1]).strip().lower(), zone_from_filename(file_name))
+                quantity = _slug(meta.iloc[3])
+                unit = str(meta.iloc[4]).strip()
+                unit = UNIT_ALIASES.get(unit.lower(), unit)
+                source = "metadata"
+            else:
+                zone = zone_from_filename(file_name)
+                guess = classify_column(column)
+                quantity, unit, source = guess["quantity"], guess["unit"], "header"
+            entries.append({
+                "file": file_name,
+                "column": column,
+                "zone": zone,
+                "instrument": instrument,
+                "site": site,
+                "quantity": quantity,
+                "unit": unit,
+                "grid_position": _grid_position(column, file_name),
+                "source": source,
+            })
+    return SensorCatalog(entries)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _is_stale(path, data_dir, metadata_path):
+    if not os.path.exists(path):
+        return True
+    built = os.path.getmtime(path)
+    sources = [data_dir] + ([metadata_path] if metadata_path and os.path.exists(metadata_path) else [])
+    return any(os.path.getmtime(s) > built for s in sources)
+
+
+def get_catalog(data_dir: str = DATA_DIR, metadata_path: str = METADATA_PATH,
+                path: str = SENSOR_CATALOG_PATH) -> SensorCatalog:
+    """
+    Process-wide catalog: loaded from the persisted JSON index when it is up to
+    date, otherwise rebuilt from the metadata and headers and saved.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            return _catalog
+        if not _is_stale(path, data_dir, metadata_path):
+            with open(path) as f:
+                entries = json.load(f)
+            for e in entries:
+                if e.get("grid_position") is not None:
+                    e["grid_position"] = tuple(e["grid_position"])
+            _catalog = SensorCatalog(entries)
+        else:
+            _catalog = build_catalog(data_dir, metadata_path)
+            try:
+                with open(path, "w") as f:
+                    f.write(_catalog.to_json())
+            except OSError:
+                pass
+        return _catalog
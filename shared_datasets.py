@@ -0,0 +1,50 @@
+# shared_datasets.py
+
+import threading
+from collections import ChainMap
+
+from constants import DATA_DIR
+from instrumentation import count
+from partitioned_store import get_store
+from resample_pyramid import build_zone_pyramids
+
+_lock = threading.Lock()
+_shared = {}  # data_dir -> (signature, {dataset: DataFrame backed by read-only memory maps}, pyramids)
+
+
+def get_shared_datasets(data_dir: str = DATA_DIR):
+    """
+    Process-wide zone frames and resampling pyramids, loaded once per process
+    and rebuilt only when a file in data_dir changes (pyramids of datasets that
+    only gained rows are extended, not rebuilt). Zones are the partitioned
+    store's datasets (e.g. "Desert_CO2"), with all months concatenated; a
+    single-month dataset stays a zero-copy view of its memory-mapped columns.
+    Returns (zones, pyramids). Treat both as read-only; use session_datasets()
+    to get per-session views.
+    """
+    store = get_store(data_dir)
+    signature = tuple(sorted((p["file"], p["mtime_ns"], p["size"]) for p in store.partitions.values()))
+    with _lock:
+        cached = _shared.get(data_dir)
+        if cached is not None and cached[0] == signature:
+            count("shared.hits")
+            return cached[1], cached[2]
+        zones = store.load_datasets()
+        for df in zones.values():
+            count("load.rows", len(df))
+        pyramids = build_zone_pyramids(zones, *(cached[1:] if cached is not None else ()))
+        _shared[data_dir] = (signature, zones, pyramids)
+        return zones, pyramids
+
+
+def session_datasets(data_dir: str = DATA_DIR):
+    """
+    Per-session (datasets, pyramids) mappings. Reads fall through to the shared,
+    zero-copy frames; writes (e.g. an "Uploaded CSV" zone) land in the session's
+    own overlay. Each shared frame is handed out as a shallow copy, so with
+    pandas copy-on-write a session that modifies its frame gets a private copy
+    instead of changing everyone else's.
+    """
+    zones, pyramids = get_shared_datasets(data_dir)
+    views = {name: df.copy(deep=False) for name, df in zones.items()}
+    return ChainMap({}, views), ChainMap({}, pyramids)
@@ -0,0 +1,315 @@
+# summary_engine.py
+
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.10, 0.25, 0.50, 0.75, 0.90)
+SKETCH_SIZE = 256
+
+
+class ZoneSummary:
+    """
+    Mergeable summary of every numeric column in a DataFrame.
+
+    Holds count, mean, central moment sums (M2, M3, M4), min and max per column
+    plus a quantile sketch (sorted centroids with weights). Two summaries can be
+    merged without touching the raw rows again, so new chunks or uploaded files
+    update an existing summary instead of recomputing it.
+    """
+
+    def __init__(self, columns, count, mean, m2, m3, m4, minimum, maximum, sketches, exact_quantiles=None):
+        self.columns = list(columns)
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.m3 = m3
+        self.m4 = m4
+        self.min = minimum
+        self.max = maximum
+        self.sketches = sketches  # list of (centroid_means, centroid_weights)
+        self.exact_quantiles = exact_quantiles or {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, quantiles=DEFAULT_QUANTILES):
+        """
+        Summarize all numeric columns in one vectorized pass: a single column-wise
+        sort yields min, max, the exact quantiles and the sketch, and the moments
+        come from one pass of deviations over the whole value matrix.
+        """
+        numeric = df.select_dtypes(include=["number"])
+        columns = numeric.columns.tolist()
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        if values.ndim != 2:
+            values = values.reshape(len(numeric), len(columns))
+
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(valid, values, 0.0).sum(axis=0) / count
+            dev = np.where(valid, values - mean, 0.0)
+        d2 = dev * dev
+        m2 = d2.sum(axis=0)
+        m3 = (d2 * dev).sum(axis=0)
+        m4 = (d2 * d2).sum(axis=0)
+
+        ordered = np.sort(values, axis=0)  # NaNs sort to the end of each column
+        cols = np.arange(len(columns))
+        last = np.maximum(count - 1, 0)
+        has_rows = count > 0
+        minimum = np.where(has_rows, ordered[0, cols] if len(ordered) else np.nan, np.nan)
+        maximum = np.where(has_rows, ordered[last, cols] if len(ordered) else np.nan, np.nan)
+
+        exact = {}
+        for q in quantiles:
+            exact[q] = _sorted_quantile(ordered, count, q)
+
+        sketches = [_compress(ordered[: count[j], j], np.ones(count[j])) for j in cols]
+        return cls(columns, count, mean, m2, m3, m4, minimum, maximum, sketches, exact)
+
+    def merge(self, other: "ZoneSummary") -> "ZoneSummary":
+        """
+        Combine two summaries using the pairwise moment update formulas.
+        Columns present on only one side are carried over unchanged.
+        """
+        columns = self.columns + [c for c in other.columns if c not in self.columns]
+        a = self._aligned(columns)
+        b = other._aligned(columns)
+        na, nb = a["count"].astype(np.float64), b["count"].astype(np.float64)
+        n = na + nb
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = np.nan_to_num(b["mean"]) - np.nan_to_num(a["mean"])
+            safe_n = np.where(n > 0, n, 1.0)
+            mean = np.where(n > 0, np.nan_to_num(a["mean"]) + delta * nb / safe_n, np.nan)
+            m2 = a["m2"] + b["m2"] + delta ** 2 * na * nb / safe_n
+            m3 = (a["m3"] + b["m3"]
+                  + delta ** 3 * na * nb * (na - nb) / safe_n ** 2
+                  + 3.0 * delta * (na * b["m2"] - nb * a["m2"]) / safe_n)
+            m4 = (a["m4"] + b["m4"]
+                  + delta ** 4 * na * nb * (na * na - na * nb + nb * nb) / safe_n ** 3
+                  + 6.0 * delta ** 2 * (na * na * b["m2"] + nb * nb * a["m2"]) / safe_n ** 2
+                  + 4.0 * delta * (na * b["m3"] - nb * a["m3"]) / safe_n)
+
+        minimum = np.fmin(a["min"], b["min"])
+        maximum = np.fmax(a["max"], b["max"])
+        sketches = []
+        for (ma, wa), (mb, wb) in zip(a["sketches"], b["sketches"]):
+            means = np.concatenate([ma, mb])
+            weights = np.concatenate([wa, wb])
+            order = np.argsort(means, kind="stable")
+            sketches.append(_compress(means[order], weights[order]))
+        return ZoneSummary(columns, n.astype(np.int64), mean, m2, m3, m4, minimum, maximum, sketches)
+
+    def _aligned(self, columns):
+        """
+        Return this summary's arrays reindexed to the given column order.
+        """
+        pos = {c: i for i, c in enumerate(self.columns)}
+        idx = np.array([pos.get(c, -1) for c in columns], dtype=np.int64)
+        present = idx >= 0
+        take = np.where(present, idx, 0)
+
+        def pick(arr, fill):
+            if len(self.columns) == 0:
+                return np.full(len(columns), fill, dtype=np.float64)
+            return np.where(present, np.asarray(arr, dtype=np.float64)[take], fill)
+
+        empty = (np.empty(0), np.empty(0))
+        return {
+            "count": pick(self.count, 0.0),
+            "mean": pick(self.mean, np.nan),
+            "m2": pick(self.m2, 0.0),
+            "m3": pick(self.m3, 0.0),
+            "m4": pick(self.m4, 0.0),
+            "min": pick(self.min, np.nan),
+            "max": pick(self.max, np.nan),
+            "sketches": [self.sketches[i] if i >= 0 else empty for i in idx],
+        }
+
+    def quantiles(self, probs=DEFAULT_QUANTILES) -> dict:
+        """
+        Return {q: array of per-column values}. Exact when this summary was built
+        from a single frame, otherwise interpolated from the merged sketches.
+        """
+        result = {}
+        for q in probs:
+            if q in self.exact_quantiles:
+                result[q] = self.exact_quantiles[q]
+            else:
+                result[q] = np.array([
+                    _sketch_quantile(means, weights, q, lo, hi)
+                    for (means, weights), lo, hi in zip(self.sketches, self.min, self.max)
+                ])
+        return result
+
+    def std(self):
+        """
+        Sample standard deviation; NaN for columns with fewer than two values.
+        """
+        count = np.asarray(self.count, dtype=np.float64)
+        enough = count >= 2
+        return np.where(enough, np.sqrt(np.where(enough, self.m2, 0.0) / np.where(enough, count - 1, 1.0)), np.nan)
+
+    def skew(self):
+        """
+        Biased sample skewness (same definition as scipy.stats.skew).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.count) * self.m3 / self.m2 ** 1.5
+
+    def kurtosis(self):
+        """
+        Biased Fisher kurtosis (same definition as scipy.stats.kurtosis).
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.count * self.m4 / self.m2 ** 2 - 3.0
+
+    def to_frame(self, probs=DEFAULT_QUANTILES) -> pd.DataFrame:
+        """
+        One row per column with count, moments and the requested quantiles.
+        """
+        data = {
+            "count": self.count,
+            "mean": self.mean,
+            "std": self.std(),
+            "min": self.min,
+        }
+        for q, vals in self.quantiles(probs).items():
+            data[f"p{int(round(q * 100))}"] = vals
+        data["max"] = self.max
+        data["skew"] = self.skew()
+        data["kurtosis"] = self.kurtosis()
+        return pd.DataFrame(data, index=self.columns)
+
+    def describe(self) -> pd.DataFrame:
+        """
+        Same layout as DataFrame.describe() for numeric columns.
+        """
+        q = self.quantiles((0.25, 0.50, 0.75))
+        table = pd.DataFrame(
+            [self.count.astype(np.float64), self.mean, self.std(), self.min, q[0.25], q[0.50], q[0.75], self.max],
+            index=["count", "mean", "std", "min", "25%", "50%", "75%", "max"],
+            columns=self.columns,
+        )
+        return table
+
+
+def _sorted_quantile(ordered, count, q):
+    """
+    Linear-interpolated quantile (pandas' default) for every column of an
+    array already sorted along axis 0 with NaNs at the end.
+    """
+    n_cols = ordered.shape[1]
+    if ordered.shape[0] == 0:
+        return np.full(n_cols, np.nan)
+    cols = np.arange(n_cols)
+    pos = q * np.maximum(count - 1, 0)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    frac = pos - lo
+    lo_val = ordered[lo, cols]
+    hi_val = ordered[hi, cols]
+    return np.where(count > 0, lo_val + (hi_val - lo_val) * frac, np.nan)
+
+
+def _compress(means, weights, size=SKETCH_SIZE):
+    """
+    Reduce sorted weighted points to at most `size` centroids of roughly equal
+    weight. Inputs at or below the size limit are kept as-is (exact).
+    """
+    if len(means) <= size:
+        return means.astype(np.float64), weights.astype(np.float64)
+    total = weights.sum()
+    before = np.cumsum(weights) - weights
+    bucket = np.minimum((before / total * size).astype(np.int64), size - 1)
+    w = np.bincount(bucket, weights=weights, minlength=size)
+    s = np.bincount(bucket, weights=means * weights, minlength=size)
+    keep = w > 0
+    return s[keep] / w[keep], w[keep]
+
+
+def _sketch_quantile(means, weights, q, lo, hi):
+    if len(means) == 0:
+        return np.nan
+    total = weights.sum()
+    position = np.cumsum(weights) - weights + (weights - 1.0) / 2.0
+    value = np.interp(q * (total - 1.0), position, means)
+    return float(np.clip(value, lo, hi))
+
+
+def summarize_frame(df: pd.DataFrame, quantiles=DEFAULT_QUANTILES) -> ZoneSummary:
+    return ZoneSummary.from_frame(df, quantiles)
+
+
+def frame_fingerprint(df: pd.DataFrame):
+    """
+    Identity of a DataFrame's contents: shape, column names and a hash of
+    every row, in order, so an edit anywhere in the frame changes it. Used
+    to decide whether cached summaries, zone models and features are stale
+    (a few milliseconds for a month of readings).
+    """
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy() if len(df) else np.zeros(0, dtype=np.uint64)
+    return (df.shape, tuple(df.columns), hashlib.sha1(rows.tobytes()).hexdigest())
+
+
+# -------------------------
+# PER-ZONE CACHE
+# -------------------------
+_zone_cache = {}  # zone -> (fingerprint, ZoneSummary)
+_cache_lock = threading.Lock()
+
+
+def get_zone_summary(zone: str, df: pd.DataFrame, version=None) -> ZoneSummary:
+    """
+    Return the cached summary for a zone, computing it only when the zone's
+    data changed. Pass `version` when the caller already tracks a data version
+    that is unique across the process (the cache is shared by every session);
+    otherwise a fingerprint of the frame is used.
+    """
+    key = version if version is not None else frame_fingerprint(df)
+    with _cache_lock:
+        cached = _zone_cache.get(zone)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    summary = ZoneSummary.from_frame(df)
+    with _cache_lock:
+        _zone_cache[zone] = (key, summary)
+    return summary
+
+
+def update_zone_summary(zone: str, new_rows: pd.DataFrame, version=None) -> ZoneSummary:
+    """
+    Merge a new chunk of rows into the zone's cached summary.
+    """
+    chunk = ZoneSummary.from_frame(new_rows)
+    with _cache_lock:
+        cached = _zone_cache.get(zone)
+        merged = cached[1].merge(chunk) if cached is not None else chunk
+        _zone_cache[zone] = (version, merged)
+    return merged
+
+
+def clear_summary_cache(zone: str = None):
+    with _cache_lock:
+        if zone is None:
+            _zone_cache.clear()
+        else:
+            _zone_cache.pop(zone, None)
+
+
+def format_summary(summary: ZoneSummary, file_name: str) -> str:
+    """
+    Text summary in the format used by the prompt builders.
+    """
+    q = summary.quantiles((0.10, 0.25, 0.50, 0.75, 0.90))
+    std, skew, kurt = summary.std(), summary.skew(), summary.kurtosis()
+    lines = [f"Extended Summary for {file_name}:"]
+    for i, col in enumerate(summary.columns):
+        lines.append(
+            f"{col}: mean={summary.mean[i]:.2f}, median={q[0.50][i]:.2f}, std={std[i]:.2f}, "
+            f"IQR={q[0.75][i] - q[0.25][i]:.2f}, skew={skew[i]:.2f}, kurtosis={kurt[i]:.2f}, "
+            f"p10={q[0.10][i]:.2f}, p25={q[0.25][i]:.2f}, p75={q[0.75][i]:.2f}, p90={q[0.90][i]:.2f}"
+        )
+    return "\n".join(lines)
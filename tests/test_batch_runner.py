@@ -0,0 +1,24 @@
+# test_batch_runner.py
+
+import numpy as np
+import pandas as pd
+
+from batch_runner import process_zone
+
+
+def test_process_zone_single_sensor(tmp_path):
+    # One numeric column, so the model falls back to the target's own lags
+    stamps = pd.date_range("2025-02-01", periods=400, freq="15min")
+    values = 400 + 20 * np.sin(np.arange(len(stamps)) / 16)
+    values[50:60] = np.nan
+    pd.DataFrame({"DateTime": stamps.strftime("%Y/%m/%d %H:%M"), "CO2[ppm]": values}).to_csv(
+        tmp_path / "Solo_CO2_FEB-2025.csv", index=False)
+
+    result = process_zone(str(tmp_path), "Solo_CO2")
+
+    assert result["rows"] == len(stamps)
+    assert [m["trained"] for m in result["models"]] == [True]
+    predictions = result["predictions"]
+    assert len(predictions) < len(stamps)  # lag warm-up and gaps are not scored
+    assert np.isfinite(predictions["actual"]).all()
+    assert result["models"][0]["rmse"] < 5
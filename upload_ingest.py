@@ -0,0 +1,155 @@
+# upload_ingest.py
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span, count
+
+MAX_CACHED_UPLOADS = 32
+MAX_COMBINED_GROUPS = 16
+
+
+def file_digest(file) -> str:
+    """
+    SHA-1 of an uploaded file's bytes (Streamlit UploadedFile or any file object).
+    """
+    if hasattr(file, "getvalue"):
+        data = file.getvalue()
+    else:
+        pos = file.tell()
+        data = file.read()
+        file.seek(pos)
+    return hashlib.sha1(data).hexdigest()
+
+
+def read_upload(file) -> pd.DataFrame:
+    if file.name.endswith(".csv"):
+        return pd.read_csv(file)
+    return pd.read_excel(file)
+
+
+class UploadIngest:
+    """
+    Parses each distinct uploaded file once, keyed by the hash of its bytes, and
+    keeps one combined frame per group (zone) that is extended or trimmed as
+    files are added or removed instead of being re-parsed and re-concatenated.
+    Cached frames are shared; callers must not modify them in place. Parsed
+    frames are evicted least recently used first, except those a live combined
+    group still refers to; combined groups are evicted the same way.
+    """
+
+    def __init__(self, max_files: int = MAX_CACHED_UPLOADS, max_groups: int = MAX_COMBINED_GROUPS):
+        self.max_files = max_files
+        self.max_groups = max_groups
+        self.frames = OrderedDict()    # (digest, normalized) -> DataFrame
+        self.csv_text = {}             # (digest, normalized) -> frame serialized with to_csv
+        self.row_counts = {}           # (digest, normalized) -> rows, while cached or in a combined group
+        self.combined = OrderedDict()  # group -> (digest keys, row offsets, combined frame)
+
+    def _pinned(self) -> set:
+        return {k for keys, _, _ in self.combined.values() for k in keys}
+
+    def _evict(self):
+        """
+        Drop least recently used frames beyond max_files that no combined group
+        refers to, and forget row counts nothing refers to any more.
+        """
+        if len(self.frames) > self.max_files:
+            pinned = self._pinned()
+            for key in [k for k in self.frames if k not in pinned][:len(self.frames) - self.max_files]:
+                del self.frames[key]
+                self.csv_text.pop(key, None)
+        if len(self.row_counts) > len(self.frames):
+            live = self._pinned() | set(self.frames)
+            self.row_counts = {k: v for k, v in self.row_counts.items() if k in live}
+
+    def parse(self, file, normalize: bool = False):
+        """
+        Return (digest, frame) for an uploaded file, parsing it only the first
+        time these bytes are seen. `normalize` applies the loader's header cleanup.
+        """
+        digest = file_digest(file)
+        key = (digest, normalize)
+        df = self.frames.get(key)
+        if df is not None:
+            self.frames.move_to_end(key)
+            count("upload.cache_hits")
+            return digest, df
+        if hasattr(file, "seek"):
+            file.seek(0)
+        with span("upload.parse"):
+            df = read_upload(file)
+        if normalize:
+            df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+        count("upload.parsed")
+        self.frames[key] = df
+        self.row_counts[key] = len(df)
+        self._evict()
+        return digest, df
+
+    def to_csv(self, digest: str, normalize: bool = False) -> str:
+        """
+        Cached CSV text of a parsed upload (for prompts that embed the whole file).
+        """
+        key = (digest, normalize)
+        text = self.csv_text.get(key)
+        if text is None:
+            if key not in self.frames:
+                raise KeyError(f"upload {digest} is no longer cached; parse it again")
+            text = self.frames[key].to_csv(index=False)
+            self.csv_text[key] = text
+        return text
+
+    def combine(self, group, digests, normalize: bool = False, frames: dict = None) -> pd.DataFrame:
+        """
+        Concatenation of the given parsed uploads, in order. Appending files only
+        concatenates the new frames; removing files slices the previous result.
+        `frames` ({digest: frame}, as returned by parse) supplies uploads that
+        were evicted between parse() and this call (zones with many files).
+        """
+        keys = tuple((d, normalize) for d in digests)
+        if not keys:
+            self.combined.pop(group, None)
+            return pd.DataFrame()
+        previous = self.combined.get(group)
+        if previous is not None and previous[0] == keys:
+            self.combined.move_to_end(group)
+            return previous[2]
+
+        def frame(key):
+            if key in self.frames:
+                return self.frames[key]
+            if frames and key[0] in frames:
+                return frames[key[0]]
+            raise KeyError(f"upload {key[0]} is no longer cached; parse it again")
+
+        with span("upload.combine"):
+            if previous is not None and keys[:len(previous[0])] == previous[0]:
+                added = [frame(k) for k in keys[len(previous[0]):]]
+                combined = pd.concat([previous[2]] + added, ignore_index=True)
+            elif previous is not None and _is_subsequence(keys, previous[0]):
+                old_keys, offsets, old_frame = previous
+                ranges = [np.arange(offsets[i], offsets[i + 1]) for i, k in enumerate(old_keys) if k in keys]
+                combined = old_frame.iloc[np.concatenate(ranges)].reset_index(drop=True)
+            else:
+                combined = pd.concat([frame(k) for k in keys], ignore_index=True)
+
+        for k in keys:
+            if k not in self.row_counts:
+                self.row_counts[k] = len(frame(k))
+        lengths = [self.row_counts[k] for k in keys]
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.combined[group] = (keys, offsets, combined)
+        self.combined.move_to_end(group)
+        while len(self.combined) > self.max_groups:
+            self.combined.popitem(last=False)
+        self._evict()
+        return combined
+
+
+def _is_subsequence(keys, old_keys) -> bool:
+    remaining = iter(old_keys)
+    return len(set(keys)) == len(keys) and all(k in remaining for k in keys)
@@ -0,0 +1,16 @@
+# zone_health.py
+
+from rule_engine import evaluate_frame
+
+def assess_zone_health(df, file_name=None):
+    """
+    Mission health for one zone from the alert rules in rule_engine: the
+    status of the first rule whose alert is still active at the end of the
+    data. Returns (status, color, healthy). Live views should keep an
+    AlertMonitor instead, which evaluates only newly arrived rows.
+    """
+    try:
+        result = evaluate_frame(df, file_name)
+    except (KeyError, TypeError, ValueError):
+        return "❓ Check Data", "gray", False
+    return result["status"], result["color"], result["healthy"]
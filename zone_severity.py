@@ -0,0 +1,299 @@
+# zone_severity.py
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from constants import SEVERITY_TREND_ROWS, SEVERITY_TREND_HORIZON, SEVERITY_ANOMALY_HALFLIFE_ROWS
+from dataset_loader import find_time_column, parse_timestamps
+from rule_engine import CompiledRules, MISSING_SENTINEL, load_rules
+from instrumentation import span, count
+
+# Zone severity straight from the sensor data. Each alert rule's sensors get a
+# threshold score (how close the latest reading is to the rule's threshold,
+# in standard deviations of that sensor) and a trend score (the same, for the
+# value the recent slope projects SEVERITY_TREND_HORIZON ahead); every numeric
+# column gets an anomaly score from its recent rate of outlying readings. The
+# zone score is the largest weighted component (1.0 while a rule's alert is
+# active), and SEVERITY_LEVELS turns it into the grid's status.
+SEVERITY_LEVELS = (("severe", 0.8), ("moderate", 0.5))  # lowest score of each level; below them "normal"
+NORMAL = "normal"
+THRESHOLD_BAND_STD = 3.0  # standard deviations from the threshold at which the threshold score reaches 0
+ANOMALY_Z = 4.0  # |z| past which a reading counts as an outlier
+ANOMALY_RATE_FULL = 0.25  # outlier rate that gives the full anomaly score
+WEIGHTS = {"threshold": 1.0, "trend": 0.9, "anomaly": 0.7}
+MAX_DRIVERS = 3
+
+
+def severity_level(score: float) -> str:
+    for level, lowest in SEVERITY_LEVELS:
+        if score >= lowest:
+            return level
+    return NORMAL
+
+
+def _merge_moments(count_a, mean_a, m2_a, block: np.ndarray):
+    """
+    Running per-column count, mean and M2 after adding a block of rows
+    (NaNs skipped), with the pairwise update used by summary_engine.
+    """
+    valid = ~np.isnan(block)
+    count_b = valid.sum(axis=0).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_b = np.where(valid, block, 0.0).sum(axis=0) / count_b
+        dev = np.where(valid, block - mean_b, 0.0)
+        m2_b = (dev * dev).sum(axis=0)
+        total = count_a + count_b
+        delta = np.nan_to_num(mean_b) - np.nan_to_num(mean_a)
+        safe = np.where(total > 0, total, 1.0)
+        mean = np.where(total > 0, np.nan_to_num(mean_a) + delta * count_b / safe, np.nan)
+        m2 = m2_a + np.nan_to_num(m2_b) + delta ** 2 * count_a * count_b / safe
+    return total, mean, m2
+
+
+def _slopes(ts: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Least-squares slope per column (units per second) over the rows where both
+    the timestamp and the value are present; NaN with fewer than three points.
+    """
+    valid = ~np.isnan(values) & ~np.isnan(ts)
+    n = valid.sum(axis=0)
+    t = np.where(valid, ts, 0.0)
+    v = np.where(valid, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t_mean = t.sum(axis=0) / n
+        v_mean = v.sum(axis=0) / n
+        dt = np.where(valid, t - t_mean, 0.0)
+        slope = (dt * (v - v_mean)).sum(axis=0) / (dt * dt).sum(axis=0)
+    return np.where(n >= 3, slope, np.nan)
+
+
+class ZoneScorer:
+    """
+    Severity state of one zone's frame. update() folds in a block of appended
+    rows: running moments and the anomaly rate are updated in place, the last
+    SEVERITY_TREND_ROWS present readings of each rule sensor are kept for the
+    trend (per sensor, since a zone's files are stacked and each covers only
+    its own columns), and the compiled alert rules continue from their own state.
+    """
+
+    def __init__(self, rules: list, file_name: str, df: pd.DataFrame):
+        self.columns = df.select_dtypes(include=["number"]).columns.tolist()
+        self.rules = CompiledRules(rules, file_name, self.columns)
+        self.rule_state = self.rules.new_state()
+        self.pair_index = np.array([self.columns.index(c) for c in self.rules.columns], dtype=np.intp)
+        m = len(self.columns)
+        self.count = np.zeros(m)
+        self.mean = np.full(m, np.nan)
+        self.m2 = np.zeros(m)
+        self.anomaly_rate = np.zeros(m)
+        self.decay = 0.5 ** (1.0 / SEVERITY_ANOMALY_HALFLIFE_ROWS)
+        self.tail_ts = np.empty((0, len(self.rules.columns)))
+        self.tail = np.empty((0, len(self.rules.columns)))
+        self.timed = False
+        self.rows = 0
+
+    def update(self, df: pd.DataFrame):
+        n = len(df)
+        self.rows += n
+        if n == 0:
+            return
+        self.rules.evaluate(df, self.rule_state)
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan).reshape(n, len(self.columns))
+        values = np.where(values == MISSING_SENTINEL, np.nan, values)
+
+        # Outliers against the moments including this block, then an
+        # exponentially weighted rate: older rows fade with a half-life in rows.
+        self.count, self.mean, self.m2 = _merge_moments(self.count, self.mean, self.m2, values)
+        std = self.std()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            outlier = np.abs(values - self.mean) > ANOMALY_Z * np.where(std > 0, std, np.nan)
+        weights = self.decay ** np.arange(n - 1, -1, -1)
+        self.anomaly_rate = self.anomaly_rate * self.decay ** n + (1.0 - self.decay) * (weights @ outlier)
+
+        stamps = parse_timestamps(df)
+        if stamps is not None:
+            ts = stamps.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+            ts[stamps.isna().to_numpy()] = np.nan
+            self.timed = True
+        else:
+            ts = np.full(n, np.nan)
+        scaled = values[:, self.pair_index] * self.rules.signs
+        tail = np.vstack([self.tail, scaled])
+        tail_ts = np.vstack([self.tail_ts, np.broadcast_to(ts[:, None], scaled.shape)])
+        # A stable sort on presence moves each column's missing readings to the
+        # top without reordering the rest; the bottom rows are the latest present ones.
+        order = np.argsort(~np.isnan(tail), axis=0, kind="stable")[-SEVERITY_TREND_ROWS:]
+        self.tail = np.take_along_axis(tail, order, axis=0)
+        self.tail_ts = np.take_along_axis(tail_ts, order, axis=0)
+
+    def std(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt(self.m2 / (self.count - 1))
+
+    def _latest(self) -> np.ndarray:
+        """
+        Latest present reading of each rule sensor in the trend window (NaN if none).
+        """
+        present = ~np.isnan(self.tail)
+        if not len(self.tail):
+            return np.full(self.tail.shape[1], np.nan)
+        last = np.where(present.any(axis=0), len(self.tail) - 1 - np.argmax(present[::-1], axis=0), 0)
+        return np.where(present.any(axis=0), self.tail[last, np.arange(self.tail.shape[1])], np.nan)
+
+    def result(self) -> dict:
+        """
+        {"severity", "score", "components", "drivers", "alerts", "rows"}.
+        `drivers` are the sensors behind the score, strongest first, for the
+        grid tooltip and the LLM explanation prompt.
+        """
+        if not self.rows:
+            return {"severity": NORMAL, "score": 0.0, "components": {}, "drivers": [], "alerts": [], "rows": 0}
+        rules, pairs = self.rules, np.arange(len(self.rules.columns))
+        band = THRESHOLD_BAND_STD * np.fmax(self.std()[self.pair_index], np.abs(rules.raise_at - rules.clear_at))
+        latest = self._latest()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            threshold = np.clip(1.0 - (rules.raise_at - latest) / band, 0.0, 1.0)
+            slope = _slopes(self.tail_ts, self.tail) if self.timed else np.full(len(pairs), np.nan)
+            horizon = pd.Timedelta(SEVERITY_TREND_HORIZON).total_seconds()
+            projected = latest + np.where(slope > 0, slope, 0.0) * horizon
+            trend = np.where(slope > 0, np.clip(1.0 - (rules.raise_at - projected) / band, 0.0, 1.0), 0.0)
+        threshold, trend = np.nan_to_num(threshold), np.nan_to_num(trend)
+        anomaly = np.clip(self.anomaly_rate / ANOMALY_RATE_FULL, 0.0, 1.0)
+        active = self.rule_state["active"]
+
+        components = {
+            "threshold": float(threshold.max(initial=0.0)),
+            "trend": float(trend.max(initial=0.0)),
+            "anomaly": float(anomaly.max(initial=0.0)),
+            "alert": float(active.any()),
+        }
+        score = max([WEIGHTS[k] * components[k] for k in WEIGHTS] + [components["alert"]])
+
+        candidates = []
+        for i in pairs:
+            rule = rules.rules[rules.rule_ids[i]]
+            unit_value = float(latest[i] * rules.signs[i]) if latest[i] == latest[i] else None
+            threshold_value = float(rules.raise_at[i] * rules.signs[i])
+            for kind, value in (("alert", float(active[i])), ("threshold", WEIGHTS["threshold"] * threshold[i]),
+                                ("trend", WEIGHTS["trend"] * trend[i])):
+                if value > 0:
+                    candidates.append({"column": rules.columns[i], "rule": rule["name"], "kind": kind,
+                                       "score": float(value), "value": unit_value, "threshold": threshold_value})
+        for j in np.flatnonzero(anomaly > 0):
+            candidates.append({"column": self.columns[j], "rule": None, "kind": "anomaly",
+                               "score": float(WEIGHTS["anomaly"] * anomaly[j]), "rate": float(self.anomaly_rate[j])})
+        drivers, seen = [], set()
+        for c in sorted(candidates, key=lambda c: -c["score"]):
+            if c["column"] not in seen:
+                seen.add(c["column"])
+                drivers.append(c)
+        return {"severity": severity_level(score), "score": float(score), "components": components,
+                "drivers": drivers[:MAX_DRIVERS], "alerts": rules.active_alerts(self.rule_state), "rows": self.rows}
+
+
+def _first_stamp(df):
+    col = find_time_column(df)
+    return None if col is None or df.empty else str(df[col].iloc[0])
+
+
+class SeverityMonitor:
+    """
+    Severity per zone. observe() scores only the rows appended since the zone
+    was last observed, so the dashboard can call it on every rerun; like
+    rule_engine.AlertMonitor, a frame that shrank, changed columns or starts
+    with a different row is scored from the start.
+    """
+
+    def __init__(self, rules: list = None):
+        self.rules = rules if rules is not None else load_rules()
+        self.zones = {}  # zone -> {"scorer", "columns", "first", "result"}
+        self._lock = threading.Lock()
+
+    def observe(self, zone, df: pd.DataFrame, file_name: str = None) -> dict:
+        """
+        Fold in the new rows of a zone frame and return its severity result.
+        `file_name` selects the catalog entry for the rules (default: the zone).
+        """
+        with self._lock:
+            tracked = self.zones.get(zone)
+            columns = tuple(df.columns)
+            if (tracked is None or tracked["columns"] != columns or len(df) < tracked["scorer"].rows
+                    or tracked["first"] != _first_stamp(df)):
+                tracked = self.zones[zone] = {"scorer": ZoneScorer(self.rules, file_name or zone, df),
+                                              "columns": columns, "first": _first_stamp(df), "result": None}
+            scorer = tracked["scorer"]
+            if tracked["result"] is None or scorer.rows < len(df):
+                with span("severity.update"):
+                    new_rows = len(df) - scorer.rows
+                    scorer.update(df.iloc[scorer.rows:])
+                    tracked["result"] = scorer.result()
+                count("severity.rows", new_rows)
+            return tracked["result"]
+
+    def result(self, zone) -> dict:
+        with self._lock:
+            tracked = self.zones.get(zone)
+            return tracked["result"] if tracked else None
+
+    def reset(self, zone):
+        with self._lock:
+            self.zones.pop(zone, None)
+
+    def retain(self, zones):
+        """
+        Drop the state of every zone not in `zones` (e.g. files no longer uploaded).
+        """
+        keep = set(zones)
+        with self._lock:
+            for zone in [z for z in self.zones if z not in keep]:
+                del self.zones[zone]
+
+
+def score_frame(df: pd.DataFrame, file_name: str = None, rules: list = None) -> dict:
+    """
+    One-shot severity of a whole frame.
+    """
+    scorer = ZoneScorer(rules if rules is not None else load_rules(), file_name, df)
+    scorer.update(df)
+    return scorer.result()
+
+
+def combine_results(results: dict) -> dict:
+    """
+    Severity of a zone from the results of its files ({file name: result}),
+    each scored on its own: the worst file sets the score, and drivers and
+    alerts carry the file they come from.
+    """
+    results = {name: r for name, r in results.items() if r and r["rows"]}
+    if not results:
+        return {"severity": NORMAL, "score": 0.0, "components": {}, "drivers": [], "alerts": [], "rows": 0}
+    score = max(r["score"] for r in results.values())
+    components = {}
+    for r in results.values():
+        for k, v in r["components"].items():
+            components[k] = max(components.get(k, 0.0), v)
+    drivers = sorted(({**d, "file": name} for name, r in results.items() for d in r["drivers"]), key=lambda d: -d["score"])
+    return {"severity": severity_level(score), "score": float(score), "components": components,
+            "drivers": drivers[:MAX_DRIVERS], "alerts": [{**a, "file": name} for name, r in results.items() for a in r["alerts"]],
+            "rows": sum(r["rows"] for r in results.values())}
+
+
+def format_severity(zone: str, result: dict) -> str:
+    """
+    The data-driven severity as prompt text, so the LLM explains a verdict
+    instead of producing one.
+    """
+    if not result or not result["rows"]:
+        return ""
+    lines = [f"Data-driven status of {zone}: {result['severity'].upper()} (score {result['score']:.2f} of 1)."]
+    for d in result["drivers"]:
+        column = str(d["column"]).strip() + (f" ({d['file']})" if d.get("file") else "")
+        if d["kind"] == "anomaly":
+            lines.append(f"- {column}: {d['rate']:.0%} of recent readings are outliers")
+        elif d["value"] is not None:
+            what = {"alert": "alert active", "threshold": "close to the threshold", "trend": "trending toward the threshold"}[d["kind"]]
+            lines.append(f"- {column}: {what} (rule '{d['rule']}', latest {d['value']:.4g}, threshold {d['threshold']:.4g})")
+    return "\n".join(lines) + "\n\n"
+
@@ -1,34 +1,34 @@
 import streamlit as st
 import pandas as pd
-import requests
-import plotly.express as px
 
 # Import constants from constants.py
-from constants import OLLAMA_URL, MODEL_NAME
+from constants import CHART_POINT_BUDGET, VIZ_METRICS_PORT
+from chart_downsampling import downsample_frame
+from dataset_loader import parse_timestamps
+from sensor_catalog import get_catalog
+from upload_ingest import UploadIngest
+from llm_gateway import get_gateway, CHAT, ANALYSIS
+from analysis_index import get_index, relevant_findings
+from prompt_engine import format_findings
+from zone_severity import SeverityMonitor, combine_results, format_severity
+from instrumentation import span, start_rerun, render_rerun_panel, start_metrics_server
 
 # -------------------------
 # HELPER FUNCTIONS
 # -------------------------
 def guess_zone_from_filename(filename: str) -> str:
     """
-    Naively guess the zone based on the filename.
+    Look up the zone of a file in the sensor catalog (zone names anywhere in
+    the name, "rf" only as a whole token so "surface.csv" is not Rainforest).
     """
-    fname = filename.lower()
-    if "ocean" in fname:
-        return "Ocean"
-    elif "desert" in fname:
-        return "Desert"
-    elif "rainforest" in fname or "rf" in fname:
-        return "Rainforest"
-    elif "leo" in fname:
-        return "LEO"
-    else:
-        return None
+    return get_catalog().zone_of(filename)
 
-def build_prompt(dataset_name: str, sample_data: pd.DataFrame) -> str:
+def build_prompt(dataset_name: str, sample_data: pd.DataFrame, findings=None, severity: str = "") -> str:
     """
     Build the prompt to send to Gemma3 using a preview of the combined data,
-    preceded by a base context describing Biosphere 2.
+    preceded by a base context describing Biosphere 2 and followed by the
+    most relevant past findings for the zone, if any, and the zone's
+    data-driven severity (see zone_severity), which the model is asked to explain.
     """
     base_context = (
         "Biosphere 2 is a 3.14-acre research and education campus near Oracle, Arizona. "
@@ -52,39 +52,25 @@ def build_prompt(dataset_name: str, sample_data: pd.DataFrame) -> str:
         f"You are now inside the zone: **{dataset_name}**.\n\n"
         f"Here is a preview of current sensor readings in this zone:\n"
         f"{sample_preview}\n\n"
-        f"Based on the data above, what balancing actions or insights should you generate "
-        f"to maintain optimal conditions in this zone, if any?\n\n"
+        f"{format_findings(findings)}"
+        f"{severity}"
+        f"Based on the data above, explain the zone's status and what balancing actions or insights "
+        f"you would generate to maintain optimal conditions in this zone, if any.\n\n"
         f"List actionable recommendations as if you are managing this system."
     )
     return prompt
 
-def query_llm(prompt: str) -> str:
+def query_llm(prompt: str, priority: int = CHAT) -> str:
     """
-    Query the LLM via Ollama with the given prompt.
+    Query the LLM through the shared gateway with the given prompt.
     """
     try:
-        response = requests.post(
-            OLLAMA_URL,
-            json={"model": MODEL_NAME, "prompt": prompt, "stream": False},
-            timeout=  300
-        )
-        return response.json().get("response", "⚠️ No response from LLM.")
+        with span("viz.llm_request"):
+            result = get_gateway().generate(prompt, priority)
+        return result.get("response", "⚠️ No response from LLM.")
     except Exception as e:
         return f"Error querying LLM: {e}"
 
-def determine_severity(llm_response: str) -> str:
-    """
-    Naively determine severity based on keywords in the LLM response.
-    Returns "red" if severe, "yellow" if moderate, else "normal".
-    """
-    lower_resp = llm_response.lower()
-    if "urgent" in lower_resp or "critical" in lower_resp:
-        return "severe"
-    elif "issue" in lower_resp or "problem" in lower_resp or "concern" in lower_resp:
-        return "moderate"
-    else:
-        return "normal"
-
 # -------------------------
 # BASE COLORS & UTILITY FUNCTIONS
 # -------------------------
@@ -96,9 +82,9 @@ BASE_COLORS = {
 }
 
 def get_zone_color(zone: str, severity: str) -> str:
-    if severity == "red":
+    if severity == "severe":
         return "#FF6347"  # Tomato Red
-    elif severity == "yellow":
+    elif severity == "moderate":
         return "#FFD700"  # Gold
     else:
         return BASE_COLORS.get(zone, "#BBBBBB")
@@ -113,23 +99,27 @@ if "zone_files" not in st.session_state:
 if "analysis_log" not in st.session_state:
     st.session_state.analysis_log = {}    # Map: zone -> analysis result
 if "zone_status" not in st.session_state:
-    st.session_state.zone_status = {
-        "Ocean": "normal",
-        "Desert": "normal",
-        "Rainforest": "normal",
-        "LEO": "normal"
-    }
+    st.session_state.zone_status = {}     # Map: zone -> zone_severity result of its uploaded files
+if "severity" not in st.session_state:
+    st.session_state.severity = SeverityMonitor()  # per-upload severity state; only new rows are scored
 if "selected_zone" not in st.session_state:
     st.session_state.selected_zone = None
 if "selected_files" not in st.session_state:
     st.session_state.selected_files = []
 if "conversation" not in st.session_state:
     st.session_state.conversation = []  # List of messages (each is a dict with 'role' and 'content')
+if "zone_data" not in st.session_state:
+    st.session_state.zone_data = {}     # Map: zone -> combined DataFrame of the analyzed files
+if "upload_ingest" not in st.session_state:
+    st.session_state.upload_ingest = UploadIngest()  # uploads parsed once per distinct content
+ingest = st.session_state.upload_ingest
 
 # -------------------------
 # STREAMLIT UI SETUP
 # -------------------------
 st.set_page_config(page_title="Biosphere 2 - Zone Dashboard", layout="wide")
+start_rerun()
+start_metrics_server(VIZ_METRICS_PORT)  # this process's spans at /metrics; no-op unless B2TWIN_METRICS=1
 st.title("Biosphere 2: Zone Dashboard")
 
 # Sidebar: File Uploader for Multiple Files
@@ -142,14 +132,38 @@ if uploaded_files:
         zone = guess_zone_from_filename(file.name)
         if zone:
             zone_files.setdefault(zone, []).append(file)
+        else:
+            st.sidebar.warning(f"No zone found in the name of {file.name}; include Ocean, Desert, Rainforest (or RF) or LEO to analyze it.")
     st.session_state.zone_files = zone_files
 
+# Grid status straight from the data of every zone's uploads, without waiting
+# for the LLM. Each file is scored on its own, under its own name's rules
+# (parsed once, then scored incrementally); the worst file sets the zone.
+def score_file(digest, df, file_name) -> dict:
+    with span("viz.severity"):
+        return st.session_state.severity.observe((digest, file_name), df, file_name)
+
+zone_status = {}
+scored = set()
+for zone, files in st.session_state.zone_files.items():
+    results = {}
+    for file in files:
+        try:
+            with span("viz.parse_upload"):
+                digest, df = ingest.parse(file)
+            results[file.name] = score_file(digest, df, file.name)
+            scored.add((digest, file.name))
+        except Exception as e:
+            st.sidebar.error(f"Error scoring {file.name}: {e}")
+    zone_status[zone] = combine_results(results)
+st.session_state.severity.retain(scored)
+st.session_state.zone_status = zone_status
+
 # Sidebar: Zone Selector Dropdown (only zones with uploaded files)
 if st.session_state.zone_files:
     available_zones = list(st.session_state.zone_files.keys())
     selected_zone = st.sidebar.selectbox("Select a zone to analyze", available_zones)
-    # When a new zone is selected, reset grid status and conversation history
-    st.session_state.zone_status = { "Ocean": "normal", "Desert": "normal", "Rainforest": "normal", "LEO": "normal" }
+    # When a new zone is selected, reset the conversation history
     st.session_state.conversation = []
     st.session_state.selected_zone = selected_zone
 
@@ -162,38 +176,34 @@ if st.session_state.zone_files:
     if st.sidebar.button("Analyze Selected Files"):
         files_to_analyze = [f for f in st.session_state.zone_files[selected_zone] if f.name in st.session_state.selected_files]
         if files_to_analyze:
-            # Reset grid status for all zones before analysis
-            st.session_state.zone_status = { "Ocean": "normal", "Desert": "normal", "Rainforest": "normal", "LEO": "normal" }
-            dfs = []
+            parsed, names = {}, {}
             for file in files_to_analyze:
                 try:
-                    if file.name.endswith(".csv"):
-                        df = pd.read_csv(file)
-                    else:
-                        df = pd.read_excel(file)
-                    dfs.append(df)
+                    with span("viz.parse_upload"):
+                        digest, df = ingest.parse(file)
+                    parsed[digest] = df
+                    names[digest] = file.name
                 except Exception as e:
                     st.sidebar.error(f"Error reading {file.name}: {e}")
-            if dfs:
-                combined_df = pd.concat(dfs, ignore_index=True)
-                with st.spinner("Analyzing combined sensor data..."):
-                    prompt_text = build_prompt(selected_zone, combined_df)
-                    llm_result = query_llm(prompt_text)
-                    new_severity = determine_severity(llm_result)
-                    # If there's an initial analysis, compare severity; if unchanged, keep initial severity.
-                    if selected_zone in st.session_state.analysis_log:
-                        initial_severity = st.session_state.analysis_log[selected_zone]["severity"]
-                        if new_severity == initial_severity:
-                            severity = initial_severity
-                        else:
-                            severity = new_severity
-                    else:
-                        severity = new_severity
-                    st.session_state.zone_status[selected_zone] = severity
+            digests = list(parsed)
+            if digests:
+                combined_df = ingest.combine(selected_zone, digests, frames=parsed)
+                st.session_state.zone_data[selected_zone] = combined_df
+                # Severity comes from the data; the LLM only explains it
+                severity = combine_results({names[d]: score_file(d, parsed[d], names[d]) for d in digests})
+                with st.spinner("Explaining zone status..."):
+                    findings = relevant_findings(selected_zone, f"{selected_zone} {' '.join(map(str, combined_df.columns))}")
+                    prompt_text = build_prompt(selected_zone, combined_df, findings, format_severity(selected_zone, severity))
+                    llm_result = query_llm(prompt_text, ANALYSIS)
+                    if not llm_result.startswith("Error querying LLM"):
+                        get_index().add(selected_zone, "analysis", llm_result, source="zone_visualizer")
                     st.session_state.analysis_log[selected_zone] = {
                         "llm_output": llm_result,
-                        "severity": severity,
-                        "files": st.session_state.selected_files
+                        "severity": severity["severity"],
+                        "score": severity["score"],
+                        "drivers": format_severity(selected_zone, severity),
+                        "files": st.session_state.selected_files,
+                        "digests": digests
                     }
                 st.sidebar.success("Analysis complete for selected files!")
         else:
@@ -207,12 +217,14 @@ st.markdown("## Zone Status")
 # 1x4 Grid Display
 col1, col2, col3, col4 = st.columns(4)
 def render_zone_box(col, zone_name):
-    severity = st.session_state.zone_status.get(zone_name, "normal")
+    result = st.session_state.zone_status.get(zone_name)
+    severity = result["severity"] if result else "normal"
+    score = f" ({result['score']:.2f})" if result and result["rows"] else ""
     box_color = get_zone_color(zone_name, severity)
     zone_html = f"""
     <div style="background-color:{box_color}; padding:30px; border-radius:10px; text-align:center">
         <h3 style="color:white;">{zone_name}</h3>
-        <p style="color:white;">Status: {severity.upper()}</p>
+        <p style="color:white;">Status: {severity.upper()}{score}</p>
     </div>
     """
     col.markdown(zone_html, unsafe_allow_html=True)
@@ -228,13 +240,39 @@ if st.session_state.selected_zone:
     st.subheader(f"Analysis for Zone: {st.session_state.selected_zone}")
     analysis = st.session_state.analysis_log.get(st.session_state.selected_zone)
     if analysis:
-        st.text_area("LLM Output", value=analysis["llm_output"], height=250)
-        st.markdown(f"**Severity:** {analysis['severity'].upper()}")
-        severity = analysis['severity'].upper()
+        st.markdown(f"**Severity:** {analysis['severity'].upper()} (score {analysis['score']:.2f})")
+        if analysis["drivers"]:
+            st.text(analysis["drivers"].strip())
+        st.text_area("LLM Explanation", value=analysis["llm_output"], height=250)
         st.markdown(f"**Files Used for Analysis:** {', '.join(analysis['files'])}")
     else:
         st.info("No analysis available for the selected zone.")
 
+# -------------------------
+# SENSOR TRENDS (downsampled server-side to the chart's point budget)
+# -------------------------
+zone_df = st.session_state.zone_data.get(st.session_state.selected_zone)
+if zone_df is not None:
+    st.markdown("## Sensor Trends")
+    numeric_cols = zone_df.select_dtypes(include=["number"]).columns.tolist()
+    chart_cols = st.multiselect("Sensors to chart", numeric_cols, default=numeric_cols[:4])
+    stamps = parse_timestamps(zone_df)
+    x_range = None
+    if stamps is not None and stamps.notna().any():
+        first, last = stamps.min().to_pydatetime(), stamps.max().to_pydatetime()
+        if first < last:
+            x_range = st.slider("Time range", min_value=first, max_value=last, value=(first, last))
+    if chart_cols:
+        # keyed on the uploads' content hashes: a changed file re-uploaded under the same name gets a new chart
+        analyzed_digests = st.session_state.analysis_log.get(st.session_state.selected_zone, {}).get("digests", [])
+        chart_key = (st.session_state.selected_zone, tuple(analyzed_digests))
+        with span("viz.chart_downsample"):
+            chart_df = downsample_frame(zone_df, chart_cols, n_out=CHART_POINT_BUDGET, x_range=x_range, cache_key=chart_key)
+        import plotly.express as px  # only needed once a sensor chart is drawn
+
+        fig = px.line(chart_df, x="x", y="value", color="series")
+        st.plotly_chart(fig, use_container_width=True)
+
 # -------------------------
 # CONVERSATION SECTION
 # -------------------------
@@ -271,6 +309,8 @@ if st.session_state.selected_zone and st.session_state.selected_zone in st.sessi
             conv_prompt += "Assistant: "
             with st.spinner("Generating assistant reply..."):
                 assistant_reply = query_llm(conv_prompt)
+            if not assistant_reply.startswith("Error querying LLM"):
+                get_index().add(st.session_state.selected_zone, "assistant", assistant_reply, source="zone_visualizer")
             st.session_state.conversation.append({"role": "Assistant", "content": assistant_reply})
             if len(st.session_state.conversation) > 5:
                 st.session_state.conversation = st.session_state.conversation[-5:]
@@ -281,12 +321,10 @@ if st.session_state.selected_zone and st.session_state.selected_zone in st.sessi
     new_data_file = st.file_uploader("Upload new sensor data to update insight", type=["csv", "xlsx"], key="new_sensor_data_upload")
     if new_data_file:
         try:
-            if new_data_file.name.endswith(".csv"):
-                new_data_df = pd.read_csv(new_data_file)
-            else:
-                new_data_df = pd.read_excel(new_data_file)
-            # Use the entire file instead of just the first 5 rows
-            additional_data_full = new_data_df.to_csv(index=False)
+            with span("viz.parse_new_sensor_data"):
+                digest, _ = ingest.parse(new_data_file)
+                # Use the entire file instead of just the first 5 rows
+                additional_data_full = ingest.to_csv(digest)
         except Exception as e:
             st.error(f"Error reading new sensor data: {e}")
             additional_data_full = "Error reading file."
@@ -303,8 +341,12 @@ if st.session_state.selected_zone and st.session_state.selected_zone in st.sessi
             conv_prompt += "Assistant: "
             with st.spinner("Generating updated insight..."):
                 assistant_reply = query_llm(conv_prompt)
+            if not assistant_reply.startswith("Error querying LLM"):
+                get_index().add(st.session_state.selected_zone, "assistant", assistant_reply, source="zone_visualizer")
             st.session_state.conversation.append({"role": "Assistant", "content": assistant_reply})
             if len(st.session_state.conversation) > 5:
                 st.session_state.conversation = st.session_state.conversation[-5:]
             conv_history = display_conversation()
-            conv_placeholder.markdown(conv_history)
\ No newline at end of file
+            conv_placeholder.markdown(conv_history)
+
+render_rerun_panel(st)